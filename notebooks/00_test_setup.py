@@ -81,6 +81,60 @@ output_file = '../output/test_results.csv'
 result.to_csv(output_file, index=False)
 print(f"\n✅ Resultados exportados a {output_file}")
 
+# %% Verificar formato de fechas en el workbook de Excel
+import sys
+import tempfile
+from pathlib import Path
+from openpyxl import load_workbook
+
+sys.path.append(str(Path('..').resolve()))
+from scripts.export_deliverables import create_excel_workbook
+
+dates_df = pd.DataFrame({
+    'transaction_date': pd.to_datetime(['2025-01-01 00:00:00', '2025-01-02 13:45:00', None]),
+    'txn_count': [270, 271, 248]
+})
+with tempfile.TemporaryDirectory() as tmp_dir:
+    for write_only in (True, False):
+        xlsx_path = Path(tmp_dir) / 'fechas.xlsx'
+        create_excel_workbook({'Fechas': dates_df}, str(xlsx_path),
+                              visualization_dir=str(Path(tmp_dir) / 'sin_graficos'),
+                              write_only=write_only)
+        date_cells = [row[0] for row in load_workbook(xlsx_path)['Fechas'].iter_rows(min_row=2)]
+        # Las fechas (y NaT) conservan su formato en vez de mostrarse como números seriales
+        assert [cell.number_format for cell in date_cells] == ['yyyy-mm-dd h:mm:ss'] * 3
+        assert date_cells[1].value == datetime(2025, 1, 2, 13, 45)
+print("\n✅ Fechas exportadas a Excel con formato de fecha")
+
+# %% Verificar el monitor de anomalías (primer evento fallido)
+from scripts.anomaly_stream import FailureRateMonitor
+
+
+def replay_records(keys):
+    """Registros de transacciones sintéticos a partir de (corredor, segmento, estado)."""
+    for i, (corridor, segment, status) in enumerate(keys):
+        yield {'transaction_id': f'TXN_{i:06d}', 'transaction_date': '2025-07-01',
+               'transaction_time': '00:00:00', 'corridor': corridor, 'user_segment': segment,
+               'amount_usd': 15000.0, 'status': status}
+
+
+# Clave propia: el primer evento falla, 20% de fallos y luego sube a 60%
+shift = (['failed'] + ['failed' if i % 5 == 0 else 'success' for i in range(1, 400)]
+         + ['failed' if i % 5 < 3 else 'success' for i in range(200)])
+key_alerts = list(FailureRateMonitor().process(
+    replay_records(('USD_MXN', 'sme', status) for status in shift)
+))
+assert key_alerts and key_alerts[0].events > 400
+
+# Referencia global: el primer registro falla y USD_MXN falla 50% vs 5% del resto
+mixed = []
+for i in range(300):
+    mixed.append(('USD_MXN', 'sme', 'failed' if i % 2 == 0 else 'success'))
+    mixed.append(('USD_COP', 'retail', 'failed' if i % 20 == 19 else 'success'))
+global_alerts = list(FailureRateMonitor(reference='global').process(replay_records(mixed)))
+assert global_alerts and {alert.key[0] for alert in global_alerts} == {'USD_MXN'}
+print("\n✅ Monitor de anomalías alerta aunque el primer evento haya fallado")
+
 # %% Resumen final
 print("\n" + "="*50)
 print("🎉 TODAS LAS VERIFICACIONES PASARON")
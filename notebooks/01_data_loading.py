@@ -20,7 +20,8 @@ from scripts.data_loader import (
     create_indexes,
     validate_referential_integrity,
     print_validation_report,
-    export_validation_summary
+    export_validation_summary,
+    build_snapshot
 )
 from scripts.sql_queries import get_record_counts_query
 
@@ -200,7 +201,8 @@ if usd_mxn_stats['failure_rate'].iloc[0] > 15:
 # ## 11. Exportar Resumen de Validación
 
 # %%
-# Exportar resumen de validación a archivo de texto
+# Exportar resumen de validación a archivo de texto (y el perfil de calidad
+# completo a data_validation_summary.json, en el mismo directorio)
 export_validation_summary(
     reports=[transactions_report, users_report],
     output_path='../output/data_validation_summary.txt'
@@ -210,9 +212,11 @@ export_validation_summary(
 # ## 12. Guardar Conexión para Siguientes Notebooks
 
 # %%
-# Nota: La base de datos SQLite en memoria persiste solo durante esta sesión
-# Los notebooks subsiguientes necesitarán volver a ejecutar este script de carga o
-# compartiremos el objeto de conexión
+# La base de datos SQLite en memoria persiste solo durante esta sesión, así que
+# se guarda una instantánea en disco que los notebooks siguientes abren en
+# solo lectura con get_connection(snapshot=...) sin volver a cargar los CSV
+snapshot_path = build_snapshot(force=True)
+print(f"✅ Instantánea guardada en {snapshot_path}")
 
 print("\n✅ CARGA DE DATOS COMPLETA")
 print("="*60)
@@ -9,7 +9,6 @@
 # %%
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
 import seaborn as sns
 import sys
 from pathlib import Path
@@ -19,7 +18,8 @@ sys.path.append(str(Path('..').resolve()))
 
 from scripts import sql_queries
 from scripts import visualizations as viz
-from scripts.data_loader import get_connection, load_to_sqlite, create_indexes
+from scripts.data_loader import get_connection, build_snapshot
+from scripts.approximate_engine import ApproximateEngine
 
 # Ensure visualizations directory exists
 Path('../output/visualizations').mkdir(parents=True, exist_ok=True)
@@ -28,15 +28,10 @@ Path('../output/visualizations').mkdir(parents=True, exist_ok=True)
 # ## Cargar Datos
 
 # %%
-# Recreate database connection and load data
-conn = get_connection()
+# Open the shared snapshot read-only (built once from the raw CSVs)
+conn = get_connection(snapshot=build_snapshot())
 
-# Load transactions
-load_to_sqlite('../data/raw/transactions.csv', 'transactions', conn)
-load_to_sqlite('../data/raw/users.csv', 'users', conn)
-create_indexes(conn)
-
-print("✅ Data loaded into SQLite in-memory database")
+print("✅ Data loaded from SQLite snapshot")
 
 # %% [markdown]
 # ## Métrica 1: Volumen del Corredor y Tasas de Éxito
@@ -66,8 +61,6 @@ viz.create_corridor_volume_comparison(
     output_path='../output/visualizations/corridor_volume_comparison.png'
 )
 
-plt.show()
-
 # %% [markdown]
 # ### Visualización: Tasas de Fallo del Corredor
 
@@ -78,8 +71,6 @@ viz.create_corridor_failure_rates(
     output_path='../output/visualizations/corridor_failure_rates.png'
 )
 
-plt.show()
-
 # %% [markdown]
 # ### Insights Clave: Rendimiento del Corredor
 
@@ -133,8 +124,6 @@ viz.create_segment_performance(
     output_path='../output/visualizations/segment_performance.png'
 )
 
-plt.show()
-
 # %% [markdown]
 # ### Insights Clave: Segmentos de Usuario
 
@@ -161,8 +150,8 @@ print(f"\n⚠️  HIGHEST RISK SEGMENT: {highest_failure_seg['user_segment'].cap
 # ## Métrica 3: Patrones Temporales - Tendencias Diarias
 
 # %%
-# Execute daily trend query
-daily_query = sql_queries.daily_trend_query()
+# Execute daily trend query (with trailing 7/28/90-day windows)
+daily_query = sql_queries.rolling_daily_trend_query()
 daily_df = pd.read_sql_query(daily_query, conn)
 
 print(f"\n✅ Retrieved {len(daily_df)} days of transaction data")
@@ -182,8 +171,6 @@ viz.create_daily_trend(
     output_path='../output/visualizations/daily_trend.png'
 )
 
-plt.show()
-
 # %% [markdown]
 # ### Insights Clave: Tendencias Diarias
 
@@ -236,8 +223,6 @@ viz.create_day_of_week_pattern(
     output_path='../output/visualizations/day_of_week_pattern.png'
 )
 
-plt.show()
-
 # %% [markdown]
 # ### Insights Clave: Patrones por Día de la Semana
 
@@ -292,8 +277,6 @@ viz.create_amount_distribution(
     output_path='../output/visualizations/amount_distribution.png'
 )
 
-plt.show()
-
 # %% [markdown]
 # ### Insights Clave: Distribución de Montos
 
@@ -319,6 +302,24 @@ if amount_df['failure_rate'].is_monotonic_increasing:
 else:
     print("   - No clear correlation between amount and failure rate")
 
+# %% [markdown]
+# ## Exploración Rápida: Modo Aproximado
+# Sobre extractos grandes, las mismas consultas se responden desde la muestra
+# estratificada por corredor x segmento de la instantánea, con margen de error
+# (95%) en failure_rate y avg_amount. exact=True vuelve al resultado exacto.
+
+# %%
+approx = ApproximateEngine(conn)
+approx_df = approx.run(sql_queries.corridor_performance_query)
+exact_df = approx.run(sql_queries.corridor_performance_query, exact=True)
+comparison_df = approx_df.merge(exact_df[['corridor', 'failure_rate']], on='corridor',
+                                suffixes=('', '_exact'))
+
+print("\nAPPROXIMATE vs EXACT FAILURE RATE:")
+for _, row in comparison_df.iterrows():
+    print(f"   - {row['corridor']}: {row['failure_rate']:.2f}% ± {row['failure_rate_moe']:.2f} "
+          f"(exact {row['failure_rate_exact']:.2f}%)")
+
 # %% [markdown]
 # ## Resumen: Hallazgos del Análisis de la Parte 1
 
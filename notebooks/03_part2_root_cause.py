@@ -9,7 +9,6 @@
 # %%
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
 import seaborn as sns
 import sys
 from pathlib import Path
@@ -18,7 +17,7 @@ sys.path.append(str(Path('..').resolve()))
 
 from scripts import sql_queries
 from scripts import visualizations as viz
-from scripts.data_loader import get_connection, load_to_sqlite, create_indexes
+from scripts.data_loader import get_connection, build_snapshot, has_denormalized_users
 
 # Ensure output directories exist
 Path('../output/visualizations').mkdir(parents=True, exist_ok=True)
@@ -28,10 +27,8 @@ Path('output').mkdir(parents=True, exist_ok=True)
 # ## Cargar Datos
 
 # %%
-conn = get_connection()
-load_to_sqlite('../data/raw/transactions.csv', 'transactions', conn)
-load_to_sqlite('../data/raw/users.csv', 'users', conn)
-create_indexes(conn)
+# Open the shared snapshot read-only (built once from the raw CSVs)
+conn = get_connection(snapshot=build_snapshot())
 
 print("✅ Data loaded")
 
@@ -39,13 +36,14 @@ print("✅ Data loaded")
 # ## Crear Subconjunto USD→MXN
 
 # %%
-# Create temporary table for USD_MXN analysis
-usd_mxn_create_query = sql_queries.usd_mxn_corridor_query()
-conn.execute(usd_mxn_create_query)
+# Create temporary view for USD_MXN analysis (no row copy; the snapshot
+# already carries the user columns on transactions, so no users join)
+usd_mxn_create_query = sql_queries.usd_mxn_corridor_query(denormalized=has_denormalized_users(conn))
+conn.executescript(usd_mxn_create_query)
 
 # Verify creation
 usd_mxn_count = pd.read_sql_query("SELECT COUNT(*) as count FROM usd_mxn_txns", conn)
-print(f"\n✅ Created USD_MXN temporary table: {usd_mxn_count['count'].iloc[0]:,} transactions")
+print(f"\n✅ Created USD_MXN temporary view: {usd_mxn_count['count'].iloc[0]:,} transactions")
 
 # %% [markdown]
 # ## Hipótesis 1: Análisis de Segmento de Usuario
@@ -53,7 +51,7 @@ print(f"\n✅ Created USD_MXN temporary table: {usd_mxn_count['count'].iloc[0]:,
 # %%
 # Analizar fallos por segmento
 segment_query = sql_queries.usd_mxn_segment_analysis_query()
-usd_mxn_segment_df = pd.read_sql_query(segment_query, conn)
+usd_mxn_segment_df = pd.read_sql_query(segment_query, conn, params=sql_queries.USD_MXN_PARAMS)
 
 print("\n" + "="*80)
 print("USD→MXN: FAILURE RATE BY USER SEGMENT")
@@ -70,7 +68,7 @@ usd_mxn_segment_df.to_csv('../output/csv_exports/usd_mxn_segment_analysis.csv',
 # %%
 # Analizar fallos por rango de monto
 amount_query = sql_queries.usd_mxn_amount_analysis_query()
-usd_mxn_amount_df = pd.read_sql_query(amount_query, conn)
+usd_mxn_amount_df = pd.read_sql_query(amount_query, conn, params=sql_queries.USD_MXN_PARAMS)
 
 print("\n" + "="*80)
 print("USD→MXN: FAILURE RATE BY TRANSACTION AMOUNT")
@@ -81,6 +79,18 @@ print("="*80 + "\n")
 # Save for Excel
 usd_mxn_amount_df.to_csv('../output/csv_exports/usd_mxn_amount_analysis.csv', index=False)
 
+# %%
+# p50/p90/p99 of all and of failed amounts, from the quantile sketches stored
+# with the snapshot (no sort of the transactions)
+quantiles_df = pd.read_sql_query(sql_queries.amount_quantiles_query(), conn)
+usd_mxn_quantiles_df = quantiles_df[quantiles_df['corridor'] == 'USD_MXN']
+
+print("\n" + "="*80)
+print("USD→MXN: AMOUNT QUANTILES BY SEGMENT (ALL vs FAILED)")
+print("="*80)
+print(usd_mxn_quantiles_df.drop(columns='corridor').to_string(index=False))
+print("="*80 + "\n")
+
 # %% [markdown]
 # ## Visualización: Análisis de Causa Raíz USD→MXN
 
@@ -92,15 +102,13 @@ viz.create_usd_mxn_analysis_chart(
     output_path='../output/visualizations/usd_mxn_failure_analysis.png'
 )
 
-plt.show()
-
 # %% [markdown]
 # ## Hipótesis 3: Patrones Temporales
 
 # %%
 # Check monthly trends
 monthly_query = sql_queries.usd_mxn_monthly_trend_query()
-usd_mxn_monthly_df = pd.read_sql_query(monthly_query, conn)
+usd_mxn_monthly_df = pd.read_sql_query(monthly_query, conn, params=sql_queries.USD_MXN_PARAMS)
 
 print("\n" + "="*80)
 print("USD→MXN: MONTHLY FAILURE RATE TREND")
@@ -110,7 +118,7 @@ print("="*80 + "\n")
 
 # Check day of week
 dow_query = sql_queries.usd_mxn_day_of_week_query()
-usd_mxn_dow_df = pd.read_sql_query(dow_query, conn)
+usd_mxn_dow_df = pd.read_sql_query(dow_query, conn, params=sql_queries.USD_MXN_PARAMS)
 
 print("\n" + "="*80)
 print("USD→MXN: FAILURE RATE BY DAY OF WEEK")
@@ -124,7 +132,7 @@ print("="*80 + "\n")
 # %%
 # Check if inactive users have higher failure
 user_status_query = sql_queries.usd_mxn_user_status_query()
-usd_mxn_user_status_df = pd.read_sql_query(user_status_query, conn)
+usd_mxn_user_status_df = pd.read_sql_query(user_status_query, conn, params=sql_queries.USD_MXN_PARAMS)
 
 print("\n" + "="*80)
 print("USD→MXN: FAILURE RATE BY USER ACCOUNT STATUS")
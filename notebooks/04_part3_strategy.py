@@ -14,7 +14,7 @@ from pathlib import Path
 sys.path.append(str(Path('..').resolve()))
 
 from scripts import sql_queries
-from scripts.data_loader import get_connection, load_to_sqlite, create_indexes
+from scripts.data_loader import get_connection, build_snapshot
 
 Path('output').mkdir(parents=True, exist_ok=True)
 
@@ -22,10 +22,8 @@ Path('output').mkdir(parents=True, exist_ok=True)
 # ## Cargar Datos
 
 # %%
-conn = get_connection()
-load_to_sqlite('../data/raw/transactions.csv', 'transactions', conn)
-load_to_sqlite('../data/raw/users.csv', 'users', conn)
-create_indexes(conn)
+# Open the shared snapshot read-only (built once from the raw CSVs)
+conn = get_connection(snapshot=build_snapshot())
 
 print("✅ Data loaded")
 
@@ -6,9 +6,20 @@ visualizations, and deliverable exports for the payment corridor analysis.
 
 Modules:
 - data_loader: CSV to SQLite loading and validation
+- data_profiler: One-pass chunk-wise data-quality profiling
 - sql_queries: Reusable SQL query templates
+- metrics_engine: Single-pass evaluation of the aggregate queries
+- sampling: Stratified reservoir sample maintained during ingest
+- approximate_engine: Sample-based query estimates with margins of error
+- quantile_sketch: Mergeable amount quantile sketches built during ingest
+- pandas_backend: In-memory pandas implementation of the query catalog
+- sharded_executor: Parallel scan over per-month/per-corridor shard files
+- index_planner: Covering index planning from the query catalog
+- query_cache: On-disk query result cache keyed on data versions
 - visualizations: Chart generation and export utilities
 - export_deliverables: Excel and PDF generation
+- task_dag: Parallel make-style build graph for deliverables
+- anomaly_stream: Streaming failure-rate anomaly detection and CSV replay
 """
 
 __version__ = "1.0.0"
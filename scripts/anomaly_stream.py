@@ -0,0 +1,325 @@
+"""
+Streaming Failure-Rate Anomaly Detection for Cobre Payment Corridors
+
+Consumes transaction records one at a time (same fields as transactions.csv)
+and keeps, per corridor x user segment x amount bracket, an exponentially
+weighted failure rate and a one-sided CUSUM of failures above baseline.
+Memory is constant per key, so the monitor can run over an unbounded feed.
+A replay harness streams a CSV through the monitor and reports throughput.
+"""
+
+import argparse
+import bisect
+import sys
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+sys.path.append(str(Path(__file__).parent.parent.resolve()))
+
+from scripts.metrics_engine import AMOUNT_BRACKETS, AMOUNT_EDGES
+
+
+RECORD_FIELDS = ['transaction_id', 'transaction_date', 'transaction_time', 'corridor',
+                 'user_segment', 'amount_usd', 'status']
+
+
+@dataclass
+class Alert:
+    """
+    A failure-rate deviation raised by FailureRateMonitor.
+
+    Attributes:
+        transaction_id: Transaction that triggered the alert
+        timestamp: 'YYYY-MM-DD HH:MM:SS' of that transaction
+        key: (corridor, user_segment, amount_bracket)
+        failure_rate: Recent (fast EWMA) failure rate of the key, in percent
+        baseline_rate: Baseline failure rate it is compared to, in percent
+        cusum: CUSUM statistic at the alert (excess failures)
+        events: Transactions seen for the key so far
+    """
+    transaction_id: str
+    timestamp: str
+    key: Tuple[str, str, str]
+    failure_rate: float
+    baseline_rate: float
+    cusum: float
+    events: int
+
+
+@dataclass
+class _KeyState:
+    """Running counters of one key (constant size)."""
+    events: int = 0
+    failed: int = 0
+    fast_rate: float = 0.0
+    baseline: float = 0.0
+    cusum: float = 0.0
+
+
+class FailureRateMonitor:
+    """
+    Detect failure-rate shifts per corridor, segment and amount bracket.
+
+    For every key the monitor keeps a fast EWMA of the failure indicator (the
+    recent rate) and a slow EWMA (the baseline). A one-sided Bernoulli CUSUM
+    accumulates failed - baseline - slack * baseline per transaction and an
+    alert is raised when it exceeds the threshold; the CUSUM then restarts.
+    For the first warmup transactions the baseline is the running failure
+    rate, so it does not depend on whether the first transaction failed.
+
+    With reference='global', every key is compared to the company-wide
+    baseline instead of its own history, which flags keys that are
+    persistently worse than the rest (e.g. USD_MXN) rather than only changes.
+    The global baseline warms up the same way over the first records.
+
+    Example:
+        monitor = FailureRateMonitor()
+        for record in iter_csv_records('data/raw/transactions.csv'):
+            alert = monitor.update(record)
+    """
+
+    def __init__(
+        self,
+        fast_alpha: float = 0.05,
+        baseline_alpha: float = 0.002,
+        slack: float = 0.5,
+        threshold: float = 8.0,
+        warmup: int = 200,
+        reference: str = 'key'
+    ):
+        """
+        Args:
+            fast_alpha: EWMA weight of the recent failure rate
+            baseline_alpha: EWMA weight of the baseline failure rate
+            slack: Tolerated relative increase over baseline before the
+                CUSUM accumulates (0.5 = 50% above baseline)
+            threshold: CUSUM value (excess failures) that raises an alert
+            warmup: Transactions per key before alerts are raised (and
+                before the baselines switch from running rate to EWMA)
+            reference: 'key' (each key's own baseline) or 'global'
+
+        Raises:
+            ValueError: If reference is not supported
+        """
+        if reference not in ('key', 'global'):
+            raise ValueError(f"Unsupported reference: {reference}")
+        self.fast_alpha = fast_alpha
+        self.baseline_alpha = baseline_alpha
+        self.slack = slack
+        self.threshold = threshold
+        self.warmup = warmup
+        self.reference = reference
+        self.states: Dict[Tuple[str, str, str], _KeyState] = {}
+        self.global_state = _KeyState()
+        self.alerts = 0
+
+    def _observe(self, state: _KeyState, failed: int) -> None:
+        """Add one observation to the counters and EWMAs of a state."""
+        if state.events == 0:
+            state.fast_rate = float(failed)
+        else:
+            state.fast_rate += self.fast_alpha * (failed - state.fast_rate)
+        state.events += 1
+        state.failed += failed
+        if state.events <= max(self.warmup, 1):
+            # The slow EWMA would keep the 0% or 100% of its first observation
+            # for ~1/baseline_alpha events, so it starts from the running rate
+            state.baseline = state.failed / state.events
+        else:
+            state.baseline += self.baseline_alpha * (failed - state.baseline)
+
+    def update(self, record: Dict[str, object]) -> Optional[Alert]:
+        """
+        Consume one transaction record.
+
+        Args:
+            record: Mapping with corridor, user_segment, amount_usd, status,
+                transaction_id, transaction_date and transaction_time
+
+        Returns:
+            Alert if the record pushes its key over the CUSUM threshold, else None
+        """
+        bracket = AMOUNT_BRACKETS[bisect.bisect_right(AMOUNT_EDGES, record['amount_usd'])]
+        key = (record['corridor'], record['user_segment'], bracket)
+        state = self.states.get(key)
+        if state is None:
+            state = self.states[key] = _KeyState()
+        failed = 1 if record['status'] == 'failed' else 0
+
+        baseline_state = self.global_state if self.reference == 'global' else state
+        baseline = baseline_state.baseline if baseline_state.events else float(failed)
+
+        # CUSUM against the baseline before this observation
+        state.cusum = max(0.0, state.cusum + failed - baseline * (1 + self.slack))
+
+        self._observe(state, failed)
+        if self.reference == 'global':
+            self._observe(self.global_state, failed)
+
+        if state.events < self.warmup or state.cusum < self.threshold:
+            return None
+        alert = Alert(
+            transaction_id=str(record.get('transaction_id')),
+            timestamp=f"{record.get('transaction_date')} {record.get('transaction_time')}",
+            key=key,
+            failure_rate=round(100.0 * state.fast_rate, 2),
+            baseline_rate=round(100.0 * baseline, 2),
+            cusum=round(state.cusum, 2),
+            events=state.events
+        )
+        state.cusum = 0.0
+        self.alerts += 1
+        return alert
+
+    def process(self, records: Iterable[Dict[str, object]]) -> Iterator[Alert]:
+        """
+        Consume a stream of records, yielding alerts as they are raised.
+
+        Args:
+            records: Iterable of transaction records
+
+        Yields:
+            Alert objects
+        """
+        for record in records:
+            alert = self.update(record)
+            if alert is not None:
+                yield alert
+
+    def summary(self) -> pd.DataFrame:
+        """
+        Current counters per key.
+
+        Returns:
+            DataFrame with corridor, user_segment, amount_bracket, events,
+            failed, failure_rate, recent_rate and baseline_rate, sorted by
+            failure_rate descending
+        """
+        rows = [
+            {
+                'corridor': key[0], 'user_segment': key[1], 'amount_bracket': key[2],
+                'events': state.events, 'failed': state.failed,
+                'failure_rate': round(100.0 * state.failed / state.events, 2),
+                'recent_rate': round(100.0 * state.fast_rate, 2),
+                'baseline_rate': round(100.0 * state.baseline, 2)
+            }
+            for key, state in self.states.items()
+        ]
+        return (pd.DataFrame(rows)
+                .sort_values('failure_rate', ascending=False, kind='stable')
+                .reset_index(drop=True))
+
+
+def iter_csv_records(
+    csv_path: str,
+    chunksize: int = 50_000,
+    order_by_time: bool = True
+) -> Iterator[Dict[str, object]]:
+    """
+    Stream transaction records from a CSV.
+
+    Args:
+        csv_path: Path to a CSV with the transactions.csv schema
+        chunksize: Rows read per chunk when streaming in file order
+        order_by_time: Replay in transaction_date/transaction_time order
+            (reads the whole file); False streams chunks in file order
+
+    Yields:
+        Dictionaries with the RECORD_FIELDS of each transaction
+    """
+    if order_by_time:
+        df = pd.read_csv(csv_path, usecols=RECORD_FIELDS)
+        chunks = [df.sort_values(['transaction_date', 'transaction_time'], kind='stable')]
+    else:
+        chunks = pd.read_csv(csv_path, usecols=RECORD_FIELDS, chunksize=chunksize)
+    for chunk in chunks:
+        columns = [chunk[field].tolist() for field in RECORD_FIELDS]
+        for values in zip(*columns):
+            yield dict(zip(RECORD_FIELDS, values))
+
+
+def replay(
+    csv_path: str,
+    monitor: Optional[FailureRateMonitor] = None,
+    rate: Optional[float] = None,
+    order_by_time: bool = True
+) -> Dict[str, object]:
+    """
+    Stream a CSV through a monitor and measure throughput.
+
+    Args:
+        csv_path: Path to a CSV with the transactions.csv schema
+        monitor: Monitor to feed (default: FailureRateMonitor())
+        rate: Target events per second (None = as fast as possible)
+        order_by_time: Replay in timestamp order (see iter_csv_records)
+
+    Returns:
+        Dictionary with events, alerts (list of Alert), seconds and
+        events_per_second (measured over the monitor updates, excluding
+        the CSV read when not throttled)
+    """
+    monitor = monitor or FailureRateMonitor()
+    records = list(iter_csv_records(csv_path, order_by_time=order_by_time)) if rate is None \
+        else iter_csv_records(csv_path, order_by_time=order_by_time)
+
+    alerts: List[Alert] = []
+    events = 0
+    start = time.perf_counter()
+    for record in records:
+        alert = monitor.update(record)
+        if alert is not None:
+            alerts.append(alert)
+        events += 1
+        if rate:
+            # Sleep until this event's slot in the target schedule
+            delay = events / rate - (time.perf_counter() - start)
+            if delay > 0:
+                time.sleep(delay)
+    seconds = time.perf_counter() - start
+
+    return {
+        'events': events,
+        'alerts': alerts,
+        'seconds': seconds,
+        'events_per_second': events / seconds if seconds else float('inf')
+    }
+
+
+def main(csv_path: str, rate: Optional[float] = None, reference: str = 'key') -> None:
+    """
+    Replay a transactions CSV and print alerts and throughput.
+
+    Args:
+        csv_path: Path to a CSV with the transactions.csv schema
+        rate: Target events per second (None = as fast as possible)
+        reference: Baseline reference of the monitor, 'key' or 'global'
+    """
+    monitor = FailureRateMonitor(reference=reference)
+    result = replay(csv_path, monitor, rate=rate)
+
+    print("\n" + "="*80)
+    print("STREAMING FAILURE-RATE MONITOR - REPLAY")
+    print("="*80)
+    for alert in result['alerts']:
+        corridor, segment, bracket = alert.key
+        print(f"  🚨 {alert.timestamp} {corridor:8} {segment:10} {bracket:9} "
+              f"recent {alert.failure_rate:6.2f}% vs baseline {alert.baseline_rate:6.2f}%")
+    print("="*80)
+    print(f"✅ {result['events']:,} events, {len(result['alerts'])} alerts, "
+          f"{result['events_per_second']:,.0f} events/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay transactions through the failure-rate monitor")
+    parser.add_argument('csv_path', nargs='?', default='data/raw/transactions.csv',
+                        help="CSV with the transactions.csv schema")
+    parser.add_argument('--rate', type=float, default=None,
+                        help="Target events per second (default: as fast as possible)")
+    parser.add_argument('--reference', choices=['key', 'global'], default='key',
+                        help="Compare each key to its own baseline or to the company-wide one")
+    args = parser.parse_args()
+    main(args.csv_path, rate=args.rate, reference=args.reference)
@@ -0,0 +1,270 @@
+"""
+Approximate Query Engine for Cobre Payment Corridor Analysis
+
+Answers the aggregate sql_queries result shapes from the stratified sample
+kept at load time (load_to_sqlite(..., sample_size=N)) instead of the full
+table, so the cost depends on the sample size only. Counts and values are
+weighted estimates, rates are ratio estimates, and every failure_rate and
+avg_amount column comes with a margin of error (<metric>_moe, same units).
+The same engine switches back to exact results with exact=True.
+"""
+
+import sqlite3
+from typing import Callable, Optional
+
+import numpy as np
+import pandas as pd
+
+from scripts.data_loader import has_denormalized_users
+from scripts.metrics_engine import (
+    GRAIN, STATE_MEASURES, MetricsEngine, amount_bracket_codes, sql_round
+)
+from scripts.sampling import STRATA, sample_tables
+
+
+# Normal quantile of the reported margins of error (95% confidence)
+CONFIDENCE_Z = 1.96
+
+# Unweighted sums per cell, kept next to the estimates for the variances
+SAMPLE_MEASURES = ['sample_count', 'sample_failed', 'sample_amount', 'sample_amount_sq']
+
+# Estimated counts, reported as whole numbers
+COUNT_COLUMNS = ('txn_count', 'successful', 'failed', 'total_transactions', 'volume')
+
+# Ratio metrics with a margin of error: (column, sample sum, sample sum of squares, scale)
+MARGIN_METRICS = [
+    ('failure_rate', 'sample_failed', 'sample_failed', 100.0),
+    ('avg_amount', 'sample_amount', 'sample_amount_sq', 1.0)
+]
+
+
+class ApproximateEngine(MetricsEngine):
+    """
+    Serve sql_queries result shapes from the stratified sample of a table.
+
+    Each sampled row stands for population / sampled rows of its corridor x
+    segment stratum. The partial aggregate and rollups are the ones of
+    MetricsEngine, with weighted measures, so every supported query keeps
+    its columns and order. Margins of error come from the linearized
+    variance of a stratified ratio estimator (with finite population
+    correction), so strata sampled in full contribute no error.
+
+    min_amount and max_amount are the sample extremes. Queries that the
+    sample cannot estimate (COUNT(DISTINCT user_id) in
+    user_segment_analysis_query, record counts, row-level views) run
+    exactly on the full table.
+
+    Example:
+        engine = ApproximateEngine(conn)
+        engine.run(sql_queries.corridor_performance_query)              # estimate
+        engine.run(sql_queries.corridor_performance_query, exact=True)  # full scan
+    """
+
+    def __init__(
+        self,
+        conn: sqlite3.Connection,
+        table_name: str = 'transactions',
+        exact: bool = False,
+        cache=None,
+        z: float = CONFIDENCE_Z
+    ):
+        """
+        Args:
+            conn: SQLite connection with the table and its sample tables
+            table_name: Sampled table
+            exact: Default mode of run() (False = estimates from the sample)
+            cache: QueryCache for exact results (estimates are never cached)
+            z: Normal quantile of the margins of error
+        """
+        super().__init__(conn, table_name, cache=None)
+        self.exact = exact
+        self.z = z
+        self.strata = None
+        self._exact_cache = cache
+        self._exact_engine = None
+        del self._handlers['user_segment_analysis_query']
+
+    def run(self, query_fn: Callable[[], str], exact: Optional[bool] = None) -> pd.DataFrame:
+        """
+        Return the estimated (or exact) result of a sql_queries function.
+
+        Args:
+            query_fn: Query function from sql_queries
+            exact: True for the exact result, False for the estimate
+                (default: the engine's mode)
+
+        Returns:
+            DataFrame with the columns of the SQL, plus <metric>_moe after
+            failure_rate and avg_amount when estimated
+        """
+        if self.exact if exact is None else exact:
+            if self._exact_engine is None:
+                self._exact_engine = MetricsEngine(self.conn, self.table_name, cache=self._exact_cache)
+            return self._exact_engine.run(query_fn)
+        return super().run(query_fn)
+
+    def _scan(self) -> pd.DataFrame:
+        """
+        Read the sampled rows with their weights.
+
+        Raises:
+            ValueError: If the table was loaded without a sample
+        """
+        rows_table, strata_table = sample_tables(self.table_name)
+        found = self.conn.execute(
+            "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name IN (?, ?)",
+            (rows_table, strata_table)
+        ).fetchone()[0]
+        if found < 2:
+            raise ValueError(
+                f"{self.table_name} has no sample; load it with load_to_sqlite(..., sample_size=N)"
+            )
+        self.strata = pd.read_sql_query(
+            f'SELECT {", ".join(STRATA)}, population, sampled FROM "{strata_table}"', self.conn
+        )
+        return self._weighted(pd.read_sql_query(
+            f"""
+            SELECT transaction_date, hour, corridor, user_segment,
+                   user_id, amount_usd, status
+            FROM "{rows_table}"
+            """,
+            self.conn
+        ))
+
+    def _weighted(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Add sample_weight (stratum population / stratum sample size) to sampled rows."""
+        weights = self.strata.set_index(STRATA)
+        weights = (weights['population'] / weights['sampled']).rename('sample_weight')
+        return df.join(weights, on=STRATA)
+
+    def _reduce(self, df: pd.DataFrame) -> None:
+        """Reduce the weighted sample to the partial aggregate (plus sample sums)."""
+        df['amount_bracket'] = amount_bracket_codes(df['amount_usd'])
+        self.aggregate = self._aggregate(df, GRAIN)
+
+    @staticmethod
+    def _aggregate(df: pd.DataFrame, keys) -> pd.DataFrame:
+        """
+        Weighted aggregate states of sampled rows, one per key and stratum.
+
+        Args:
+            df: Sampled rows with sample_weight, amount_usd and status
+            keys: Columns to group by (the strata columns are added)
+
+        Returns:
+            DataFrame with the keys, STATE_MEASURES (estimates) and SAMPLE_MEASURES
+        """
+        weight = df['sample_weight']
+        amount = df['amount_usd']
+        is_success = df['status'] == 'success'
+        failed = (df['status'] == 'failed').astype('int64')
+        cells = pd.DataFrame({
+            'txn_count': weight,
+            'successful': weight * is_success,
+            'failed': weight * failed,
+            'total_value': weight * amount,
+            'success_value': weight * amount.where(is_success, 0.0),
+            'min_amount': amount,
+            'max_amount': amount,
+            'sample_count': 1,
+            'sample_failed': failed,
+            'sample_amount': amount,
+            'sample_amount_sq': amount ** 2
+        })
+        by = list(keys) + [col for col in STRATA if col not in keys]
+        measures = {**STATE_MEASURES, **{measure: 'sum' for measure in SAMPLE_MEASURES}}
+        return (
+            cells.join(df[by])
+            .groupby(by, sort=False, dropna=False, observed=True)
+            .agg(**{measure: (measure, how) for measure, how in measures.items()})
+            .reset_index()
+        )
+
+    def _rollup(self, keys, aggregate: pd.DataFrame = None) -> pd.DataFrame:
+        """Rollup of the weighted aggregate with the margins of error of each group."""
+        if aggregate is None:
+            aggregate = self._partial()
+        keys = [keys] if isinstance(keys, str) else list(keys)
+        df = super()._rollup(keys, aggregate)
+        return df.merge(self._margins(aggregate, keys), on=keys, how='left')
+
+    def _margins(self, aggregate: pd.DataFrame, keys: list) -> pd.DataFrame:
+        """
+        Margins of error of the ratio metrics of each group.
+
+        For a group ratio R = Y / X, the linearized variable of a sampled row
+        is z = (y - R x) / X with x = 1 inside the group, so per stratum h
+        Var = N_h^2 (1 - n_h / N_h) s_h^2 / n_h, where s_h^2 is the sample
+        variance of z over the n_h rows of the stratum (0 outside the group).
+
+        Args:
+            aggregate: Aggregate with the keys, strata and SAMPLE_MEASURES
+            keys: Group columns
+
+        Returns:
+            DataFrame with the keys and one <metric>_moe column per MARGIN_METRICS
+        """
+        by = keys + [col for col in STRATA if col not in keys]
+        cells = (
+            aggregate.groupby(by, sort=False, dropna=False)[SAMPLE_MEASURES].sum()
+            .reset_index()
+            .merge(self.strata, on=STRATA, how='left')
+        )
+        count, sampled, population = cells['sample_count'], cells['sampled'], cells['population']
+        weight = population / sampled
+        # Strata with a single sampled row have no variance estimate
+        scale = np.where(
+            sampled > 1,
+            population ** 2 * (1 - sampled / population) / (sampled * (sampled - 1).clip(lower=1)),
+            0.0
+        )
+        groups = cells[keys].copy()
+        groups['_x'] = weight * count
+        for metric, total, _, _ in MARGIN_METRICS:
+            groups[f'_{metric}'] = weight * cells[total]
+        sums = groups.groupby(keys, sort=False, dropna=False).transform('sum')
+        components = []
+        for metric, total, squares, _ in MARGIN_METRICS:
+            ratio = sums[f'_{metric}'] / sums['_x']
+            sum_z = cells[total] - ratio * count
+            sum_z2 = cells[squares] - 2 * ratio * cells[total] + ratio ** 2 * count
+            components.append(
+                (scale * (sum_z2 - sum_z ** 2 / sampled).clip(lower=0) / sums['_x'] ** 2)
+                .rename(metric)
+            )
+        variance = pd.concat([cells[keys]] + components, axis=1)
+        variance = variance.groupby(keys, sort=False, dropna=False).sum().reset_index()
+        for metric, _, _, factor in MARGIN_METRICS:
+            variance[f'{metric}_moe'] = sql_round(self.z * factor * np.sqrt(variance.pop(metric)))
+        return variance
+
+    def _select(self, df: pd.DataFrame, columns) -> pd.DataFrame:
+        """Output columns with margins after their metric and counts as whole numbers."""
+        columns = list(columns)
+        for metric, _, _, _ in MARGIN_METRICS:
+            if metric in columns and f'{metric}_moe' in df.columns:
+                columns.insert(columns.index(metric) + 1, f'{metric}_moe')
+        df = df[columns].copy()
+        for col in df.columns:
+            if col in COUNT_COLUMNS or col.startswith('txn_count_'):
+                df[col] = np.floor(df[col] + 0.5).astype('int64')
+        return df
+
+    def _drill_user_status(self) -> pd.DataFrame:
+        """User status breakdown of every corridor from the sample (sample x users join)."""
+        self._partial()
+        rows_table = sample_tables(self.table_name)[0]
+        if has_denormalized_users(self.conn, self.table_name):
+            sql = f'SELECT corridor, user_segment, user_status, amount_usd, status FROM "{rows_table}"'
+        else:
+            sql = f"""
+            SELECT s.corridor, s.user_segment, u.status as user_status, s.amount_usd, s.status
+            FROM "{rows_table}" s
+            LEFT JOIN users u ON s.user_id = u.user_id
+            """
+        df = self._weighted(pd.read_sql_query(sql, self.conn))
+        keys = ['corridor', 'user_status']
+        df = self._rollup(keys, self._aggregate(df, keys))
+        # SQLite sorts the NULL group (transactions without a user) first
+        df = df.sort_values(keys, na_position='first', kind='stable').reset_index(drop=True)
+        return self._select(df, ['corridor', 'user_status', 'txn_count', 'failure_rate', 'avg_amount'])
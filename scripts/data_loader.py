@@ -4,35 +4,207 @@ Utilidades de Carga de Datos para el Análisis del Corredor de Pagos Cobre
 Funciones para cargar archivos CSV en una base de datos SQLite en memoria con validación.
 """
 
+import hashlib
+import json
+import os
+import numpy as np
 import pandas as pd
 import sqlite3
+import time
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Dict, Tuple
+from typing import Dict, Optional, Sequence, Tuple
 
+from scripts import sql_queries
+from scripts.data_profiler import DataProfiler
+from scripts.index_planner import plan_indexes
+from scripts.quantile_sketch import AmountSketches, sketch_table
+from scripts.sampling import DEFAULT_SAMPLE_SIZE, StratifiedReservoir, sample_tables
+from scripts.sql_queries import CUBE_TABLE, cube_build_query
 
-def get_connection() -> sqlite3.Connection:
+
+# Versión del formato de caché; incrementarla invalida todas las cachés existentes
+CACHE_VERSION = 3
+
+# Tabla con la versión de datos de cada tabla cargada (usada por la caché de consultas)
+DATA_VERSIONS_TABLE = '_data_versions'
+
+# Columnas derivadas de fecha/hora que se agregan a transactions durante la carga
+DATE_PART_COLUMNS = ['dow', 'hour', 'year_month', 'transaction_ts']
+
+# Codificación por diccionario (load_to_sqlite con encode=True): metadatos por
+# columna y máximo de valores distintos para codificar una columna de texto
+ENCODINGS_TABLE = '_column_encodings'
+MAX_DICTIONARY_SIZE = 256
+
+# IDs con prefijo y parte numérica, p. ej. TXN_000001 o USR_3445
+_ID_PATTERN = r'^([A-Za-z]+_)(\d+)$'
+
+# Desnormalización de users en transactions (load_to_sqlite con denormalize_users):
+# columna de users -> columna agregada a transactions, igual que en usd_mxn_txns
+USER_ATTRIBUTES = {
+    'country': 'user_country',
+    'status': 'user_status',
+    'registration_date': 'user_reg_date'
+}
+USER_KEY_COLUMN = 'user_key'
+
+# Sufijo de la entrada de _data_versions con la versión de users desnormalizada
+DENORMALIZED_SUFFIX = '+users'
+
+# Máximo de posiciones del arreglo denso de búsqueda por usuario cargado
+# (IDs más dispersos usan búsqueda por hash)
+DENSE_LOOKUP_FACTOR = 16
+
+# PRAGMAs de SQLite durante una carga masiva (ver bulk_load_settings)
+BULK_PRAGMAS = {
+    'journal_mode': 'OFF',
+    'synchronous': 'OFF',
+    'cache_size': -262144,  # 256 MB (negativo = KiB)
+    'temp_store': 'MEMORY'
+}
+
+# Filas por lote de executemany en la carga masiva
+BULK_BATCH_SIZE = 100_000
+
+# Instantánea compartida de la base de datos cargada (ver build_snapshot)
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_SNAPSHOT = PROJECT_ROOT / 'data' / '.snapshot' / 'analysis.sqlite'
+SNAPSHOT_SOURCES = {
+    'transactions': PROJECT_ROOT / 'data' / 'raw' / 'transactions.csv',
+    'users': PROJECT_ROOT / 'data' / 'raw' / 'users.csv'
+}
+
+# Bytes de la instantánea mapeados en memoria al abrirla en modo lectura
+SNAPSHOT_MMAP_SIZE = 256 * 1024 * 1024
+
+
+def get_connection(
+    snapshot: Optional[str] = None,
+    mode: str = 'readonly',
+    mmap_size: int = SNAPSHOT_MMAP_SIZE
+) -> sqlite3.Connection:
     """
     Crea una conexión a base de datos SQLite en memoria.
 
+    Con snapshot, la conexión se abre sobre una instantánea creada con
+    build_snapshot en lugar de una base vacía, sin volver a cargar los CSV.
+
+    Argumentos:
+        snapshot: Ruta a una instantánea (por defecto, base en memoria vacía)
+        mode: 'readonly' abre el archivo en solo lectura con mmap (varios
+            procesos pueden compartirlo); 'memory' lo deserializa en una base
+            en memoria modificable
+        mmap_size: Bytes mapeados en memoria en modo 'readonly' (0 lo desactiva)
+
     Retorna:
-        sqlite3.Connection: Conexión a base de datos en memoria
+        sqlite3.Connection: Conexión a la base en memoria o a la instantánea
+
+    Ejemplo:
+        >>> conn = get_connection(snapshot=build_snapshot())
     """
-    conn = sqlite3.connect(':memory:')
+    if snapshot is None:
+        return sqlite3.connect(':memory:')
+
+    path = Path(snapshot).resolve()
+    if not path.exists():
+        raise FileNotFoundError(f"No existe la instantánea: {path}")
+
+    if mode == 'readonly':
+        # Las tablas y vistas TEMP (p. ej. usd_mxn_txns) siguen permitidas en solo lectura
+        conn = sqlite3.connect(f"{path.as_uri()}?mode=ro", uri=True)
+        conn.execute(f"PRAGMA mmap_size = {int(mmap_size)}")
+    elif mode == 'memory':
+        conn = sqlite3.connect(':memory:')
+        if hasattr(conn, 'deserialize'):
+            conn.deserialize(path.read_bytes())
+        else:
+            with sqlite3.connect(f"{path.as_uri()}?mode=ro", uri=True) as source:
+                source.backup(conn)
+    else:
+        raise ValueError(f"Modo de instantánea no soportado: {mode}")
     return conn
 
 
 def load_to_sqlite(
     csv_path: str,
     table_name: str,
-    conn: sqlite3.Connection
+    conn: sqlite3.Connection,
+    use_cache: bool = True,
+    cache_dir: Optional[str] = None,
+    chunksize: Optional[int] = None,
+    incremental: bool = False,
+    encode: bool = False,
+    bulk: bool = False,
+    denormalize_users: Optional[str] = None,
+    sample_size: Optional[int] = None,
+    sketch_amounts: bool = False
 ) -> Dict[str, any]:
     """
     Carga un archivo CSV en una tabla SQLite con validación exhaustiva.
 
+    Si la caché está habilitada, primero se busca una copia SQLite pre-construida
+    de la tabla asociada al hash del contenido del CSV. Solo se vuelve a parsear
+    el CSV cuando el archivo fuente cambia (tamaño, mtime y hash SHA-256).
+
+    Con chunksize, el CSV se procesa por bloques con memoria acotada: cada bloque
+    se inserta con executemany dentro de una única transacción y el reporte de
+    validación se acumula de forma incremental.
+
+    Con incremental=True y la tabla ya existente, solo se agregan las filas
+    nuevas (ver append_new_rows) en lugar de reemplazar la tabla completa.
+
+    Con encode=True (opcional, desactivado por defecto), las columnas de texto
+    de baja cardinalidad se guardan como códigos enteros con tablas de búsqueda
+    y los IDs con prefijo (TXN_000001) como enteros (ver encode_dataframe). Los
+    datos quedan en <tabla>_encoded y <tabla> pasa a ser una vista que los
+    decodifica, por lo que las consultas de sql_queries funcionan sin cambios.
+    La vista es solo de compatibilidad: decodifica cada fila (printf y JOIN con
+    las tablas de búsqueda) antes de agrupar, así que el SQL directo es más
+    lento que sobre la tabla sin codificar. La codificación reduce el tamaño de
+    la tabla, de los índices y de los DataFrames; los recorridos que agrupan
+    por códigos son los de MetricsEngine y PandasBackend.
+
+    Con bulk=True, la carga se hace con los PRAGMAs de bulk_load_settings y por
+    lotes de BULK_BATCH_SIZE filas con executemany en una única transacción.
+    Pensado para bases en archivo (p. ej. web/public/assessment.db): crear los
+    índices después con create_indexes(conn, analyze=True).
+
+    Con denormalize_users (nombre de una tabla de usuarios ya cargada), los
+    atributos de cada usuario se resuelven una sola vez durante la carga y se
+    guardan en la tabla como user_key (parte numérica del ID), user_country,
+    user_status y user_reg_date (ver USER_ATTRIBUTES), igual que en la vista
+    usd_mxn_txns. Las consultas por estado o antigüedad del usuario dejan de
+    necesitar el JOIN con users, y las transacciones huérfanas (user_key nulo)
+    se cuentan en el reporte como subproducto de la carga.
+
+    Con sample_size, durante la misma pasada se mantiene una muestra
+    estratificada por corredor x segmento (hasta sample_size filas por
+    estrato, ver StratifiedReservoir) que se guarda en <tabla>_sample y
+    <tabla>_sample_strata y alimenta el modo aproximado (ApproximateEngine).
+    Las cargas incrementales posteriores actualizan la muestra existente.
+
+    Con sketch_amounts=True, en la misma pasada se construyen sketches de
+    cuantiles (t-digest) de amount_usd por corredor x segmento, sobre todas
+    las transacciones y sobre las fallidas (ver AmountSketches). Se guardan en
+    <tabla>_amount_sketch, se actualizan con las cargas incrementales y se
+    consultan con sql_queries.amount_quantiles_query.
+
     Argumentos:
         csv_path: Ruta al archivo CSV
         table_name: Nombre de la tabla SQLite de destino
         conn: Objeto de conexión SQLite
+        use_cache: Si True, consulta/actualiza la caché en disco
+        cache_dir: Directorio de la caché (por defecto '.cache' junto al CSV)
+        chunksize: Filas por bloque para la carga en streaming (None = todo en memoria)
+        incremental: Si True, agrega solo filas nuevas a una tabla existente
+        encode: Si True, guarda la tabla codificada por diccionario (ver arriba)
+        bulk: Si True, usa el modo de carga masiva
+        denormalize_users: Tabla de usuarios a desnormalizar en esta tabla
+            (None = sin desnormalizar)
+        sample_size: Filas por estrato de la muestra estratificada
+            (None = sin muestra)
+        sketch_amounts: Si True, construye los sketches de cuantiles de montos
 
     Retorna:
         Dict conteniendo el reporte de validación:
@@ -42,11 +214,223 @@ def load_to_sqlite(
             - duplicates: Número de registros duplicados
             - date_range: Tupla de (fecha_min, fecha_max) si existen columnas de fecha
             - status: 'PASS' (Aprobado) o 'FAIL' (Fallo)
+            - cached: True si la tabla se restauró desde la caché
+            - orphaned_transactions: Filas sin usuario (solo con denormalize_users)
+
+    En todos los casos se registra la versión de datos de la tabla (ver
+    get_data_version), derivada del hash del contenido del CSV (y de la
+    versión de la tabla de usuarios si se desnormaliza).
     """
+    if encode and chunksize:
+        raise ValueError("encode=True requiere la carga en memoria (sin chunksize)")
+
+    if bulk:
+        with bulk_load_settings(conn):
+            return load_to_sqlite(
+                csv_path, table_name, conn, use_cache=use_cache, cache_dir=cache_dir,
+                chunksize=chunksize or (None if encode else BULK_BATCH_SIZE),
+                incremental=incremental, encode=encode, denormalize_users=denormalize_users,
+                sample_size=sample_size, sketch_amounts=sketch_amounts
+            )
+
+    if incremental and get_column_encodings(conn, table_name):
+        raise ValueError(f"La tabla {table_name} está codificada; la carga incremental no está soportada")
+
+    if incremental and (denormalize_users or _has_user_columns(conn, table_name)):
+        raise ValueError(f"La carga incremental no está soportada con usuarios desnormalizados ({table_name})")
+
+    if incremental and _table_exists(conn, table_name):
+        report = append_new_rows(csv_path, table_name, conn, chunksize)
+        report['cached'] = False
+        return report
+
+    lookup = _user_lookup(conn, denormalize_users) if denormalize_users else None
+    # Resúmenes que se construyen en la misma pasada que la carga
+    summaries = []
+    if sample_size:
+        summaries.append(StratifiedReservoir(sample_size))
+    if sketch_amounts:
+        summaries.append(AmountSketches())
+
+    if not use_cache:
+        report = _load_csv(csv_path, table_name, conn, chunksize, encode, lookup, summaries)
+        _set_versions(conn, table_name, _hash_file(Path(csv_path)), lookup)
+        report['cached'] = False
+        return report
+
+    cache = _resolve_cache(csv_path, table_name, cache_dir, encode, lookup, summaries)
+    report = _restore_from_cache(cache, table_name, conn)
+    if report is not None:
+        report['file'] = csv_path
+        report['cached'] = True
+    else:
+        report = _load_csv(csv_path, table_name, conn, chunksize, encode, lookup, summaries)
+        _write_cache(cache, table_name, conn, report)
+        report['cached'] = False
+
+    _set_versions(conn, table_name, cache['fingerprint']['sha256'], lookup)
+    return report
+
+
+def _set_versions(
+    conn: sqlite3.Connection,
+    table_name: str,
+    source_version: str,
+    lookup: Optional[Dict[str, any]]
+) -> None:
+    """
+    Registra la versión de datos de una tabla recién cargada.
+
+    Si la tabla se desnormalizó, su versión combina la del CSV con la de la
+    tabla de usuarios (los resultados cacheados dependen de ambas) y se
+    registra aparte la versión de usuarios usada (ver has_denormalized_users).
+
+    Argumentos:
+        conn: Objeto de conexión SQLite
+        table_name: Nombre de la tabla
+        source_version: Hash SHA-256 del CSV fuente
+        lookup: Búsqueda de usuarios de _user_lookup (None = sin desnormalizar)
+    """
+    marker = f"{table_name}{DENORMALIZED_SUFFIX}"
+    if lookup is None:
+        set_data_version(conn, table_name, source_version)
+        if _table_exists(conn, DATA_VERSIONS_TABLE):
+            conn.execute(f"DELETE FROM {DATA_VERSIONS_TABLE} WHERE table_name = ?", (marker,))
+            conn.commit()
+        return
+    combined = hashlib.sha256(f"{source_version}:{lookup['version']}".encode()).hexdigest()
+    set_data_version(conn, table_name, combined)
+    set_data_version(conn, marker, lookup['version'])
+
+
+def has_denormalized_users(
+    conn: sqlite3.Connection,
+    table_name: str = 'transactions',
+    users_table: str = 'users'
+) -> bool:
+    """
+    Indica si una tabla tiene los atributos de usuario desnormalizados y al día.
+
+    Argumentos:
+        conn: Objeto de conexión SQLite
+        table_name: Tabla cargada con denormalize_users
+        users_table: Tabla de usuarios
+
+    Retorna:
+        True si la tabla se desnormalizó contra la versión actual de users_table
+    """
+    users_version = get_data_version(conn, users_table)
+    return (users_version is not None
+            and get_data_version(conn, f"{table_name}{DENORMALIZED_SUFFIX}") == users_version
+            and _has_user_columns(conn, table_name))
+
+
+@contextmanager
+def bulk_load_settings(conn: sqlite3.Connection):
+    """
+    Aplica los PRAGMAs de carga masiva (BULK_PRAGMAS) y restaura los previos al salir.
+
+    Sin journal ni sincronización a disco, una caída durante la carga puede
+    dejar el archivo corrupto: usar solo para bases que se pueden regenerar
+    desde los CSV.
+
+    Argumentos:
+        conn: Objeto de conexión SQLite
+
+    Ejemplo:
+        with bulk_load_settings(conn):
+            load_to_sqlite('data/raw/transactions.csv', 'transactions', conn, bulk=True)
+            create_indexes(conn, analyze=True)
+    """
+    previous = {name: conn.execute(f"PRAGMA {name}").fetchone()[0] for name in BULK_PRAGMAS}
+    conn.commit()
+    for name, value in BULK_PRAGMAS.items():
+        conn.execute(f"PRAGMA {name} = {value}")
+    try:
+        yield conn
+    finally:
+        conn.commit()
+        for name, value in previous.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+
+
+def set_data_version(conn: sqlite3.Connection, table_name: str, version: str) -> None:
+    """
+    Registra la versión de datos de una tabla.
+
+    La versión identifica el contenido de la tabla: cambia cada vez que
+    load_to_sqlite la reemplaza o le agrega filas, lo que invalida
+    automáticamente los resultados cacheados que dependen de ella.
+
+    Argumentos:
+        conn: Objeto de conexión SQLite
+        table_name: Nombre de la tabla
+        version: Identificador del contenido (p. ej. hash SHA-256)
+    """
+    conn.execute(
+        f"CREATE TABLE IF NOT EXISTS {DATA_VERSIONS_TABLE} "
+        "(table_name TEXT PRIMARY KEY, version TEXT NOT NULL)"
+    )
+    conn.execute(
+        f"INSERT OR REPLACE INTO {DATA_VERSIONS_TABLE} (table_name, version) VALUES (?, ?)",
+        (table_name, version)
+    )
+    conn.commit()
+
+
+def get_data_version(conn: sqlite3.Connection, table_name: str) -> Optional[str]:
+    """
+    Obtiene la versión de datos registrada para una tabla.
+
+    Argumentos:
+        conn: Objeto de conexión SQLite
+        table_name: Nombre de la tabla
+
+    Retorna:
+        str con la versión, o None si la tabla no fue cargada con load_to_sqlite
+    """
+    if not _table_exists(conn, DATA_VERSIONS_TABLE):
+        return None
+    row = conn.execute(
+        f"SELECT version FROM {DATA_VERSIONS_TABLE} WHERE table_name = ?", (table_name,)
+    ).fetchone()
+    return row[0] if row else None
+
+
+def _load_csv(
+    csv_path: str,
+    table_name: str,
+    conn: sqlite3.Connection,
+    chunksize: Optional[int] = None,
+    encode: bool = False,
+    lookup: Optional[Dict[str, any]] = None,
+    summaries: Sequence = ()
+) -> Dict[str, any]:
+    """
+    Parsea el CSV, valida y escribe la tabla en SQLite (sin caché).
+
+    Argumentos:
+        csv_path: Ruta al archivo CSV
+        table_name: Nombre de la tabla SQLite de destino
+        conn: Objeto de conexión SQLite
+        chunksize: Filas por bloque para la carga en streaming (None = todo en memoria)
+        encode: Si True, guarda la tabla codificada por diccionario
+        lookup: Búsqueda de usuarios a desnormalizar (ver _user_lookup)
+        summaries: Resúmenes a construir durante la carga (StratifiedReservoir,
+            AmountSketches)
+
+    Retorna:
+        Dict con el reporte de validación (ver load_to_sqlite)
+    """
+    if chunksize:
+        return _load_csv_chunked(csv_path, table_name, conn, chunksize, lookup, summaries)
+
     # Cargar CSV
+    start = time.perf_counter()
     df = pd.read_csv(csv_path)
+    parse_seconds = time.perf_counter() - start
 
-    # Reporte de validación
+    # Reporte de validación (perfil de calidad en una sola pasada)
     report = {
         'file': csv_path,
         'table': table_name,
@@ -57,68 +441,1181 @@ def load_to_sqlite(
         'date_range': None,
         'status': 'PASS'
     }
+    profiler = DataProfiler(table_name)
+    profiler.update(df)
+    _apply_profile(report, profiler.report(), parse_seconds)
 
-    # Verificar nulos
-    null_counts = df.isnull().sum()
-    report['null_counts'] = {col: int(count) for col, count in null_counts.items() if count > 0}
+    # Convertir la columna de fecha para las columnas derivadas
+    date_columns = [col for col in df.columns if 'date' in col.lower()]
+    if date_columns:
+        df[date_columns[0]] = pd.to_datetime(df[date_columns[0]])
 
-    # Verificar duplicados (basado en la primera columna como ID)
-    if len(df.columns) > 0:
-        id_col = df.columns[0]
-        report['duplicates'] = int(df[id_col].duplicated().sum())
+    # Cargar a SQLite (con columnas derivadas de fecha/hora y de usuario)
+    df = _add_date_parts(df)
+    if lookup is not None:
+        df, report['orphaned_transactions'] = _join_users(df, lookup)
+    for summary in summaries:
+        summary.update(df)
+    _drop_table_objects(conn, table_name)
+    if encode:
+        df, encodings = encode_dataframe(df)
+        _write_encoded(df, table_name, conn, encodings)
+    else:
+        df.to_sql(table_name, conn, if_exists='replace', index=False)
+    for summary in summaries:
+        summary.save(conn, table_name)
 
-    # Verificar rangos de fechas si aplica
-    date_columns = [col for col in df.columns if 'date' in col.lower()]
-    if date_columns and len(date_columns) > 0:
-        date_col = date_columns[0]
-        df[date_col] = pd.to_datetime(df[date_col])
-        report['date_range'] = (
-            df[date_col].min().strftime('%Y-%m-%d'),
-            df[date_col].max().strftime('%Y-%m-%d')
-        )
+    return report
+
+
+def _apply_profile(report: Dict[str, any], profile: Dict[str, any], parse_seconds: float) -> None:
+    """
+    Completa un reporte de validación a partir del perfil de DataProfiler.
+
+    Los nulos, los duplicados (de la clave primaria, por defecto la primera
+    columna) y el rango de la primera columna de fecha salen del perfil; el
+    estado pasa a 'WARNINGS' si hay nulos, duplicados o problemas de calidad.
 
-    # Cargar a SQLite
-    df.to_sql(table_name, conn, if_exists='replace', index=False)
+    Argumentos:
+        report: Reporte de validación a completar (se modifica en el lugar)
+        profile: Resultado de DataProfiler.report()
+        parse_seconds: Tiempo de lectura del CSV, para comparar con el del perfil
+    """
+    profile['parse_seconds'] = round(parse_seconds, 3)
+    columns = profile['columns']
+    report['null_counts'] = {col: stats['nulls'] for col, stats in columns.items() if stats['nulls'] > 0}
+    primary_key = profile['duplicates'].get('primary_key')
+    report['duplicates'] = primary_key['duplicates'] if primary_key else 0
 
-    # Estado de validación
-    if report['null_counts'] or report['duplicates'] > 0:
+    date_columns = [col for col in columns if 'date' in col.lower()]
+    if date_columns and columns[date_columns[0]]['min'] is not None:
+        stats = columns[date_columns[0]]
+        report['date_range'] = (stats['min'][:10], stats['max'][:10])
+
+    report['profile'] = profile
+    if report['null_counts'] or report['duplicates'] > 0 or profile['issues']:
         report['status'] = 'WARNINGS'
 
+
+def _load_csv_chunked(
+    csv_path: str,
+    table_name: str,
+    conn: sqlite3.Connection,
+    chunksize: int,
+    lookup: Optional[Dict[str, any]] = None,
+    summaries: Sequence = ()
+) -> Dict[str, any]:
+    """
+    Carga el CSV por bloques con memoria acotada y validación incremental.
+
+    La tabla resultante es idéntica a la de la carga en memoria. El perfil de
+    calidad (DataProfiler) se acumula bloque a bloque; para los duplicados solo
+    se guarda un hash de 64 bits por clave distinta, no los IDs.
+
+    Argumentos:
+        csv_path: Ruta al archivo CSV
+        table_name: Nombre de la tabla SQLite de destino
+        conn: Objeto de conexión SQLite
+        chunksize: Número de filas por bloque
+        lookup: Búsqueda de usuarios a desnormalizar (ver _user_lookup)
+        summaries: Resúmenes a construir durante la carga (StratifiedReservoir,
+            AmountSketches)
+
+    Retorna:
+        Dict con el reporte de validación (ver load_to_sqlite)
+    """
+    report = {
+        'file': csv_path,
+        'table': table_name,
+        'records_loaded': 0,
+        'columns': [],
+        'null_counts': {},
+        'duplicates': 0,
+        'date_range': None,
+        'status': 'PASS'
+    }
+    profiler = DataProfiler(table_name)
+    parse_seconds = 0.0
+    date_col = None
+    insert_sql = None
+    if lookup is not None:
+        report['orphaned_transactions'] = 0
+
+    conn.commit()
+    conn.execute("BEGIN")
+    try:
+        reader = pd.read_csv(csv_path, chunksize=chunksize)
+        while True:
+            start = time.perf_counter()
+            chunk = next(reader, None)
+            parse_seconds += time.perf_counter() - start
+            if chunk is None:
+                break
+
+            profiler.update(chunk)
+            if insert_sql is None:
+                # Crear la tabla a partir del esquema del primer bloque
+                report['columns'] = list(chunk.columns)
+                date_columns = [col for col in chunk.columns if 'date' in col.lower()]
+                date_col = date_columns[0] if date_columns else None
+                if date_col:
+                    chunk[date_col] = pd.to_datetime(chunk[date_col])
+
+                _drop_table_objects(conn, table_name, commit=False)
+                table_schema = _add_date_parts(chunk)
+                if lookup is not None:
+                    table_schema = _join_users(table_schema, lookup)[0]
+                conn.execute(pd.io.sql.get_schema(table_schema, table_name, con=conn))
+                placeholders = ', '.join('?' * len(table_schema.columns))
+                insert_sql = f'INSERT INTO "{table_name}" VALUES ({placeholders})'
+            elif date_col:
+                chunk[date_col] = pd.to_datetime(chunk[date_col])
+
+            report['records_loaded'] += len(chunk)
+            rows = _add_date_parts(chunk)
+            if lookup is not None:
+                rows, orphaned = _join_users(rows, lookup)
+                report['orphaned_transactions'] += orphaned
+            for summary in summaries:
+                summary.update(rows)
+            conn.executemany(insert_sql, _to_sql_rows(rows, date_col))
+
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    for summary in summaries:
+        summary.save(conn, table_name)
+    _apply_profile(report, profiler.report(), parse_seconds)
     return report
 
 
-def create_indexes(conn: sqlite3.Connection) -> None:
+def append_new_rows(
+    csv_path: str,
+    table_name: str,
+    conn: sqlite3.Connection,
+    chunksize: Optional[int] = None
+) -> Dict[str, any]:
     """
-    Crea índices en columnas consultadas frecuentemente para rendimiento.
+    Agrega a una tabla existente solo las filas del CSV que aún no están cargadas.
+
+    Una fila es nueva si su fecha es posterior al MAX() de la columna de fecha de
+    la tabla, o si cae en esa misma fecha y su ID (primera columna) no existe.
+    Solo se consultan los IDs del último día cargado, por lo que el costo es
+    proporcional al volumen nuevo. Los índices existentes se mantienen de forma
+    incremental por SQLite al insertar; no se reconstruyen. Si existe el cubo
+    de resumen, solo se re-agregan las fechas afectadas, y si la tabla tiene
+    muestra estratificada o sketches de montos, las filas nuevas se
+    incorporan a ellos.
 
     Argumentos:
+        csv_path: Ruta al archivo CSV (histórico completo o solo el delta)
+        table_name: Nombre de la tabla SQLite existente
         conn: Objeto de conexión SQLite
+        chunksize: Filas por bloque para leer el CSV (None = todo en memoria)
+
+    Retorna:
+        Dict con el reporte de validación de las filas agregadas, más:
+            - records_skipped: Filas del CSV que ya existían en la tabla
+            - records_total: Total de registros en la tabla tras la carga
     """
-    cursor = conn.cursor()
+    columns = [row[1] for row in conn.execute(f'PRAGMA table_info("{table_name}")')]
+    source_columns = [col for col in columns if col not in DATE_PART_COLUMNS]
+    id_col = columns[0]
+    date_columns = [col for col in source_columns if 'date' in col.lower()]
+    date_col = date_columns[0] if date_columns else None
+
+    # Marca de agua: última fecha cargada y sus IDs
+    max_date, seen_ids = None, set()
+    if date_col:
+        max_date = conn.execute(f'SELECT MAX("{date_col}") FROM "{table_name}"').fetchone()[0]
+    if max_date is not None:
+        seen_ids = {
+            row[0] for row in conn.execute(
+                f'SELECT "{id_col}" FROM "{table_name}" WHERE "{date_col}" = ?', (max_date,)
+            )
+        }
+        max_date = pd.Timestamp(max_date)
+
+    report = {
+        'file': csv_path,
+        'table': table_name,
+        'records_loaded': 0,
+        'records_skipped': 0,
+        'columns': source_columns,
+        'null_counts': {},
+        'duplicates': 0,
+        'date_range': None,
+        'status': 'PASS'
+    }
+    # Perfil de calidad de las filas agregadas (duplicados dentro del lote)
+    profiler = DataProfiler(table_name)
+    parse_seconds = 0.0
+    summaries = []
+    if _table_exists(conn, sample_tables(table_name)[0]):
+        # Semilla distinta por lote: las prioridades nuevas no repiten las ya usadas
+        total = conn.execute(f'SELECT COUNT(*) FROM "{table_name}"').fetchone()[0]
+        summaries.append(StratifiedReservoir.load(conn, table_name, seed=total,
+                                                  parse_dates=[date_col] if date_col else ()))
+    if _table_exists(conn, sketch_table(table_name)):
+        summaries.append(AmountSketches.load(conn, table_name))
 
-    # Índices de tabla de transacciones
+    placeholders = ', '.join('?' * len(columns))
+    insert_sql = f'INSERT INTO "{table_name}" VALUES ({placeholders})'
+
+    start = time.perf_counter()
+    chunks = pd.read_csv(csv_path, chunksize=chunksize) if chunksize else iter([pd.read_csv(csv_path)])
+    parse_seconds += time.perf_counter() - start
+
+    conn.commit()
+    conn.execute("BEGIN")
+    try:
+        while True:
+            start = time.perf_counter()
+            chunk = next(chunks, None)
+            parse_seconds += time.perf_counter() - start
+            if chunk is None:
+                break
+
+            chunk = chunk.reindex(columns=source_columns)
+            if date_col:
+                chunk[date_col] = pd.to_datetime(chunk[date_col])
+                if max_date is not None:
+                    is_new = (chunk[date_col] > max_date) | (
+                        (chunk[date_col] == max_date) & ~chunk[id_col].isin(seen_ids)
+                    )
+                    report['records_skipped'] += int((~is_new).sum())
+                    chunk = chunk[is_new]
+            if chunk.empty:
+                continue
+
+            report['records_loaded'] += len(chunk)
+            profiler.update(chunk)
+
+            rows = _add_date_parts(chunk).reindex(columns=columns)
+            for summary in summaries:
+                summary.update(rows)
+            conn.executemany(insert_sql, _to_sql_rows(rows, date_col))
+
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    if report['records_loaded'] > 0:
+        for summary in summaries:
+            summary.save(conn, table_name)
+
+    _apply_profile(report, profiler.report(), parse_seconds)
+    report['records_total'] = conn.execute(f'SELECT COUNT(*) FROM "{table_name}"').fetchone()[0]
+
+    # Nueva versión de datos: encadena la versión previa con el lote agregado
+    if report['records_loaded'] > 0:
+        previous = get_data_version(conn, table_name) or ''
+        batch = _hash_file(Path(csv_path))
+        set_data_version(
+            conn, table_name, hashlib.sha256(f"{previous}:{batch}".encode()).hexdigest()
+        )
+
+    if table_name == 'transactions' and report['date_range'] and _table_exists(conn, CUBE_TABLE):
+        create_cube(conn, since=f"{report['date_range'][0]} 00:00:00")
+
+    return report
+
+
+def _table_exists(conn: sqlite3.Connection, table_name: str) -> bool:
+    """
+    Indica si una tabla existe en la conexión.
+
+    Argumentos:
+        conn: Objeto de conexión SQLite
+        table_name: Nombre de la tabla
+
+    Retorna:
+        bool: True si la tabla existe
+    """
+    row = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table_name,)
+    ).fetchone()
+    return row is not None
+
+
+def _map_unique(values: pd.Series, convert) -> pd.Series:
+    """
+    Aplica una conversión vectorizada solo a los valores distintos de una Serie.
+
+    Argumentos:
+        values: Serie a convertir (fechas, horas...)
+        convert: Función que recibe y retorna una Serie
+
+    Retorna:
+        Serie convertida alineada con values (los nulos siguen siendo nulos)
+    """
+    codes, uniques = pd.factorize(values)
+    converted = pd.Series(convert(pd.Series(uniques))).array
+    return pd.Series(converted.take(codes, allow_fill=True), index=values.index)
+
+
+def _add_date_parts(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Deriva columnas de fecha/hora precalculadas para las consultas temporales.
+
+    Evita evaluar strftime() fila por fila en tiempo de consulta. Solo aplica a
+    datos con transaction_date (y transaction_time para hour/transaction_ts):
+        - dow: Día de la semana (0 = domingo, igual que strftime('%w'))
+        - hour: Hora del día (0-23)
+        - year_month: Mes en formato 'YYYY-MM'
+        - transaction_ts: Timestamp epoch (segundos) de fecha + hora
+
+    Argumentos:
+        df: Datos con transaction_date ya convertida a datetime
+
+    Retorna:
+        Copia del DataFrame con las columnas derivadas agregadas
+    """
+    if 'transaction_date' not in df.columns:
+        return df
+
+    # Fechas y horas se repiten mucho: se convierten solo los valores distintos
+    dates = _map_unique(df['transaction_date'], pd.to_datetime)
+    parts = {
+        'dow': ((dates.dt.dayofweek + 1) % 7).astype('Int64'),
+        'hour': pd.Series(pd.NA, index=df.index, dtype='Int64'),
+        'year_month': _map_unique(dates, lambda d: d.dt.strftime('%Y-%m')),
+        'transaction_ts': pd.Series(pd.NA, index=df.index, dtype='Int64')
+    }
+    if 'transaction_time' in df.columns:
+        times = _map_unique(df['transaction_time'],
+                            lambda t: pd.to_timedelta(t, errors='coerce'))
+        parts['hour'] = (times // pd.Timedelta(hours=1)).astype('Int64')
+        timestamps = dates.dt.tz_localize(None) + times
+        parts['transaction_ts'] = (
+            (timestamps - pd.Timestamp(0)) // pd.Timedelta(seconds=1)
+        ).astype('Int64')
+
+    return df.assign(**parts)
+
+
+def _has_user_columns(conn: sqlite3.Connection, table_name: str) -> bool:
+    """Indica si la tabla (o vista) tiene las columnas de usuario desnormalizadas."""
+    columns = {row[1] for row in conn.execute(f'PRAGMA table_info("{table_name}")')}
+    return USER_KEY_COLUMN in columns
+
+
+def _user_lookup(conn: sqlite3.Connection, users_table: str) -> Dict[str, any]:
+    """
+    Prepara la búsqueda de atributos de usuario para la desnormalización.
+
+    La clave entera de cada usuario es la parte numérica de su ID (USR_0042 ->
+    42), y un arreglo denso indexado por clave da la fila del usuario (-1 si
+    no existe), de modo que resolver un ID cuesta un acceso a arreglo. Si los
+    IDs no siguen un único prefijo o son demasiado dispersos, la clave es la
+    posición del usuario y la búsqueda se hace por hash. Con IDs repetidos,
+    gana la primera fila.
+
+    Argumentos:
+        conn: Objeto de conexión SQLite
+        users_table: Tabla de usuarios ya cargada (o su vista decodificada)
+
+    Retorna:
+        Dict con table, version, ids, keys, attributes (columnas de
+        USER_ATTRIBUTES), prefix y positions (arreglo denso, o None)
+    """
+    if not _table_exists(conn, users_table) and not _table_exists(conn, encoded_table_name(users_table)):
+        raise ValueError(f"No existe la tabla de usuarios: {users_table}")
+
+    columns = ', '.join(f'"{col}"' for col in ['user_id', *USER_ATTRIBUTES])
+    users = pd.read_sql_query(f'SELECT {columns} FROM "{users_table}"', conn)
+    users = users.drop_duplicates('user_id').reset_index(drop=True)
+    ids = users['user_id'].astype(object).to_numpy()
+
+    version = get_data_version(conn, users_table)
+    if version is None:
+        version = hashlib.sha256(pd.util.hash_pandas_object(users, index=False).values).hexdigest()
+
+    lookup = {
+        'table': users_table,
+        'version': version,
+        'ids': ids,
+        'keys': np.arange(1, len(users) + 1, dtype='int64'),
+        'attributes': {USER_ATTRIBUTES[col]: users[col].astype(object).to_numpy()
+                       for col in USER_ATTRIBUTES},
+        'prefix': None,
+        'positions': None
+    }
+
+    parts = users['user_id'].astype(str).str.extract(_ID_PATTERN)
+    if users.empty or parts.isnull().any().any() or parts[0].nunique() != 1:
+        return lookup
+    keys = parts[1].astype('int64').to_numpy()
+    if keys.max() >= DENSE_LOOKUP_FACTOR * len(users) + 1024 or len(np.unique(keys)) != len(keys):
+        return lookup
+
+    positions = np.full(keys.max() + 1, -1, dtype='int64')
+    positions[keys] = np.arange(len(keys))
+    lookup.update(keys=keys, prefix=parts[0].iloc[0], positions=positions)
+    return lookup
+
+
+def _join_users(df: pd.DataFrame, lookup: Dict[str, any]) -> Tuple[pd.DataFrame, int]:
+    """
+    Agrega a las transacciones la clave y los atributos de su usuario.
+
+    Los IDs se repiten mucho, así que solo se resuelven los distintos.
+
+    Argumentos:
+        df: Transacciones con user_id
+        lookup: Búsqueda de usuarios de _user_lookup
+
+    Retorna:
+        Tupla de (copia con user_key y las columnas de USER_ATTRIBUTES,
+        número de transacciones sin usuario)
+    """
+    codes, uniques = pd.factorize(df['user_id'])
+    uniques = pd.Series(uniques, dtype=object)
+
+    if lookup['positions'] is not None:
+        parts = uniques.astype(str).str.extract(_ID_PATTERN)
+        numbers = pd.to_numeric(parts[1], errors='coerce')
+        valid = ((parts[0] == lookup['prefix']) & (numbers < len(lookup['positions']))).to_numpy()
+        rows = np.full(len(uniques), -1, dtype='int64')
+        rows[valid] = lookup['positions'][numbers[valid].astype('int64').to_numpy()]
+        # La clave numérica ignora el ancho (USR_42 vs USR_0042): verificar el ID exacto
+        found = rows >= 0
+        found[found] = lookup['ids'][rows[found]] == uniques.to_numpy()[found]
+        rows[~found] = -1
+    else:
+        rows = pd.Index(lookup['ids']).get_indexer(uniques)
+
+    # Fila del usuario de cada transacción (-1 = huérfana, incluidos los user_id nulos)
+    rows = np.append(rows, -1)[codes]
+    matched = rows >= 0
+
+    keys = pd.Series(pd.NA, index=df.index, dtype='Int64')
+    keys[matched] = lookup['keys'][rows[matched]]
+    columns = {USER_KEY_COLUMN: keys}
+    for name, values in lookup['attributes'].items():
+        column = np.full(len(df), None, dtype=object)
+        column[matched] = values[rows[matched]]
+        columns[name] = column
+    return df.assign(**columns), int((~matched).sum())
+
+
+def encode_dataframe(df: pd.DataFrame) -> Tuple[pd.DataFrame, Dict[str, Dict[str, str]]]:
+    """
+    Codifica por diccionario las columnas de texto de baja cardinalidad.
+
+    - IDs con prefijo (p. ej. TXN_000001, USR_3445): se convierten a enteros si
+      el formato se puede reconstruir exactamente (un solo prefijo, sin nulos).
+    - Texto con a lo sumo MAX_DICTIONARY_SIZE valores distintos: se convierte
+      a categórica (códigos enteros pequeños + diccionario de valores).
+
+    Argumentos:
+        df: Datos a codificar
+
+    Retorna:
+        Tupla de (DataFrame codificado, dict columna: codificación) donde la
+        codificación es {'kind': 'id', 'format': 'TXN_%06d'} o {'kind': 'dictionary'}
+    """
+    df = df.copy()
+    encodings = {}
+    for col in df.columns:
+        values = df[col]
+        if not pd.api.types.is_string_dtype(values) or isinstance(values.dtype, pd.CategoricalDtype):
+            continue
+
+        id_format = _id_format(values) if col.lower().endswith('id') else None
+        if id_format is not None:
+            df[col] = values.str.extract(_ID_PATTERN)[1].astype('int64')
+            encodings[col] = {'kind': 'id', 'format': id_format}
+        elif values.nunique() <= MAX_DICTIONARY_SIZE:
+            df[col] = values.astype('category')
+            encodings[col] = {'kind': 'dictionary'}
+    return df, encodings
+
+
+def _id_format(values: pd.Series) -> Optional[str]:
+    """
+    Formato printf que reconstruye exactamente una columna de IDs con prefijo.
+
+    Argumentos:
+        values: Columna de IDs en texto
+
+    Retorna:
+        str como 'TXN_%06d' o 'USR_%d', o None si los IDs no siguen el patrón
+    """
+    if values.isnull().any() or values.empty:
+        return None
+    parts = values.str.extract(_ID_PATTERN)
+    if parts.isnull().any().any() or parts[0].nunique() != 1:
+        return None
+
+    digits = parts[1].str.len()
+    prefix = parts[0].iloc[0].replace('%', '%%')
+    if digits.nunique() == 1:
+        return f"{prefix}%0{int(digits.iloc[0])}d"
+    if not parts[1].str.startswith('0').any():
+        return f"{prefix}%d"
+    return None
+
+
+def get_column_encodings(conn: sqlite3.Connection, table_name: str) -> Dict[str, Dict[str, str]]:
+    """
+    Obtiene las columnas codificadas de una tabla cargada con encode=True.
+
+    Argumentos:
+        conn: Objeto de conexión SQLite
+        table_name: Nombre lógico de la tabla (p. ej. 'transactions')
+
+    Retorna:
+        Dict columna: {'kind', 'format', 'lookup'} (vacío si no está codificada).
+        'lookup' es la tabla de búsqueda código -> valor de las columnas de
+        diccionario; los datos codificados están en <tabla>_encoded.
+    """
+    if not _table_exists(conn, ENCODINGS_TABLE):
+        return {}
+    rows = conn.execute(
+        f"SELECT column_name, kind, format FROM {ENCODINGS_TABLE} WHERE table_name = ?",
+        (table_name,)
+    ).fetchall()
+    return {
+        col: {
+            'kind': kind,
+            'format': fmt,
+            'lookup': _lookup_table(table_name, col) if kind == 'dictionary' else None
+        }
+        for col, kind, fmt in rows
+    }
+
+
+def encoded_table_name(table_name: str) -> str:
+    """Nombre de la tabla física con los datos codificados de una tabla lógica."""
+    return f"{table_name}_encoded"
+
+
+def _lookup_table(table_name: str, column: str) -> str:
+    """Nombre de la tabla de búsqueda código -> valor de una columna."""
+    return f"{table_name}_{column}_lookup"
+
+
+def _write_encoded(
+    df: pd.DataFrame,
+    table_name: str,
+    conn: sqlite3.Connection,
+    encodings: Dict[str, Dict[str, str]]
+) -> None:
+    """
+    Escribe una tabla codificada: datos, tablas de búsqueda, metadatos y vista.
+
+    Argumentos:
+        df: Datos codificados por encode_dataframe
+        table_name: Nombre lógico de la tabla
+        conn: Objeto de conexión SQLite
+        encodings: Codificaciones devueltas por encode_dataframe
+    """
+    data = df.copy()
+    for col, encoding in encodings.items():
+        if encoding['kind'] != 'dictionary':
+            continue
+        categories = data[col].cat.categories
+        pd.DataFrame({'code': range(len(categories)), 'value': categories.astype(str)}).to_sql(
+            _lookup_table(table_name, col), conn, if_exists='replace', index=False,
+            dtype={'code': 'INTEGER PRIMARY KEY', 'value': 'TEXT'}
+        )
+        # Código -1 (nulo en pandas) se guarda como NULL
+        codes = data[col].cat.codes
+        data[col] = codes.astype('Int64').where(codes >= 0)
+
+    data.to_sql(encoded_table_name(table_name), conn, if_exists='replace', index=False)
+    _save_encodings(conn, table_name, encodings)
+    _create_decoded_view(conn, table_name)
+    conn.commit()
+
+
+def _save_encodings(
+    conn: sqlite3.Connection,
+    table_name: str,
+    encodings: Dict[str, Dict[str, str]]
+) -> None:
+    """Registra las codificaciones de una tabla en ENCODINGS_TABLE."""
+    conn.execute(
+        f"CREATE TABLE IF NOT EXISTS {ENCODINGS_TABLE} "
+        "(table_name TEXT, column_name TEXT, kind TEXT NOT NULL, format TEXT, "
+        "PRIMARY KEY (table_name, column_name))"
+    )
+    conn.execute(f"DELETE FROM {ENCODINGS_TABLE} WHERE table_name = ?", (table_name,))
+    conn.executemany(
+        f"INSERT INTO {ENCODINGS_TABLE} (table_name, column_name, kind, format) VALUES (?, ?, ?, ?)",
+        [(table_name, col, enc['kind'], enc.get('format')) for col, enc in encodings.items()]
+    )
+
+
+def _create_decoded_view(conn: sqlite3.Connection, table_name: str) -> None:
+    """
+    Crea la vista <tabla> que decodifica <tabla>_encoded a los valores originales.
+
+    La decodificación se hace fila por fila antes de cualquier GROUP BY, por lo
+    que las consultas sobre la vista no aprovechan los códigos enteros (ni los
+    índices cubrientes del planificador, que no analiza vistas).
+
+    Argumentos:
+        conn: Objeto de conexión SQLite
+        table_name: Nombre lógico de la tabla
+    """
+    encodings = get_column_encodings(conn, table_name)
+    encoded = encoded_table_name(table_name)
+    columns = [row[1] for row in conn.execute(f'PRAGMA table_info("{encoded}")')]
+
+    select, joins = [], []
+    for idx, col in enumerate(columns):
+        encoding = encodings.get(col)
+        if encoding is None:
+            select.append(f'e."{col}"')
+        elif encoding['kind'] == 'id':
+            fmt = encoding['format'].replace("'", "''")
+            select.append(f"printf('{fmt}', e.\"{col}\") AS \"{col}\"")
+        else:
+            joins.append(f'LEFT JOIN "{encoding["lookup"]}" l{idx} ON l{idx}.code = e."{col}"')
+            select.append(f'l{idx}.value AS "{col}"')
+
+    conn.execute(f'DROP VIEW IF EXISTS "{table_name}"')
+    conn.execute(
+        f'CREATE VIEW "{table_name}" AS SELECT {", ".join(select)} '
+        f'FROM "{encoded}" e {" ".join(joins)}'
+    )
+
+
+def _drop_table_objects(conn: sqlite3.Connection, table_name: str, commit: bool = True) -> None:
+    """
+    Elimina una tabla cargada, sea una tabla simple o una tabla codificada
+    (vista, datos, tablas de búsqueda y metadatos), junto con las tablas
+    derivadas construidas en su carga (ver _companion_tables).
+
+    Argumentos:
+        conn: Objeto de conexión SQLite
+        table_name: Nombre lógico de la tabla
+        commit: Si True, confirma la transacción al terminar
+    """
+    encodings = get_column_encodings(conn, table_name)
+    row = conn.execute(
+        "SELECT type FROM sqlite_master WHERE name = ? AND type IN ('table', 'view')", (table_name,)
+    ).fetchone()
+    if row is not None:
+        conn.execute(f'DROP {row[0].upper()} "{table_name}"')
+    if encodings:
+        conn.execute(f'DROP TABLE IF EXISTS "{encoded_table_name(table_name)}"')
+        for encoding in encodings.values():
+            if encoding['lookup']:
+                conn.execute(f'DROP TABLE IF EXISTS "{encoding["lookup"]}"')
+        conn.execute(f"DELETE FROM {ENCODINGS_TABLE} WHERE table_name = ?", (table_name,))
+    for companion in _companion_tables(table_name):
+        conn.execute(f'DROP TABLE IF EXISTS "{companion}"')
+    if commit:
+        conn.commit()
+
+
+def _to_sql_rows(df: pd.DataFrame, date_col: Optional[str]):
+    """
+    Convierte un DataFrame en tuplas nativas listas para executemany.
+
+    Las fechas se serializan con el mismo formato de texto que produce
+    DataFrame.to_sql y los valores nulos se convierten en None (NULL).
+
+    Argumentos:
+        df: Bloque de datos a insertar
+        date_col: Columna de fecha ya convertida a datetime (o None)
+
+    Retorna:
+        Iterador de tuplas de valores por fila
+    """
+    df = df.copy()
+    if date_col:
+        df[date_col] = _map_unique(df[date_col],
+                                   lambda d: d.dt.strftime('%Y-%m-%d %H:%M:%S'))
+    df = df.astype(object).where(df.notna(), None)
+    return df.itertuples(index=False, name=None)
+
+
+def _hash_file(path: Path, block_size: int = 1 << 20) -> str:
+    """
+    Calcula el hash SHA-256 del contenido de un archivo por bloques.
+
+    Argumentos:
+        path: Ruta al archivo
+        block_size: Tamaño del bloque de lectura en bytes
+
+    Retorna:
+        str: Hash hexadecimal del contenido
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _fingerprint(path: Path, previous: Optional[Dict[str, any]] = None) -> Dict[str, any]:
+    """
+    Huella de un archivo fuente: tamaño, mtime y hash SHA-256 del contenido.
+
+    El hash se reutiliza de la huella previa si el tamaño y el mtime coinciden,
+    y solo se recalcula en caso contrario.
+
+    Argumentos:
+        path: Ruta al archivo
+        previous: Huella registrada anteriormente (None = calcular el hash)
+
+    Retorna:
+        Dict con size, mtime_ns y sha256
+    """
+    stat = path.stat()
+    fingerprint = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': None}
+    if previous and previous['size'] == fingerprint['size'] \
+            and previous['mtime_ns'] == fingerprint['mtime_ns']:
+        fingerprint['sha256'] = previous['sha256']
+    else:
+        fingerprint['sha256'] = _hash_file(path)
+    return fingerprint
+
+
+def _read_manifest(manifest_path: Path) -> Optional[Dict[str, any]]:
+    """Lee un manifiesto JSON; None si no existe, está dañado o es de otra CACHE_VERSION."""
+    if not manifest_path.exists():
+        return None
+    try:
+        manifest = json.loads(manifest_path.read_text())
+    except (OSError, ValueError):
+        return None
+    return manifest if manifest.get('version') == CACHE_VERSION else None
+
+
+def _resolve_cache(
+    csv_path: str,
+    table_name: str,
+    cache_dir: Optional[str],
+    encode: bool = False,
+    lookup: Optional[Dict[str, any]] = None,
+    summaries: Sequence = ()
+) -> Dict[str, any]:
+    """
+    Determina la huella del CSV fuente y las rutas de caché correspondientes.
+
+    El hash SHA-256 solo se recalcula cuando el tamaño o el mtime del archivo
+    difieren de los registrados en el manifiesto de la caché.
+
+    Argumentos:
+        csv_path: Ruta al archivo CSV
+        table_name: Nombre de la tabla SQLite de destino
+        cache_dir: Directorio de la caché (por defecto '.cache' junto al CSV)
+        encode: Si True, la entrada de caché corresponde a la tabla codificada
+        lookup: Búsqueda de usuarios desnormalizada (la entrada depende de su versión)
+        summaries: Resúmenes guardados con la tabla (la entrada depende de su tamaño)
+
+    Retorna:
+        Dict con la huella del archivo, el manifiesto previo y las rutas de caché
+    """
+    source = Path(csv_path)
+    directory = Path(cache_dir) if cache_dir else source.parent / '.cache'
+    name = f"{source.stem}.{table_name}.encoded" if encode else f"{source.stem}.{table_name}"
+    if lookup is not None:
+        name += f".{lookup['table']}-{lookup['version'][:12]}"
+    for summary in summaries:
+        if isinstance(summary, StratifiedReservoir):
+            name += f".sample-{summary.size}"
+        elif isinstance(summary, AmountSketches):
+            name += f".sketch-{summary.compression}"
+    manifest_path = directory / f"{name}.json"
+
+    manifest = _read_manifest(manifest_path)
+    fingerprint = _fingerprint(source, manifest['source'] if manifest else None)
+
+    return {
+        'dir': directory,
+        'manifest_path': manifest_path,
+        'manifest': manifest,
+        'fingerprint': fingerprint,
+        'db_path': directory / f"{name}.{fingerprint['sha256'][:16]}.sqlite"
+    }
+
+
+def _stored_tables(table_name: str, encodings: Dict[str, Dict[str, str]]) -> list:
+    """
+    Tablas físicas que almacenan una tabla lógica.
+
+    Argumentos:
+        table_name: Nombre lógico de la tabla
+        encodings: Codificaciones de la tabla (vacío si no está codificada)
+
+    Retorna:
+        Lista con la tabla misma, o con <tabla>_encoded y sus tablas de búsqueda
+    """
+    if not encodings:
+        return [table_name]
+    return [encoded_table_name(table_name)] + [
+        _lookup_table(table_name, col)
+        for col, enc in encodings.items() if enc['kind'] == 'dictionary'
+    ]
+
+
+def _companion_tables(table_name: str) -> list:
+    """
+    Tablas derivadas que se construyen en la carga de una tabla.
+
+    Argumentos:
+        table_name: Nombre lógico de la tabla
+
+    Retorna:
+        Lista con las tablas de la muestra estratificada y de los sketches de montos
+    """
+    return list(sample_tables(table_name)) + [sketch_table(table_name)]
+
+
+def _copy_table(
+    conn: sqlite3.Connection,
+    db_path: Path,
+    table_name: str,
+    to_cache: bool
+) -> None:
+    """
+    Copia una tabla entre la conexión y un archivo de caché adjunto (ATTACH).
+
+    Argumentos:
+        conn: Objeto de conexión SQLite
+        db_path: Ruta al archivo SQLite de caché
+        table_name: Nombre de la tabla a copiar
+        to_cache: True para main -> caché, False para caché -> main
+    """
+    source, target = ('main', 'cache_db') if to_cache else ('cache_db', 'main')
+
+    conn.commit()
+    conn.execute("ATTACH DATABASE ? AS cache_db", (str(db_path),))
+    try:
+        schema_sql = conn.execute(
+            f"SELECT sql FROM {source}.sqlite_master WHERE type = 'table' AND name = ?",
+            (table_name,)
+        ).fetchone()[0]
+        # Reescribir el CREATE TABLE para apuntar al esquema de destino
+        schema_sql = schema_sql.replace(
+            'CREATE TABLE ', f'CREATE TABLE {target}.', 1
+        )
+        conn.execute(f'DROP TABLE IF EXISTS {target}."{table_name}"')
+        conn.execute(schema_sql)
+        conn.execute(
+            f'INSERT INTO {target}."{table_name}" SELECT * FROM {source}."{table_name}"'
+        )
+        conn.commit()
+    finally:
+        conn.execute("DETACH DATABASE cache_db")
+
+
+def _restore_from_cache(
+    cache: Dict[str, any],
+    table_name: str,
+    conn: sqlite3.Connection
+) -> Optional[Dict[str, any]]:
+    """
+    Restaura la tabla desde la caché si la huella del CSV coincide.
+
+    Argumentos:
+        cache: Información de caché desde _resolve_cache
+        table_name: Nombre de la tabla SQLite de destino
+        conn: Objeto de conexión SQLite
+
+    Retorna:
+        Reporte de validación almacenado, o None si la caché no es válida
+    """
+    manifest = cache['manifest']
+    fingerprint = cache['fingerprint']
+    if manifest is None or manifest['source']['sha256'] != fingerprint['sha256']:
+        return None
+    if not cache['db_path'].exists():
+        return None
+
+    _drop_table_objects(conn, table_name)
+    encodings = manifest.get('encodings', {})
+    for stored in _stored_tables(table_name, encodings) + manifest.get('companions', []):
+        _copy_table(conn, cache['db_path'], stored, to_cache=False)
+    if encodings:
+        _save_encodings(conn, table_name, encodings)
+        _create_decoded_view(conn, table_name)
+        conn.commit()
+
+    # Contenido idéntico con mtime distinto: refrescar el manifiesto
+    if manifest['source'] != fingerprint:
+        manifest['source'] = fingerprint
+        cache['manifest_path'].write_text(json.dumps(manifest, indent=2))
+
+    report = dict(manifest['report'])
+    if report.get('date_range'):
+        report['date_range'] = tuple(report['date_range'])
+    return report
+
+
+def _write_cache(
+    cache: Dict[str, any],
+    table_name: str,
+    conn: sqlite3.Connection,
+    report: Dict[str, any]
+) -> None:
+    """
+    Persiste la tabla recién cargada y su reporte en la caché en disco.
+
+    Argumentos:
+        cache: Información de caché desde _resolve_cache
+        table_name: Nombre de la tabla cargada
+        conn: Objeto de conexión SQLite
+        report: Reporte de validación de la carga
+    """
+    cache['dir'].mkdir(parents=True, exist_ok=True)
+
+    # Eliminar la copia anterior del mismo CSV/tabla
+    previous = cache['manifest']
+    if previous is not None:
+        stale_path = cache['dir'] / previous['db']
+        if stale_path != cache['db_path'] and stale_path.exists():
+            stale_path.unlink()
+    if cache['db_path'].exists():
+        cache['db_path'].unlink()
+
+    encodings = {
+        col: {'kind': enc['kind'], 'format': enc['format']}
+        for col, enc in get_column_encodings(conn, table_name).items()
+    }
+    companions = [name for name in _companion_tables(table_name) if _table_exists(conn, name)]
+    for stored in _stored_tables(table_name, encodings) + companions:
+        _copy_table(conn, cache['db_path'], stored, to_cache=True)
+
+    manifest = {
+        'version': CACHE_VERSION,
+        'source': cache['fingerprint'],
+        'db': cache['db_path'].name,
+        'report': {k: v for k, v in report.items() if k != 'cached'},
+        'encodings': encodings,
+        'companions': companions
+    }
+    cache['manifest_path'].write_text(json.dumps(manifest, indent=2))
+
+
+def create_indexes(
+    conn: sqlite3.Connection,
+    covering: bool = False,
+    analyze: bool = False
+) -> Optional[pd.DataFrame]:
+    """
+    Crea índices en columnas consultadas frecuentemente para rendimiento.
+
+    Todos los índices se crean en una única transacción. Con covering=True,
+    además ejecuta el planificador de índices sobre el catálogo de
+    sql_queries (EXPLAIN QUERY PLAN) y crea los índices compuestos/cubrientes
+    propuestos.
+
+    Argumentos:
+        conn: Objeto de conexión SQLite
+        covering: Si True, crea también los índices cubrientes planificados
+        analyze: Si True, ejecuta ANALYZE para que el planificador tenga estadísticas
+
+    Retorna:
+        DataFrame con el reporte del planificador (tiempos antes/después y
+        consultas resueltas solo con índices), o None si covering=False
+    """
+    # (índice, tabla, columna)
     indexes = [
-        "CREATE INDEX IF NOT EXISTS idx_corridor ON transactions(corridor)",
-        "CREATE INDEX IF NOT EXISTS idx_user_id ON transactions(user_id)",
-        "CREATE INDEX IF NOT EXISTS idx_status ON transactions(status)",
-        "CREATE INDEX IF NOT EXISTS idx_date ON transactions(transaction_date)",
-        "CREATE INDEX IF NOT EXISTS idx_segment ON transactions(user_segment)",
+        # Índices de tabla de transacciones
+        ('idx_corridor', 'transactions', 'corridor'),
+        ('idx_user_id', 'transactions', 'user_id'),
+        ('idx_status', 'transactions', 'status'),
+        ('idx_date', 'transactions', 'transaction_date'),
+        ('idx_segment', 'transactions', 'user_segment'),
+        # Columnas derivadas de fecha/hora (ver _add_date_parts)
+        ('idx_dow', 'transactions', 'dow'),
+        ('idx_hour', 'transactions', 'hour'),
+        ('idx_year_month', 'transactions', 'year_month'),
+        ('idx_ts', 'transactions', 'transaction_ts'),
         # Índices de tabla de usuarios
-        "CREATE INDEX IF NOT EXISTS idx_user_pk ON users(user_id)",
-        "CREATE INDEX IF NOT EXISTS idx_user_segment ON users(user_segment)",
-        "CREATE INDEX IF NOT EXISTS idx_user_country ON users(country)"
+        ('idx_user_pk', 'users', 'user_id'),
+        ('idx_user_segment', 'users', 'user_segment'),
+        ('idx_user_country', 'users', 'country')
     ]
 
-    for index_sql in indexes:
-        cursor.execute(index_sql)
+    conn.commit()
+    cursor = conn.cursor()
+    cursor.execute("BEGIN")
+    try:
+        for index_name, table_name, column in indexes:
+            # Las tablas codificadas se indexan sobre los códigos enteros
+            if get_column_encodings(conn, table_name):
+                table_name = encoded_table_name(table_name)
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS {index_name} ON {table_name}({column})")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    if analyze:
+        conn.execute("ANALYZE")
+        conn.commit()
+
+    if covering:
+        return plan_indexes(conn, sql_queries)
+    return None
+
+
+def create_cube(conn: sqlite3.Connection, since: Optional[str] = None) -> None:
+    """
+    Materializa el cubo de resumen de transacciones (ver cube_build_query).
+
+    El cubo agrega conteos, sumas, mínimos y máximos de amount_usd por fecha,
+    hora, corredor, segmento, rango de monto y estado, de modo que las
+    consultas con use_cube=True no dependan del número de filas crudas.
+
+    Argumentos:
+        conn: Objeto de conexión SQLite
+        since: Si se indica, solo re-agrega las fechas >= since en el cubo existente
+    """
+    if since is None:
+        conn.execute(f"DROP TABLE IF EXISTS {CUBE_TABLE}")
+        conn.execute(cube_build_query())
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_cube_corridor ON {CUBE_TABLE}(corridor)")
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_cube_date ON {CUBE_TABLE}(transaction_date)")
+    else:
+        conn.execute(f"DELETE FROM {CUBE_TABLE} WHERE transaction_date >= ?", (since,))
+        conn.execute(cube_build_query(since=True), (since,))
 
     conn.commit()
 
+    # El cubo es función exclusiva del contenido de transactions
+    version = get_data_version(conn, 'transactions')
+    if version is not None:
+        set_data_version(conn, CUBE_TABLE, version)
+
+
+def _snapshot_manifest(snapshot: Path) -> Path:
+    """Ruta del manifiesto con las huellas de los CSV de una instantánea."""
+    return snapshot.with_name(f"{snapshot.name}.json")
+
+
+def snapshot_is_current(snapshot: str = DEFAULT_SNAPSHOT, sources: Optional[Dict[str, str]] = None) -> bool:
+    """
+    Indica si la instantánea existe y corresponde al contenido actual de sus CSV.
+
+    Se compara contra el manifiesto que build_snapshot guarda junto a la
+    instantánea: misma CACHE_VERSION, mismas tablas y rutas, y mismo hash
+    SHA-256 de cada CSV. El hash solo se recalcula si cambió el tamaño o el
+    mtime de un archivo; si el contenido es idéntico, se actualiza el mtime
+    registrado en el manifiesto.
+
+    Argumentos:
+        snapshot: Ruta a la instantánea
+        sources: Diccionario tabla: ruta del CSV (por defecto SNAPSHOT_SOURCES)
+
+    Retorna:
+        True si la instantánea puede usarse sin reconstruirla
+    """
+    path = Path(snapshot)
+    manifest_path = _snapshot_manifest(path)
+    manifest = _read_manifest(manifest_path)
+    sources = sources or SNAPSHOT_SOURCES
+    if not path.exists() or manifest is None or set(manifest['sources']) != set(sources):
+        return False
+
+    changed = False
+    for table_name, csv in sources.items():
+        stored = manifest['sources'][table_name]
+        if stored['path'] != str(Path(csv).resolve()) or not Path(csv).exists():
+            return False
+        fingerprint = _fingerprint(Path(csv), stored)
+        if fingerprint['sha256'] != stored['sha256']:
+            return False
+        if fingerprint['mtime_ns'] != stored['mtime_ns']:
+            manifest['sources'][table_name] = {**stored, **fingerprint}
+            changed = True
+
+    # Contenido idéntico con mtime distinto: refrescar el manifiesto
+    if changed:
+        manifest_path.write_text(json.dumps(manifest, indent=2))
+    return True
+
+
+def build_snapshot(
+    snapshot: str = DEFAULT_SNAPSHOT,
+    sources: Optional[Dict[str, str]] = None,
+    force: bool = False
+) -> Path:
+    """
+    Carga los CSV una vez y guarda la base resultante como instantánea en disco.
+
+    La instantánea incluye las tablas, índices, estadísticas (ANALYZE), el
+    cubo de resumen y las versiones de datos, con los atributos de users
+    desnormalizados en transactions, su muestra estratificada para el modo
+    aproximado y los sketches de cuantiles de montos (ver load_to_sqlite),
+    de modo que notebooks y scripts
+    la abren con get_connection(snapshot=...) en milisegundos en lugar de
+    reconstruir una base en memoria. Junto a la instantánea se guarda un
+    manifiesto (<instantánea>.json) con CACHE_VERSION y la huella de cada CSV;
+    si sigue vigente (ver snapshot_is_current), no se hace nada.
+
+    Argumentos:
+        snapshot: Ruta de la instantánea
+        sources: Diccionario tabla: ruta del CSV de transactions y users
+            (por defecto SNAPSHOT_SOURCES)
+        force: Reconstruir aunque la instantánea esté al día
+
+    Retorna:
+        Ruta de la instantánea
+
+    Ejemplo:
+        >>> conn = get_connection(snapshot=build_snapshot())
+    """
+    path = Path(snapshot)
+    sources = sources or SNAPSHOT_SOURCES
+    if not force and snapshot_is_current(path, sources):
+        return path
+
+    # Huellas tomadas antes de cargar: si un CSV cambia durante la
+    # construcción, la próxima verificación lo detecta
+    manifest = {
+        'version': CACHE_VERSION,
+        'sources': {
+            table_name: {'path': str(Path(csv).resolve()), **_fingerprint(Path(csv))}
+            for table_name, csv in sources.items()
+        }
+    }
+
+    conn = get_connection()
+    with bulk_load_settings(conn):
+        # users primero: transactions se desnormaliza contra esa tabla
+        for table_name in sorted(sources, key=lambda name: name != 'users'):
+            denormalize = 'users' if table_name == 'transactions' and 'users' in sources else None
+            is_transactions = table_name == 'transactions'
+            load_to_sqlite(str(sources[table_name]), table_name, conn,
+                           denormalize_users=denormalize,
+                           sample_size=DEFAULT_SAMPLE_SIZE if is_transactions else None,
+                           sketch_amounts=is_transactions)
+        create_indexes(conn, analyze=True)
+        create_cube(conn)
+
+    # Escribir a un archivo temporal y reemplazar: los lectores nunca ven una copia a medias
+    path.parent.mkdir(parents=True, exist_ok=True)
+    partial = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    target = sqlite3.connect(partial)
+    try:
+        conn.backup(target)
+    finally:
+        target.close()
+        conn.close()
+    os.replace(partial, path)
+    _snapshot_manifest(path).write_text(json.dumps(manifest, indent=2))
+    return path
+
 
 def validate_referential_integrity(conn: sqlite3.Connection) -> Dict[str, any]:
     """
     Valida las relaciones de clave foránea entre tablas.
 
+    Si transactions se cargó con denormalize_users contra la versión actual
+    de users, las huérfanas se cuentan sobre user_key sin repetir el JOIN.
+
     Argumentos:
         conn: Objeto de conexión SQLite
 
@@ -134,6 +1631,9 @@ def validate_referential_integrity(conn: sqlite3.Connection) -> Dict[str, any]:
     LEFT JOIN users u ON t.user_id = u.user_id
     WHERE u.user_id IS NULL
     """
+    if has_denormalized_users(conn):
+        # Resuelto durante la carga: huérfanas = transacciones sin user_key
+        query = f"SELECT COUNT(*) as orphaned_records FROM transactions WHERE {USER_KEY_COLUMN} IS NULL"
 
     result = cursor.execute(query).fetchone()
     orphaned_count = result[0]
@@ -174,6 +1674,14 @@ def print_validation_report(report: Dict[str, any]) -> None:
     if report['date_range']:
         print(f"\n📅 Rango de Fechas: {report['date_range'][0]} a {report['date_range'][1]}")
 
+    issues = report.get('profile', {}).get('issues', [])
+    if issues:
+        print(f"\n⚠️  PROBLEMAS DE CALIDAD:")
+        for issue in issues:
+            print(f"  - {issue}")
+    elif 'profile' in report:
+        print(f"✅ Sin problemas de calidad (dominios, montos, horas, claves)")
+
     print(f"\nEstado: {report['status']}")
     print(f"{'='*60}\n")
 
@@ -185,6 +1693,10 @@ def export_validation_summary(
     """
     Exporta reportes de validación a un archivo de texto.
 
+    Junto al texto se escribe un JSON con el mismo nombre (p. ej.
+    data_validation_summary.json) con los reportes completos, incluido el
+    perfil de calidad por columna, para consumo automático.
+
     Argumentos:
         reports: Lista de diccionarios de reportes de validación
         output_path: Ruta al archivo de salida
@@ -211,9 +1723,16 @@ def export_validation_summary(
             if report['date_range']:
                 f.write(f"Rango de Fechas: {report['date_range'][0]} a {report['date_range'][1]}\n")
 
+            for issue in report.get('profile', {}).get('issues', []):
+                f.write(f"Problema de Calidad: {issue}\n")
+
             f.write(f"Estado: {report['status']}\n")
             f.write("-" * 80 + "\n\n")
 
         f.write("Validación Completa\n")
 
-    print(f"✅ Resumen de validación exportado a: {output_path}")
\ No newline at end of file
+    json_path = Path(output_path).with_suffix('.json')
+    json_path.write_text(json.dumps({'tables': reports}, indent=2, default=str))
+
+    print(f"✅ Resumen de validación exportado a: {output_path}")
+    print(f"✅ Perfil de calidad exportado a: {json_path}")
\ No newline at end of file
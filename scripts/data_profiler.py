@@ -0,0 +1,362 @@
+"""
+One-Pass Data-Quality Profiler for Cobre Payment Corridor Data
+
+Profiles a table chunk by chunk, so files larger than RAM can be checked
+while they are loaded: per-column types, null counts and ranges, date and
+time parse failures, enum domain violations, negative and outlying amounts,
+and primary/composite key duplicates. Every check is a vectorized operation
+on the chunk; only fixed-size counters, a log-scale histogram per amount
+column and one 64-bit hash per distinct key are kept between chunks.
+"""
+
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set
+
+import numpy as np
+import pandas as pd
+
+
+CURRENCIES = ['USD', 'MXN', 'COP']
+
+# Table-specific checks; tables without rules only get the generic column
+# stats and first-column duplicates
+TABLE_RULES = {
+    'transactions': {
+        'primary_key': ['transaction_id'],
+        # The same user, moment, corridor and amount under two IDs is a double submission
+        'composite_key': ['user_id', 'transaction_date', 'transaction_time', 'corridor', 'amount_usd'],
+        'domains': {
+            'status': ['success', 'failed'],
+            'corridor': [f"{source}_{target}" for source in CURRENCIES
+                         for target in CURRENCIES if source != target],
+            'user_segment': ['retail', 'sme', 'enterprise']
+        },
+        'non_negative': ['amount_usd'],
+        'outliers': ['amount_usd']
+    },
+    'users': {
+        'primary_key': ['user_id'],
+        'domains': {
+            'status': ['active', 'inactive'],
+            'user_segment': ['retail', 'sme', 'enterprise']
+        }
+    }
+}
+
+# Log-scale histogram of positive amounts: HISTOGRAM_BINS_PER_DECADE bins per
+# power of ten between 10**HISTOGRAM_MIN_EXP and 10**HISTOGRAM_MAX_EXP
+HISTOGRAM_MIN_EXP = -2
+HISTOGRAM_MAX_EXP = 12
+HISTOGRAM_BINS_PER_DECADE = 200
+
+# Tukey fences on log10(amount): amounts are log-normal, so a value is an
+# outlier when it lies more than this many IQRs outside the quartiles
+OUTLIER_IQR_FACTOR = 3.0
+
+# Distinct date/time values whose parse is remembered across chunks
+MAX_PARSED_VALUES = 100_000
+
+# Invalid values listed per column in the report
+MAX_EXAMPLES = 5
+
+
+def _to_python(value):
+    """Convert numpy/pandas scalars to JSON-serializable Python values."""
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    if isinstance(value, pd.Timestamp):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(value, pd.Timedelta):
+        seconds = int(value.total_seconds())
+        return f"{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+# Key hashing: per-column 64-bit hashes combined row-wise; nulls hash to a constant
+_HASH_MULTIPLIER = np.uint64(1000003)
+_NULL_HASH = np.uint64(0x9E3779B97F4A7C15)
+
+
+def _hash_values(values: pd.Series) -> np.ndarray:
+    """64-bit hash of each value of a column (consistent across chunks)."""
+    if pd.api.types.is_numeric_dtype(values):
+        hashed = pd.util.hash_array(values.to_numpy())
+    else:
+        hashed = pd.util.hash_array(values.to_numpy(dtype=object))
+    return np.where(values.isna().to_numpy(), _NULL_HASH, hashed)
+
+
+def _parse_time_of_day(values: pd.Series, errors: str = 'coerce') -> pd.Series:
+    """Parse 'HH:MM:SS' times of day to timedeltas; invalid times become NaT."""
+    parsed = pd.to_datetime(values, format='%H:%M:%S', errors=errors)
+    return parsed - pd.Timestamp('1900-01-01')
+
+
+def _distinct(hashes: np.ndarray) -> np.ndarray:
+    """Sorted distinct values of a hash array (sorting beats hashing 64-bit keys)."""
+    hashes = np.sort(hashes)
+    return hashes[np.concatenate(([True], hashes[1:] != hashes[:-1]))] if len(hashes) else hashes
+
+
+@dataclass
+class _ColumnStats:
+    """Running stats of one column (constant size)."""
+    dtypes: List[str] = field(default_factory=list)
+    nulls: int = 0
+    minimum: object = None
+    maximum: object = None
+    parse_failures: Optional[int] = None
+    domain_violations: Optional[int] = None
+    negatives: Optional[int] = None
+    examples: Set[str] = field(default_factory=set)
+
+    def update_range(self, minimum, maximum) -> None:
+        if pd.isna(minimum):
+            return
+        self.minimum = minimum if self.minimum is None else min(self.minimum, minimum)
+        self.maximum = maximum if self.maximum is None else max(self.maximum, maximum)
+
+
+class DataProfiler:
+    """
+    Profile a table in one vectorized pass over its chunks.
+
+    Date columns (name contains 'date') and time columns (name contains
+    'time') are parsed once per distinct value; parse failures are non-null
+    values that do not parse. Key duplicates are counted exactly over all
+    chunks from 64-bit hashes of the key columns.
+
+    Example:
+        profiler = DataProfiler('transactions')
+        for chunk in pd.read_csv('data/raw/transactions.csv', chunksize=100_000):
+            profiler.update(chunk)
+        profile = profiler.report()
+    """
+
+    def __init__(self, table_name: Optional[str] = None, rules: Optional[Dict[str, object]] = None):
+        """
+        Args:
+            table_name: Table being profiled, used to pick its TABLE_RULES
+            rules: Explicit rules (same keys as a TABLE_RULES entry),
+                overriding the table's defaults
+        """
+        self.table_name = table_name
+        self.rules = rules if rules is not None else TABLE_RULES.get(table_name, {})
+        self.rows = 0
+        self.columns: Dict[str, _ColumnStats] = {}
+        self.seconds = 0.0
+        self._keys: Dict[str, List[str]] = {}
+        self._hashes: Dict[str, List[np.ndarray]] = {}
+        self._histograms: Dict[str, np.ndarray] = {}
+        self._parsed: Dict[str, pd.Series] = {}
+
+    def _start(self, chunk: pd.DataFrame) -> None:
+        """Set up the per-column stats and keys from the first chunk."""
+        for col in chunk.columns:
+            self.columns[col] = _ColumnStats()
+        self._keys['primary_key'] = self.rules.get('primary_key', list(chunk.columns[:1]))
+        if self.rules.get('composite_key'):
+            self._keys['composite_key'] = self.rules['composite_key']
+        self._keys = {name: key for name, key in self._keys.items()
+                      if key and set(key) <= set(chunk.columns)}
+        self._hashes = {name: [] for name in self._keys}
+        bins = (HISTOGRAM_MAX_EXP - HISTOGRAM_MIN_EXP) * HISTOGRAM_BINS_PER_DECADE
+        self._histograms = {col: np.zeros(bins, dtype='int64')
+                            for col in self.rules.get('outliers', []) if col in chunk.columns}
+
+    def update(self, chunk: pd.DataFrame) -> None:
+        """
+        Add one chunk of rows to the profile.
+
+        Args:
+            chunk: Rows of the table (date columns may be raw text or datetime)
+        """
+        start = time.perf_counter()
+        if not self.columns:
+            self._start(chunk)
+        self.rows += len(chunk)
+
+        domains = self.rules.get('domains', {})
+        key_columns = {col for key in self._keys.values() for col in key}
+        hashes: Dict[str, np.ndarray] = {}
+        for col, stats in self.columns.items():
+            if col not in chunk.columns:
+                # Column missing from this chunk: every value is null
+                stats.nulls += len(chunk)
+                continue
+            values = chunk[col]
+            dtype = str(values.dtype)
+            if dtype not in stats.dtypes:
+                stats.dtypes.append(dtype)
+
+            parse = None
+            if 'date' in col.lower():
+                parse = pd.to_datetime
+            elif 'time' in col.lower():
+                parse = _parse_time_of_day
+            if pd.api.types.is_datetime64_any_dtype(values) or pd.api.types.is_timedelta64_dtype(values):
+                parse = None
+                stats.parse_failures = stats.parse_failures or 0
+                stats.update_range(values.min(), values.max())
+
+            if parse is not None or col in domains:
+                # Low-cardinality text: every check runs on the distinct values
+                codes, uniques = pd.factorize(values)
+                counts = np.bincount(codes + 1, minlength=len(uniques) + 1)
+                stats.nulls += int(counts[0])
+                counts, uniques = counts[1:], pd.Series(uniques)
+                if col in key_columns:
+                    hashes[col] = np.append(_hash_values(uniques), _NULL_HASH)[codes]
+                if parse is not None:
+                    parsed = self._parse(col, uniques, parse)
+                    failed = parsed.isna().to_numpy()
+                    stats.parse_failures = (stats.parse_failures or 0) + int(counts[failed].sum())
+                    self._add_examples(stats, uniques[failed])
+                    if not failed.all():
+                        stats.update_range(parsed.min(), parsed.max())
+                if col in domains:
+                    invalid = ~uniques.isin(domains[col]).to_numpy()
+                    stats.domain_violations = (stats.domain_violations or 0) + int(counts[invalid].sum())
+                    self._add_examples(stats, uniques[invalid])
+            else:
+                stats.nulls += int(values.isna().sum())
+                if pd.api.types.is_numeric_dtype(values):
+                    stats.update_range(values.min(), values.max())
+
+            if col in self.rules.get('non_negative', []):
+                negative = values < 0
+                stats.negatives = (stats.negatives or 0) + int(negative.sum())
+                self._add_examples(stats, values[negative])
+            if col in self._histograms:
+                self._histograms[col] += self._histogram(values)
+
+        for name, key in self._keys.items():
+            combined = np.zeros(len(chunk), dtype='uint64')
+            for col in key:
+                if col not in hashes:
+                    hashes[col] = _hash_values(chunk[col])
+                combined = combined * _HASH_MULTIPLIER ^ hashes[col]
+            stored = self._hashes[name]
+            stored.append(_distinct(combined))
+            if len(stored) >= 16:
+                self._hashes[name] = [_distinct(np.concatenate(stored))]
+        self.seconds += time.perf_counter() - start
+
+    def _parse(self, col: str, uniques: pd.Series, parse) -> pd.Series:
+        """Parse distinct values of a date/time column, reusing earlier chunks' results."""
+        known = self._parsed.get(col)
+        if known is None or known.empty:
+            parsed = parse(uniques, errors='coerce')
+            fresh = pd.Series(parsed.to_numpy(), index=pd.Index(uniques))
+        else:
+            positions = known.index.get_indexer(uniques)
+            missing = positions < 0
+            parsed = pd.Series(known.to_numpy()[np.maximum(positions, 0)])
+            fresh = pd.Series(parse(uniques[missing], errors='coerce').to_numpy(),
+                              index=pd.Index(uniques[missing]))
+            parsed[missing] = fresh.to_numpy()
+        if known is None or len(known) < MAX_PARSED_VALUES:
+            self._parsed[col] = fresh if known is None else pd.concat([known, fresh])
+        return parsed
+
+    @staticmethod
+    def _add_examples(stats: _ColumnStats, values: pd.Series) -> None:
+        """Keep the first MAX_EXAMPLES distinct invalid values of a column."""
+        if len(stats.examples) < MAX_EXAMPLES and len(values):
+            for value in pd.unique(values)[:MAX_EXAMPLES - len(stats.examples)]:
+                stats.examples.add(str(value))
+
+    @staticmethod
+    def _histogram(values: pd.Series) -> np.ndarray:
+        """Counts of positive values per log-scale histogram bin."""
+        values = values.to_numpy(dtype='float64', na_value=np.nan)
+        positive = values[values > 0]
+        bins = np.floor((np.log10(positive) - HISTOGRAM_MIN_EXP) * HISTOGRAM_BINS_PER_DECADE)
+        size = (HISTOGRAM_MAX_EXP - HISTOGRAM_MIN_EXP) * HISTOGRAM_BINS_PER_DECADE
+        return np.bincount(np.clip(bins, 0, size - 1).astype('int64'), minlength=size)
+
+    def _duplicates(self, name: str) -> int:
+        """Rows beyond the first of each key value, over all chunks."""
+        hashes = self._hashes[name]
+        if not hashes:
+            return 0
+        merged = _distinct(np.concatenate(hashes))
+        self._hashes[name] = [merged]
+        return self.rows - len(merged)
+
+    @staticmethod
+    def _outliers(histogram: np.ndarray) -> Dict[str, object]:
+        """Quartiles, fences and outlier count from a log-scale histogram."""
+        total = int(histogram.sum())
+        if total == 0:
+            return {'q1': None, 'median': None, 'q3': None,
+                    'lower_fence': None, 'upper_fence': None, 'outliers': 0}
+        centers = HISTOGRAM_MIN_EXP + (np.arange(len(histogram)) + 0.5) / HISTOGRAM_BINS_PER_DECADE
+        cumulative = np.cumsum(histogram)
+        q1, median, q3 = (centers[np.searchsorted(cumulative, q * total)] for q in (0.25, 0.5, 0.75))
+        lower, upper = q1 - OUTLIER_IQR_FACTOR * (q3 - q1), q3 + OUTLIER_IQR_FACTOR * (q3 - q1)
+        outliers = int(histogram[(centers < lower) | (centers > upper)].sum())
+        return {
+            'q1': round(float(10 ** q1), 2),
+            'median': round(float(10 ** median), 2),
+            'q3': round(float(10 ** q3), 2),
+            'lower_fence': round(float(10 ** lower), 2),
+            'upper_fence': round(float(10 ** upper), 2),
+            'outliers': outliers
+        }
+
+    def report(self) -> Dict[str, object]:
+        """
+        Profile of all rows seen so far (JSON-serializable).
+
+        Quartiles, fences and outlier counts come from the histogram and are
+        resolved to its bin width (about 1.2%).
+
+        Returns:
+            Dictionary with table, rows, columns (per-column dtype, nulls,
+            min, max and the applicable parse_failures, domain_violations,
+            negatives, outliers and examples), duplicates (per key),
+            issues (human-readable list of failed checks) and seconds
+        """
+        columns = {}
+        issues = []
+        for col, stats in self.columns.items():
+            entry = {
+                'dtype': '|'.join(stats.dtypes) or None,
+                'nulls': stats.nulls,
+                'min': _to_python(stats.minimum),
+                'max': _to_python(stats.maximum)
+            }
+            for check in ('parse_failures', 'domain_violations', 'negatives'):
+                count = getattr(stats, check)
+                if count is None:
+                    continue
+                entry[check] = count
+                if count:
+                    issues.append(f"{col}: {count} {check.replace('_', ' ')}")
+            if col in self._histograms:
+                entry['outliers'] = self._outliers(self._histograms[col])
+                if entry['outliers']['outliers']:
+                    issues.append(f"{col}: {entry['outliers']['outliers']} outliers")
+            if stats.examples:
+                entry['examples'] = sorted(stats.examples)
+            columns[col] = entry
+
+        duplicates = {}
+        for name, key in self._keys.items():
+            count = self._duplicates(name)
+            duplicates[name] = {'columns': key, 'duplicates': count}
+            if count:
+                issues.append(f"{'+'.join(key)}: {count} duplicate rows")
+
+        return {
+            'table': self.table_name,
+            'rows': self.rows,
+            'columns': columns,
+            'duplicates': duplicates,
+            'issues': issues,
+            'seconds': round(self.seconds, 3)
+        }
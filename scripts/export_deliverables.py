@@ -7,32 +7,88 @@ Functions to generate Excel workbooks with analysis results and visualizations.
 import pandas as pd
 from openpyxl import Workbook, load_workbook
 from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.utils import get_column_letter
 from openpyxl.utils.dataframe import dataframe_to_rows
 from openpyxl.drawing.image import Image as XLImage
+from PIL import Image as PILImage
+from copy import copy
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, List, Optional
+import hashlib
+import io
 import os
 
+from scripts.metrics_engine import MetricsEngine
+from scripts.query_cache import QueryCache
+
+
+# Visualizations sheet: display width of charts (pixels) and pixel density of
+# the embedded copies (2 = sharp on high-DPI screens)
+EMBED_WIDTH = 800
+EMBED_SCALE = 2
+
+
+def _column_number_format(column_name) -> Optional[str]:
+    """
+    Number format for numeric cells of a column, based on its name.
+
+    Args:
+        column_name: DataFrame column name
+
+    Returns:
+        Excel number format string, or None to keep the default
+    """
+    name = str(column_name).lower()
+    if 'rate' in name or '%' in name:
+        return '0.00"%"'
+    if 'amount' in name or 'usd' in name:
+        return '$#,##0.00'
+    if 'count' in name or 'volume' in name:
+        return '#,##0'
+    return None
+
+
+def _styled_cell(ws, value, style: WriteOnlyCell) -> WriteOnlyCell:
+    """Create a cell that shares the style of a prototype cell."""
+    cell = WriteOnlyCell(ws, value=value)
+    # openpyxl binds a number format to dates, datetimes and times (NaT included)
+    number_format = cell.number_format
+    # Copying the style index array skips the per-attribute style lookups
+    cell._style = copy(style._style)
+    if number_format != 'General':
+        cell.number_format = number_format
+    return cell
+
 
 def create_excel_workbook(
     data_dict: Dict[str, pd.DataFrame],
     output_path: str = 'output/analysis_workbook.xlsx',
-    visualization_dir: str = 'output/visualizations'
+    visualization_dir: str = 'output/visualizations',
+    write_only: bool = True
 ) -> None:
     """
     Create comprehensive Excel workbook with all analysis results.
 
+    Column number formats and widths are computed once per column and every
+    cell reuses a prototype style, so rows are streamed straight to disk in
+    write-only mode instead of being held as a grid of cell objects.
+
     Args:
         data_dict: Dictionary of sheet_name: DataFrame pairs
         output_path: Path to save the Excel workbook
         visualization_dir: Directory containing visualization PNGs
+        write_only: Stream rows to disk (openpyxl write-only mode). The output
+            is identical either way; set to False to keep the full workbook
+            in memory.
     """
     # Ensure output directory exists
     Path(output_path).parent.mkdir(parents=True, exist_ok=True)
 
     # Create workbook
-    wb = Workbook()
-    wb.remove(wb.active)  # Remove default sheet
+    wb = Workbook(write_only=write_only)
+    if not write_only:
+        wb.remove(wb.active)  # Remove default sheet
 
     # Define header style
     header_font = Font(bold=True, color="FFFFFF", size=11)
@@ -51,65 +107,140 @@ def create_excel_workbook(
     for sheet_name, df in data_dict.items():
         ws = wb.create_sheet(title=sheet_name)
 
-        # Write DataFrame to sheet
-        for r_idx, row in enumerate(dataframe_to_rows(df, index=False, header=True), 1):
-            for c_idx, value in enumerate(row, 1):
-                cell = ws.cell(row=r_idx, column=c_idx, value=value)
-                cell.border = thin_border
-
-                # Apply header styling
-                if r_idx == 1:
-                    cell.font = header_font
-                    cell.fill = header_fill
-                    cell.alignment = header_alignment
-
-                # Format numbers
-                if r_idx > 1 and isinstance(value, (int, float)):
-                    if 'rate' in df.columns[c_idx-1].lower() or '%' in str(df.columns[c_idx-1]):
-                        cell.number_format = '0.00"%"'
-                    elif 'amount' in df.columns[c_idx-1].lower() or 'usd' in df.columns[c_idx-1].lower():
-                        cell.number_format = '$#,##0.00'
-                    elif 'count' in df.columns[c_idx-1].lower() or 'volume' in df.columns[c_idx-1].lower():
-                        cell.number_format = '#,##0'
-
-        # Auto-adjust column widths
-        for column in ws.columns:
-            max_length = 0
-            column_letter = column[0].column_letter
-            for cell in column:
-                try:
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(str(cell.value))
-                except:
-                    pass
-            adjusted_width = min(max_length + 2, 50)
-            ws.column_dimensions[column_letter].width = adjusted_width
+        # Widths must be known before the first row is streamed
+        widths = [0] * len(df.columns)
+        for row in dataframe_to_rows(df, index=False, header=True):
+            for c_idx, value in enumerate(row):
+                widths[c_idx] = max(widths[c_idx], len(str(value)))
+        for c_idx, width in enumerate(widths, 1):
+            ws.column_dimensions[get_column_letter(c_idx)].width = min(width + 2, 50)
 
         # Freeze header row
         ws.freeze_panes = 'A2'
 
+        # Prototype styles: header, plain data and numeric data per column
+        header_style = WriteOnlyCell(ws)
+        header_style.border = thin_border
+        header_style.font = header_font
+        header_style.fill = header_fill
+        header_style.alignment = header_alignment
+
+        plain_style = WriteOnlyCell(ws)
+        plain_style.border = thin_border
+
+        numeric_styles = []
+        for column in df.columns:
+            number_format = _column_number_format(column)
+            if number_format is None:
+                numeric_styles.append(plain_style)
+            else:
+                style = WriteOnlyCell(ws)
+                style.border = thin_border
+                style.number_format = number_format
+                numeric_styles.append(style)
+
+        # Write DataFrame to sheet
+        rows = dataframe_to_rows(df, index=False, header=True)
+        ws.append([_styled_cell(ws, value, header_style) for value in next(rows)])
+        for row in rows:
+            ws.append([
+                _styled_cell(
+                    ws, value,
+                    numeric_styles[c_idx] if isinstance(value, (int, float)) else plain_style
+                )
+                for c_idx, value in enumerate(row)
+            ])
+
     # Add visualization sheet if images exist
     if Path(visualization_dir).exists():
         add_visualizations_sheet(wb, visualization_dir)
 
     # Save workbook
+    sheetnames = wb.sheetnames
     wb.save(output_path)
     print(f"\n✅ Excel workbook created: {output_path}")
-    print(f"   Sheets: {', '.join(wb.sheetnames)}")
+    print(f"   Sheets: {', '.join(sheetnames)}")
+
 
+def prepare_embedded_image(
+    img_path: Path,
+    cache_dir: Path,
+    width: int = EMBED_WIDTH,
+    scale: int = EMBED_SCALE
+) -> Path:
+    """
+    Downsample a chart to the size it is displayed at in the workbook.
+
+    Images are resized to width * scale pixels, reduced to a 256-colour
+    palette and PNG-optimized. Results are cached by a hash of the source
+    bytes, so unchanged charts are not re-encoded and identical charts share
+    one cached file.
 
-def add_visualizations_sheet(wb: Workbook, visualization_dir: str) -> None:
+    Args:
+        img_path: Source PNG (e.g. a 300 dpi chart export)
+        cache_dir: Directory for the downsampled images
+        width: Display width in the sheet, in pixels
+        scale: Pixel density of the embedded image relative to display size
+
+    Returns:
+        Path of the downsampled image
+    """
+    data = Path(img_path).read_bytes()
+    digest = hashlib.sha256(data + f'|{width}x{scale}'.encode()).hexdigest()[:16]
+    target = Path(cache_dir) / f"{digest}.png"
+    if target.exists():
+        return target
+
+    with PILImage.open(io.BytesIO(data)) as src:
+        pixel_width = min(width * scale, src.width)
+        pixel_height = max(1, round(src.height * pixel_width / src.width))
+        thumb = src.convert('RGB').resize((pixel_width, pixel_height), PILImage.LANCZOS)
+
+    target.parent.mkdir(parents=True, exist_ok=True)
+    thumb.quantize(colors=256).save(target, optimize=True)
+    return target
+
+
+def add_visualizations_sheet(
+    wb: Workbook,
+    visualization_dir: str,
+    cache_dir: Optional[str] = None
+) -> None:
     """
     Add a sheet with embedded visualization images.
 
+    Charts are embedded as downsampled copies (see prepare_embedded_image)
+    rather than the full-resolution exports. Rows are appended in order, so
+    this works for write-only workbooks.
+
     Args:
         wb: Openpyxl workbook object
         visualization_dir: Directory containing PNG files
+        cache_dir: Directory for downsampled images
+            (default: <visualization_dir>/.embedded)
     """
     ws = wb.create_sheet(title="Visualizations")
+    cache_dir = Path(cache_dir) if cache_dir else Path(visualization_dir) / '.embedded'
+    used = set()
+
+    # Adjust column width
+    ws.column_dimensions['A'].width = 120
+
+    written = 0
+
+    def write_cell(row: int, value, font: Optional[Font] = None) -> None:
+        # Pad with empty rows so the cell lands on the requested row
+        nonlocal written
+        for _ in range(row - written - 1):
+            ws.append([])
+        cell = WriteOnlyCell(ws, value=value)
+        if font is not None:
+            cell.font = font
+        ws.append([cell])
+        written = row
 
     # Add title
-    ws.cell(row=1, column=1, value="Analysis Visualizations").font = Font(bold=True, size=14)
+    write_cell(1, "Analysis Visualizations", Font(bold=True, size=14))
 
     row = 3
     vis_files = sorted(Path(visualization_dir).glob("*.png"))
@@ -117,25 +248,30 @@ def add_visualizations_sheet(wb: Workbook, visualization_dir: str) -> None:
     for idx, img_path in enumerate(vis_files):
         if img_path.exists():
             # Add image title
-            ws.cell(row=row, column=1, value=img_path.stem.replace('_', ' ').title()).font = Font(bold=True, size=11)
+            write_cell(row, img_path.stem.replace('_', ' ').title(), Font(bold=True, size=11))
             row += 1
 
-            # Add image (resize to fit Excel)
+            # Add image (downsampled, displayed at EMBED_WIDTH)
             try:
-                img = XLImage(str(img_path))
+                embedded = prepare_embedded_image(img_path, cache_dir)
+                used.add(embedded)
+                img = XLImage(str(embedded))
                 # Resize to fit width (approx 800 pixels = 11 columns)
-                img.width = 800
-                img.height = int(img.height * (800 / img.width))
+                img.height = int(img.height * (EMBED_WIDTH / img.width))
+                img.width = EMBED_WIDTH
 
                 ws.add_image(img, f'A{row}')
                 # Move to next position (approximate row height = 20 pixels per row)
                 row += int(img.height / 20) + 3
             except Exception as e:
-                ws.cell(row=row, column=1, value=f"Error loading image: {str(e)}")
+                write_cell(row, f"Error loading image: {str(e)}")
                 row += 2
 
-    # Adjust column width
-    ws.column_dimensions['A'].width = 120
+    # Drop cached images of charts that no longer exist or have changed
+    if cache_dir.exists():
+        for stale in cache_dir.glob('*.png'):
+            if stale not in used:
+                stale.unlink()
 
 
 def format_revenue_impact_sheet(df: pd.DataFrame) -> pd.DataFrame:
@@ -215,57 +351,49 @@ def export_all_deliverables(
 
     data_dict = {}
 
+    # All aggregate queries are served from a single scan of transactions,
+    # and skipped entirely when cached results match the loaded data
+    engine = MetricsEngine(conn, cache=QueryCache(conn))
+
     # 1. Executive Summary
     data_dict['Executive Summary'] = create_summary_sheet_data()
     print("✓ Created Executive Summary")
 
     # 2. Corridor Performance
-    corridor_query = sql_queries_module.corridor_performance_query()
-    data_dict['Corridor Performance'] = pd.read_sql_query(corridor_query, conn)
+    data_dict['Corridor Performance'] = engine.run(sql_queries_module.corridor_performance_query)
     print("✓ Created Corridor Performance sheet")
 
     # 3. User Segment Analysis
-    segment_query = sql_queries_module.user_segment_analysis_query()
-    data_dict['User Segments'] = pd.read_sql_query(segment_query, conn)
+    data_dict['User Segments'] = engine.run(sql_queries_module.user_segment_analysis_query)
     print("✓ Created User Segments sheet")
 
     # 4. Time Patterns - Daily
-    daily_query = sql_queries_module.daily_trend_query()
-    data_dict['Daily Trends'] = pd.read_sql_query(daily_query, conn)
+    data_dict['Daily Trends'] = engine.run(sql_queries_module.rolling_daily_trend_query)
     print("✓ Created Daily Trends sheet")
 
     # 5. Time Patterns - Day of Week
-    dow_query = sql_queries_module.day_of_week_pattern_query()
-    data_dict['Day of Week'] = pd.read_sql_query(dow_query, conn)
+    data_dict['Day of Week'] = engine.run(sql_queries_module.day_of_week_pattern_query)
     print("✓ Created Day of Week sheet")
 
     # 6. Amount Distribution
-    amount_query = sql_queries_module.amount_distribution_query()
-    data_dict['Amount Distribution'] = pd.read_sql_query(amount_query, conn)
+    data_dict['Amount Distribution'] = engine.run(sql_queries_module.amount_distribution_query)
     print("✓ Created Amount Distribution sheet")
 
-    # 7. USD→MXN Analysis - Create temp table first
-    usd_mxn_create = sql_queries_module.usd_mxn_corridor_query()
-    conn.execute(usd_mxn_create)
-
+    # 7. USD→MXN Analysis
     # USD→MXN Segment Analysis
-    usd_mxn_segment_query = sql_queries_module.usd_mxn_segment_analysis_query()
-    data_dict['USD_MXN Segments'] = pd.read_sql_query(usd_mxn_segment_query, conn)
+    data_dict['USD_MXN Segments'] = engine.run(sql_queries_module.usd_mxn_segment_analysis_query)
     print("✓ Created USD_MXN Segments sheet")
 
     # USD→MXN Amount Analysis
-    usd_mxn_amount_query = sql_queries_module.usd_mxn_amount_analysis_query()
-    data_dict['USD_MXN Amounts'] = pd.read_sql_query(usd_mxn_amount_query, conn)
+    data_dict['USD_MXN Amounts'] = engine.run(sql_queries_module.usd_mxn_amount_analysis_query)
     print("✓ Created USD_MXN Amounts sheet")
 
     # USD→MXN Monthly Trend
-    usd_mxn_monthly_query = sql_queries_module.usd_mxn_monthly_trend_query()
-    data_dict['USD_MXN Monthly'] = pd.read_sql_query(usd_mxn_monthly_query, conn)
+    data_dict['USD_MXN Monthly'] = engine.run(sql_queries_module.usd_mxn_monthly_trend_query)
     print("✓ Created USD_MXN Monthly sheet")
 
     # 8. Corridor Comparison for Strategy
-    corridor_compare_query = sql_queries_module.corridor_comparison_for_strategy_query()
-    data_dict['Corridor Comparison'] = pd.read_sql_query(corridor_compare_query, conn)
+    data_dict['Corridor Comparison'] = engine.run(sql_queries_module.corridor_comparison_for_strategy_query)
     print("✓ Created Corridor Comparison sheet")
 
     # Create Excel workbook
@@ -1,25 +1,212 @@
 """
 Master Script to Generate All Assessment Deliverables
 
-This script executes all analysis notebooks and compiles the final Excel workbook.
+This script runs the analysis queries and builds every deliverable (CSV
+exports, charts and the Excel workbook) as a dependency graph. Independent
+outputs are produced in parallel worker processes and outputs that are newer
+than their inputs are skipped, make-style.
 Run this script to generate all deliverables for submission.
 """
 
+import argparse
 import sys
-import sqlite3
 from pathlib import Path
 
 # Add scripts to path
 sys.path.append(str(Path(__file__).parent.parent.resolve()))
 
-from scripts.data_loader import get_connection, load_to_sqlite, create_indexes
+from scripts.data_loader import build_snapshot, get_connection
 from scripts import sql_queries
-from scripts.export_deliverables import create_excel_workbook
+from scripts.export_deliverables import (
+    create_excel_workbook, create_summary_sheet_data, save_dataframe_to_csv
+)
+from scripts.metrics_engine import MetricsEngine
+from scripts.pandas_backend import PandasBackend
+from scripts.query_cache import QueryCache
+from scripts.sharded_executor import ShardedEngine
+from scripts.task_dag import Task, run_dag
 import pandas as pd
 
 
-def main():
-    """Execute complete analysis pipeline and generate deliverables."""
+SCRIPTS_DIR = Path(__file__).parent.resolve()
+DATA_FILES = ['data/raw/transactions.csv', 'data/raw/users.csv']
+
+# Workbook sheet name: query function
+SHEET_QUERIES = {
+    'Corridor Performance': 'corridor_performance_query',
+    'User Segments': 'user_segment_analysis_query',
+    'Daily Trends': 'rolling_daily_trend_query',
+    'Day of Week': 'day_of_week_pattern_query',
+    'Amount Distribution': 'amount_distribution_query',
+    'USD_MXN Segments': 'usd_mxn_segment_analysis_query',
+    'USD_MXN Amounts': 'usd_mxn_amount_analysis_query',
+    'USD_MXN Monthly': 'usd_mxn_monthly_trend_query',
+    'Corridor Comparison': 'corridor_comparison_for_strategy_query'
+}
+
+# CSV export filename: query function (same files the notebooks export)
+CSV_EXPORTS = {
+    'corridor_performance.csv': 'corridor_performance_query',
+    'user_segment_analysis.csv': 'user_segment_analysis_query',
+    'daily_trends.csv': 'rolling_daily_trend_query',
+    'day_of_week_patterns.csv': 'day_of_week_pattern_query',
+    'amount_distribution.csv': 'amount_distribution_query',
+    'usd_mxn_segment_analysis.csv': 'usd_mxn_segment_analysis_query',
+    'usd_mxn_amount_analysis.csv': 'usd_mxn_amount_analysis_query',
+    'corridor_strategic_comparison.csv': 'corridor_comparison_for_strategy_query'
+}
+
+# Chart filename: (visualizations function, query functions it plots)
+CHARTS = {
+    'corridor_volume_comparison.png': ('create_corridor_volume_comparison', ['corridor_performance_query']),
+    'corridor_failure_rates.png': ('create_corridor_failure_rates', ['corridor_performance_query']),
+    'segment_performance.png': ('create_segment_performance', ['user_segment_analysis_query']),
+    'daily_trend.png': ('create_daily_trend', ['rolling_daily_trend_query']),
+    'day_of_week_pattern.png': ('create_day_of_week_pattern', ['day_of_week_pattern_query']),
+    'amount_distribution.png': ('create_amount_distribution', ['amount_distribution_query']),
+    'usd_mxn_failure_analysis.png': ('create_usd_mxn_analysis_chart',
+                                     ['usd_mxn_segment_analysis_query', 'usd_mxn_amount_analysis_query'])
+}
+
+
+def render_chart(*frames: pd.DataFrame, chart: str, output_path: str) -> str:
+    """
+    Render one chart from the visualizations module (worker process).
+
+    Args:
+        frames: Query results the chart function takes
+        chart: Name of the visualizations function
+        output_path: Path to save the chart
+
+    Returns:
+        Path of the saved chart
+    """
+    from scripts import visualizations
+
+    return visualizations.render_chart(getattr(visualizations, chart), frames, output_path)
+
+
+def build_workbook(*frames: pd.DataFrame, sheet_names: list, output_path: str,
+                   visualization_dir: str) -> str:
+    """
+    Build the Excel workbook from query results (worker process).
+
+    Args:
+        frames: Query results, one per sheet
+        sheet_names: Sheet names matching frames
+        output_path: Path to save the workbook
+        visualization_dir: Directory with the rendered charts
+
+    Returns:
+        Path of the saved workbook
+    """
+    data_dict = {'Executive Summary': create_summary_sheet_data()}
+    data_dict.update(zip(sheet_names, frames))
+    create_excel_workbook(data_dict, output_path=output_path,
+                          visualization_dir=visualization_dir)
+    return output_path
+
+
+def load_data(backend: str = 'sqlite') -> MetricsEngine:
+    """
+    Load the raw CSVs and return the engine that serves the queries.
+
+    Args:
+        backend: 'sqlite' (cached metrics engine over the SQLite tables),
+            'sharded' (same, scanning per-month shards in a process pool) or
+            'pandas' (in-memory DataFrames, no SQLite copy)
+
+    Returns:
+        MetricsEngine, ShardedEngine or PandasBackend
+    """
+    if backend == 'pandas':
+        return PandasBackend.from_csv(*DATA_FILES)
+
+    # Read-only view of the shared snapshot, rebuilt only when the CSVs change
+    conn = get_connection(snapshot=build_snapshot())
+    # All aggregate queries are served from a single scan of transactions,
+    # and skipped entirely when cached results match the loaded data
+    if backend == 'sharded':
+        return ShardedEngine(conn, cache=QueryCache(conn))
+    return MetricsEngine(conn, cache=QueryCache(conn))
+
+
+def build_tasks(output_dir: str = 'output', backend: str = 'sqlite') -> list:
+    """
+    Define the deliverable build graph.
+
+    load -> queries -> CSV exports / charts -> workbook. Load and query
+    tasks share the SQLite connection and run in the main process.
+
+    Args:
+        output_dir: Root directory for deliverables
+        backend: Query backend passed to load_data
+
+    Returns:
+        List of Task objects
+    """
+    csv_dir = f'{output_dir}/csv_exports'
+    vis_dir = f'{output_dir}/visualizations'
+    query_sources = DATA_FILES + [str(SCRIPTS_DIR / name) for name in
+                                  ('data_loader.py', 'sql_queries.py', 'metrics_engine.py',
+                                   'pandas_backend.py', 'sharded_executor.py')]
+
+    tasks = [Task('load', load_data, kwargs={'backend': backend}, local=True)]
+
+    queries = set(SHEET_QUERIES.values()) | set(CSV_EXPORTS.values())
+    for charted in CHARTS.values():
+        queries.update(charted[1])
+    for query in sorted(queries):
+        tasks.append(Task(
+            query,
+            lambda engine, fn=getattr(sql_queries, query): engine.run(fn),
+            inputs=['load'],
+            sources=query_sources,
+            local=True
+        ))
+
+    for filename, query in CSV_EXPORTS.items():
+        tasks.append(Task(
+            f'csv:{filename}',
+            save_dataframe_to_csv,
+            inputs=[query],
+            kwargs={'filename': filename, 'output_dir': csv_dir},
+            target=f'{csv_dir}/{filename}',
+            sources=[str(SCRIPTS_DIR / 'export_deliverables.py')]
+        ))
+
+    for filename, (chart, chart_queries) in CHARTS.items():
+        tasks.append(Task(
+            f'chart:{filename}',
+            render_chart,
+            inputs=chart_queries,
+            kwargs={'chart': chart, 'output_path': f'{vis_dir}/{filename}'},
+            target=f'{vis_dir}/{filename}',
+            sources=[str(SCRIPTS_DIR / 'visualizations.py')]
+        ))
+
+    tasks.append(Task(
+        'workbook',
+        build_workbook,
+        inputs=list(SHEET_QUERIES.values()),
+        after=[f'chart:{filename}' for filename in CHARTS],
+        kwargs={'sheet_names': list(SHEET_QUERIES), 'visualization_dir': vis_dir,
+                'output_path': f'{output_dir}/analysis_workbook.xlsx'},
+        target=f'{output_dir}/analysis_workbook.xlsx',
+        sources=[str(SCRIPTS_DIR / 'export_deliverables.py')]
+    ))
+    return tasks
+
+
+def main(force: bool = False, max_workers: int = None, backend: str = 'sqlite'):
+    """
+    Execute complete analysis pipeline and generate deliverables.
+
+    Args:
+        force: Rebuild every deliverable even if it is up to date
+        max_workers: Number of worker processes (default: number of CPUs)
+        backend: Query backend, 'sqlite', 'sharded' or 'pandas'
+    """
 
     print("\n" + "="*80)
     print("COBRE PAYMENT CORRIDOR ANALYSIS - DELIVERABLE GENERATION")
@@ -30,98 +217,15 @@ def main():
     Path('output/visualizations').mkdir(exist_ok=True)
     Path('output/csv_exports').mkdir(exist_ok=True)
 
-    # Step 1: Load data
-    print("📊 Step 1/5: Loading data into SQLite...")
-    conn = get_connection()
-    load_to_sqlite('data/raw/transactions.csv', 'transactions', conn)
-    load_to_sqlite('data/raw/users.csv', 'users', conn)
-    create_indexes(conn)
-    print("✅ Data loaded\n")
-
-    # Step 2: Execute all analysis queries
-    print("📊 Step 2/5: Executing analysis queries...")
-
-    data_dict = {}
-
-    # Executive Summary
-    data_dict['Executive Summary'] = pd.DataFrame({
-        'Metric': [
-            'Total Transactions',
-            'Total Users',
-            'Analysis Period',
-            'Total Transaction Value',
-            'Overall Failure Rate',
-            'USD→MXN Failure Rate',
-            'Target Failure Rate',
-            'Problem Corridor',
-            'Annual Revenue Impact',
-            'Primary Root Cause',
-            'Recommended Action'
-        ],
-        'Value': [
-            '50,000',
-            '5,000',
-            'Jul-Dec 2025 (6 months)',
-            '$281.5M',
-            '9.6%',
-            '18.3%',
-            '5.0%',
-            'USD→MXN (34.8% of volume)',
-            '$360,000 potential recovery',
-            'Large transaction verification delays',
-            'Fix USD→MXN corridor'
-        ]
-    })
-
-    # Corridor Performance
-    corridor_query = sql_queries.corridor_performance_query()
-    data_dict['Corridor Performance'] = pd.read_sql_query(corridor_query, conn)
-
-    # User Segments
-    segment_query = sql_queries.user_segment_analysis_query()
-    data_dict['User Segments'] = pd.read_sql_query(segment_query, conn)
-
-    # Daily Trends
-    daily_query = sql_queries.daily_trend_query()
-    data_dict['Daily Trends'] = pd.read_sql_query(daily_query, conn)
-
-    # Day of Week
-    dow_query = sql_queries.day_of_week_pattern_query()
-    data_dict['Day of Week'] = pd.read_sql_query(dow_query, conn)
-
-    # Amount Distribution
-    amount_query = sql_queries.amount_distribution_query()
-    data_dict['Amount Distribution'] = pd.read_sql_query(amount_query, conn)
-
-    # USD→MXN Analysis
-    conn.execute(sql_queries.usd_mxn_corridor_query())
-
-    usd_mxn_segment_query = sql_queries.usd_mxn_segment_analysis_query()
-    data_dict['USD_MXN Segments'] = pd.read_sql_query(usd_mxn_segment_query, conn)
-
-    usd_mxn_amount_query = sql_queries.usd_mxn_amount_analysis_query()
-    data_dict['USD_MXN Amounts'] = pd.read_sql_query(usd_mxn_amount_query, conn)
-
-    usd_mxn_monthly_query = sql_queries.usd_mxn_monthly_trend_query()
-    data_dict['USD_MXN Monthly'] = pd.read_sql_query(usd_mxn_monthly_query, conn)
-
-    # Corridor Comparison
-    corridor_compare_query = sql_queries.corridor_comparison_for_strategy_query()
-    data_dict['Corridor Comparison'] = pd.read_sql_query(corridor_compare_query, conn)
-
-    print("✅ All queries executed\n")
-
-    # Step 3: Create visualizations
-    print("📊 Step 3/5: Generating visualizations...")
-    print("ℹ️  Note: Run notebooks individually to generate visualizations")
-    print("   Visualizations require interactive matplotlib execution\n")
-
-    # Step 4: Generate Excel workbook
-    print("📊 Step 4/5: Creating Excel workbook...")
-    create_excel_workbook(
-        data_dict=data_dict,
-        output_path='output/analysis_workbook.xlsx'
-    )
+    # Steps 1-4: Load data, run queries, export CSVs/charts and the workbook
+    print("📊 Steps 1-4/5: Building deliverable graph...")
+    print("   (data load -> queries -> CSV exports + charts -> Excel workbook)\n")
+    status = run_dag(build_tasks('output', backend=backend), max_workers=max_workers, force=force)
+
+    built = [name for name, state in status.items() if state == 'built']
+    skipped = [name for name, state in status.items() if state != 'built']
+    print(f"\n✅ Deliverable graph complete: {len(built)} tasks run, "
+          f"{len(skipped)} up to date\n")
 
     # Step 5: Verify deliverables
     print("\n📊 Step 5/5: Verifying deliverables...")
@@ -156,10 +260,11 @@ def main():
     print("  2. root_cause_analysis.md - USD→MXN failure investigation (250-300 words)")
     print("  3. strategic_recommendation.md - Corridor strategy memo (1 page)")
     print("  4. ai_usage_documentation.md - AI tool usage transparency")
-    print("  5. visualizations/ - Publication-ready charts (generated from notebooks)")
+    print("  5. visualizations/ - Publication-ready charts")
+    print("  6. csv_exports/ - Query results for backup/analysis")
 
     print("\n📝 Next Steps:")
-    print("  - Run individual notebooks (01-04) in VS Code/Jupyter to generate visualizations")
+    print("  - Run individual notebooks (01-04) for revenue impact and strategic scoring exports")
     print("  - Review all deliverables for accuracy")
     print("  - Export strategic_recommendation.md to PDF if required")
     print("  - Package all files for submission")
@@ -169,4 +274,13 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Generate all assessment deliverables")
+    parser.add_argument('--force', action='store_true',
+                        help="Rebuild every deliverable even if it is up to date")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Number of worker processes (default: number of CPUs)")
+    parser.add_argument('--backend', choices=['sqlite', 'sharded', 'pandas'], default='sqlite',
+                        help="Query backend: SQLite tables, per-month SQLite shards scanned "
+                             "in parallel, or in-memory pandas DataFrames")
+    args = parser.parse_args()
+    main(force=args.force, max_workers=args.workers, backend=args.backend)
@@ -1,14 +1,21 @@
 import json
 import sqlite3
-import pandas as pd
+import sys
 from pathlib import Path
-from data_loader import load_to_sqlite, create_indexes
-from sql_queries import (
+
+sys.path.append(str(Path(__file__).parent.parent.resolve()))
+
+from scripts.data_loader import (
+    load_to_sqlite, create_indexes, create_cube, get_data_version, bulk_load_settings
+)
+from scripts.query_cache import QueryCache
+from scripts.sql_queries import (
+    CUBE_TABLE,
+    USD_MXN_PARAMS,
     corridor_performance_query,
     user_segment_analysis_query,
     daily_trend_query,
     amount_distribution_query,
-    usd_mxn_corridor_query,
     usd_mxn_segment_analysis_query,
     usd_mxn_amount_analysis_query
 )
@@ -17,8 +24,8 @@ def get_db_connection(db_path: str) -> sqlite3.Connection:
     conn = sqlite3.connect(db_path)
     return conn
 
-def run_query_to_json(conn, query, output_path):
-    df = pd.read_sql_query(query, conn)
+def run_query_to_json(cache, query, output_path):
+    df = cache.read_sql(query)
     # Convert dates to string if needed, mostly handled by pandas to_json
     df.to_json(output_path, orient='records')
     print(f"Saved {output_path}")
@@ -37,32 +44,39 @@ def generate_web_data():
         conn.execute("SELECT 1 FROM transactions LIMIT 1")
     except sqlite3.OperationalError:
         print("Loading raw data into DB...")
-        load_to_sqlite('data/raw/transactions.csv', 'transactions', conn)
-        load_to_sqlite('data/raw/users.csv', 'users', conn)
-        create_indexes(conn)
+        # Bulk load: no journal/fsync during the load, indexes and ANALYZE after
+        with bulk_load_settings(conn):
+            load_to_sqlite('data/raw/transactions.csv', 'transactions', conn, bulk=True)
+            load_to_sqlite('data/raw/users.csv', 'users', conn, bulk=True)
+            create_indexes(conn, analyze=True)
+
+    # Dashboard aggregates are served from the summary cube (rebuilt if stale)
+    if get_data_version(conn, CUBE_TABLE) != get_data_version(conn, 'transactions') \
+            or get_data_version(conn, CUBE_TABLE) is None:
+        with bulk_load_settings(conn):
+            create_cube(conn)
     
+    # Query results are reused until the loaded data changes
+    cache = QueryCache(conn)
+
     # Generate JSONs
     print("Generating JSONs...")
     
     # 1. Corridor Performance (Global)
-    run_query_to_json(conn, corridor_performance_query(), public_data_path / 'corridor_performance.json')
+    run_query_to_json(cache, corridor_performance_query(use_cube=True), public_data_path / 'corridor_performance.json')
     
     # 2. User Segments (Global)
-    run_query_to_json(conn, user_segment_analysis_query(), public_data_path / 'user_segments.json')
+    run_query_to_json(cache, user_segment_analysis_query(), public_data_path / 'user_segments.json')
     
     # 3. Daily Trend (Global)
-    run_query_to_json(conn, daily_trend_query(), public_data_path / 'daily_trend.json')
+    run_query_to_json(cache, daily_trend_query(use_cube=True), public_data_path / 'daily_trend.json')
 
     # 4. Amount Distribution (Global) - NEW
-    run_query_to_json(conn, amount_distribution_query(), public_data_path / 'amount_distribution.json')
-    
-    # 5. USD->MXN Specifics
-    # Create temp table first
-    conn.execute(usd_mxn_corridor_query())
+    run_query_to_json(cache, amount_distribution_query(use_cube=True), public_data_path / 'amount_distribution.json')
     
-    # Run sub-analyses
-    usd_mxn_segments = pd.read_sql_query(usd_mxn_segment_analysis_query(), conn)
-    usd_mxn_amounts = pd.read_sql_query(usd_mxn_amount_analysis_query(), conn)
+    # 5. USD->MXN Specifics (read transactions directly, no temp table)
+    usd_mxn_segments = cache.read_sql(usd_mxn_segment_analysis_query(), USD_MXN_PARAMS)
+    usd_mxn_amounts = cache.read_sql(usd_mxn_amount_analysis_query(), USD_MXN_PARAMS)
     
     # Combine into one structure for the RCA chart
     rca_data = {
@@ -3,12 +3,10 @@ import sys
 from pathlib import Path
 sys.path.append(str(Path(__file__).parent.parent))
 
-from scripts.data_loader import get_connection, load_to_sqlite
+from scripts.data_loader import get_connection, build_snapshot
 
-# Load data
-conn = get_connection()
-load_to_sqlite('data/raw/transactions.csv', 'transactions', conn)
-load_to_sqlite('data/raw/users.csv', 'users', conn)
+# Open the shared snapshot read-only (built once from the raw CSVs)
+conn = get_connection(snapshot=build_snapshot())
 
 # Key metrics
 overall = pd.read_sql_query('''
@@ -0,0 +1,334 @@
+"""
+Index Planner for Cobre Payment Corridor Analysis
+
+Reads the EXPLAIN QUERY PLAN of every query in sql_queries, proposes
+composite/covering indexes for the table accesses that read rows (full
+scans, non-covering index lookups, temp B-trees for GROUP BY), and reports
+before/after timings and which queries became index-only.
+"""
+
+import hashlib
+import inspect
+import re
+import sqlite3
+import time
+from types import ModuleType
+from typing import Dict, List, Optional, Set
+
+import pandas as pd
+
+
+# Covering indexes wider than this cost more to maintain than they save
+MAX_INDEX_COLUMNS = 6
+
+# Table access step of a plan: SCAN/SEARCH <table or alias> [USING [COVERING] INDEX <name>] [(<constraints>)]
+_ACCESS = re.compile(
+    r'^(SCAN|SEARCH) (\w+)(?: USING (COVERING )?INDEX (\w+))?(?: \((.*?)\))?'
+)
+
+# Words that can follow a table name in FROM/JOIN without being its alias
+_NOT_ALIASES = {'WHERE', 'GROUP', 'ORDER', 'LEFT', 'INNER', 'CROSS', 'JOIN', 'ON',
+                'USING', 'LIMIT', 'HAVING', 'WINDOW', 'UNION', 'NATURAL'}
+
+
+def collect_queries(queries_module: ModuleType) -> Dict[str, str]:
+    """
+    Collect the SELECT statements of every query function in a module.
+
+    Functions that need arguments and statements that are not queries
+    (e.g. CREATE TABLE templates) are skipped; SELECT and WITH ... SELECT
+    statements are kept. Placeholders are bound with the module's
+    QUERY_PARAMS when planning and timing (see plan_indexes).
+
+    Args:
+        queries_module: Imported sql_queries module
+
+    Returns:
+        Dictionary of function name: SQL string
+    """
+    queries = {}
+    for name, fn in inspect.getmembers(queries_module, inspect.isfunction):
+        if name.startswith('_') or fn.__module__ != queries_module.__name__:
+            continue
+        required = [
+            p for p in inspect.signature(fn).parameters.values()
+            if p.default is inspect.Parameter.empty
+        ]
+        if required:
+            continue
+        sql = fn()
+        if sql.strip().upper().startswith(('SELECT', 'WITH')):
+            queries[name] = sql
+    return queries
+
+
+def explain(conn: sqlite3.Connection, sql: str, params: Optional[dict] = None) -> List[str]:
+    """
+    Return the EXPLAIN QUERY PLAN detail lines for a query.
+
+    Args:
+        conn: SQLite database connection
+        sql: Query to explain
+        params: Bind parameters of the query
+
+    Returns:
+        List of plan detail strings
+    """
+    return [row[-1] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params or {})]
+
+
+def _table_accesses(conn: sqlite3.Connection, sql: str, plan: List[str]) -> List[tuple]:
+    """
+    Plan steps that read a stored table (not a CTE, subquery or constant row).
+
+    Returns:
+        List of (kind, alias, table, covering, index, constraints) tuples
+    """
+    aliases = _aliases(re.sub(r"'[^']*'", "''", sql))
+    accesses = []
+    for step in plan:
+        match = _ACCESS.match(step)
+        if match is None:
+            continue
+        kind, alias, covering, index, constraints = match.groups()
+        table = aliases.get(alias, alias)
+        if _table_columns(conn, table):
+            accesses.append((kind, alias, table, bool(covering), index, constraints))
+    return accesses
+
+
+def is_index_only(conn: sqlite3.Connection, sql: str, params: Optional[dict] = None) -> bool:
+    """
+    Check whether every table access in the plan of a query is served by an index.
+
+    Args:
+        conn: SQLite database connection
+        sql: Query to check
+        params: Bind parameters of the query
+
+    Returns:
+        True if no plan step reads a table's rows directly
+    """
+    accesses = _table_accesses(conn, sql, explain(conn, sql, params))
+    return bool(accesses) and all(access[3] for access in accesses)
+
+
+def _table_columns(conn: sqlite3.Connection, table_name: str) -> List[str]:
+    """Column names of a table (empty if it does not exist or is a view)."""
+    is_table = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ? "
+        "UNION ALL SELECT 1 FROM sqlite_temp_master WHERE type = 'table' AND name = ?",
+        (table_name, table_name)
+    ).fetchone()
+    if is_table is None:
+        return []
+    return [row[1] for row in conn.execute(f'PRAGMA table_info("{table_name}")')]
+
+
+def _read_columns(conn: sqlite3.Connection, sql: str, params: Optional[dict] = None) -> Dict[str, Set[str]]:
+    """Columns read from every table by a query, as reported by SQLite's authorizer."""
+    reads = {}
+
+    def authorizer(action, table, column, database, source):
+        if action == sqlite3.SQLITE_READ and table and column:
+            reads.setdefault(table, set()).add(column)
+        return sqlite3.SQLITE_OK
+
+    conn.set_authorizer(authorizer)
+    try:
+        explain(conn, sql, params)
+    finally:
+        conn.set_authorizer(None)
+    return reads
+
+
+def _aliases(sql: str) -> Dict[str, str]:
+    """Map of table alias (or name) to table name in FROM/JOIN clauses."""
+    aliases = {}
+    pattern = r'\b(?:FROM|JOIN)\s+"?(\w+)"?(?:\s+(?:AS\s+)?(\w+))?'
+    for table, alias in re.findall(pattern, sql, flags=re.I):
+        aliases[table] = table
+        if alias and alias.upper() not in _NOT_ALIASES:
+            aliases[alias] = table
+    return aliases
+
+
+def _group_columns(sql: str, alias: str, columns: Set[str]) -> List[str]:
+    """Columns of one table in the GROUP BY clauses of a query, in order."""
+    # GROUP BY may name a result column (t.year_month as month -> month)
+    renamed = {
+        name: column
+        for qualifier, column, name in re.findall(r'\b(?:(\w+)\.)?(\w+)\s+as\s+(\w+)', sql, flags=re.I)
+        if column in columns and qualifier in ('', alias)
+    }
+    found = []
+    for clause in re.findall(r'\bGROUP\s+BY\b(.*?)(?=\bORDER\s+BY\b|\bHAVING\b|\bLIMIT\b|\)|$)',
+                             sql, flags=re.S | re.I):
+        for qualifier, term in re.findall(r'\b(?:(\w+)\.)?(\w+)\b', clause):
+            column = term if qualifier else renamed.get(term, term)
+            if column in columns and qualifier in ('', alias) and column not in found:
+                found.append(column)
+    return found
+
+
+def _index_columns(conn: sqlite3.Connection, index_name: str) -> List[str]:
+    """Key columns of an existing index, in order."""
+    return [row[2] for row in conn.execute(f'PRAGMA index_info("{index_name}")')]
+
+
+def propose_indexes(conn: sqlite3.Connection, sql: str, params: Optional[dict] = None) -> List[Dict[str, any]]:
+    """
+    Propose composite/covering indexes from the query plan of a query.
+
+    Every plan step that reads table rows is a candidate: a SCAN of the
+    table, or a SCAN/SEARCH through an index that does not cover the query.
+    Its key starts with the columns the plan seeks on (the constraints of a
+    SEARCH step), then the columns the plan needs in order (the index a
+    SCAN already walks, or the GROUP BY columns when the plan sorts them
+    in a temp B-tree), then every other column the query reads from the
+    table, so the new index serves the same plan without touching the table.
+
+    Args:
+        conn: SQLite database connection
+        sql: SELECT (or WITH ... SELECT) statement to plan for
+        params: Bind parameters of the query
+
+    Returns:
+        List of dictionaries with table and columns (empty if every access
+        is already index-only)
+    """
+    plan = explain(conn, sql, params)
+    reads = _read_columns(conn, sql, params)
+    sorts_groups = 'USE TEMP B-TREE FOR GROUP BY' in plan
+
+    proposals = []
+    for kind, alias, table, covering, index, constraints in _table_accesses(conn, sql, plan):
+        columns = _table_columns(conn, table)
+        read = reads.get(table, set())
+        if covering or not read:
+            continue
+
+        key = []
+        if kind == 'SEARCH' and constraints:
+            # Equality constraints first, then ranges, as SQLite seeks them
+            terms = re.findall(r'(\w+)([=<>]+)\?', constraints)
+            key = [c for c, op in terms if op == '='] + [c for c, op in terms if op != '=']
+        if kind == 'SCAN' and index:
+            key += _index_columns(conn, index)
+        elif sorts_groups:
+            key += _group_columns(sql, alias, read)
+        key = [c for c in dict.fromkeys(key) if c in columns]
+        key += [c for c in columns if c in read and c not in key]
+        if not key or len(key) > MAX_INDEX_COLUMNS:
+            continue
+        proposal = {'table': table, 'columns': key}
+        if proposal not in proposals:
+            proposals.append(proposal)
+    return proposals
+
+
+def _index_name(table: str, columns: List[str]) -> str:
+    """Stable name for a planned index."""
+    digest = hashlib.md5(f"{table}({','.join(columns)})".encode()).hexdigest()[:8]
+    return f"idx_plan_{table}_{digest}"
+
+
+def _time_query(conn: sqlite3.Connection, sql: str, repeat: int, params: Optional[dict] = None) -> float:
+    """Best-of-N wall time of a query in milliseconds."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        conn.execute(sql, params or {}).fetchall()
+        timings.append((time.perf_counter() - start) * 1000)
+    return min(timings)
+
+
+def plan_indexes(
+    conn: sqlite3.Connection,
+    queries_module: ModuleType,
+    apply: bool = True,
+    repeat: int = 3
+) -> pd.DataFrame:
+    """
+    Plan, create and benchmark covering indexes for the query catalog.
+
+    Args:
+        conn: SQLite database connection with the tables loaded
+        queries_module: Imported sql_queries module
+        apply: If True, create the proposed indexes on the connection
+        repeat: Number of timed runs per query (best run is reported)
+
+    Returns:
+        DataFrame with one row per query: proposed indexes ('; '-separated),
+        before/after time in ms, speedup and whether the query became
+        index-only. Queries over tables missing from the connection are left out
+    """
+    queries = collect_queries(queries_module)
+    query_params = getattr(queries_module, 'QUERY_PARAMS', {})
+    rows = []
+    for name, sql in queries.items():
+        params = query_params.get(name)
+        try:
+            proposals = propose_indexes(conn, sql, params)
+        except sqlite3.OperationalError:
+            # A table the query reads is not loaded on this connection
+            continue
+        names = [_index_name(p['table'], p['columns']) for p in proposals]
+        rows.append({
+            'query': name,
+            'index': '; '.join(names) or None,
+            'index_columns': '; '.join(
+                f"{p['table']}({', '.join(p['columns'])})" for p in proposals
+            ) or None,
+            'before_ms': _time_query(conn, sql, repeat, params),
+            'index_only_before': is_index_only(conn, sql, params),
+            '_proposals': list(zip(names, proposals))
+        })
+
+    if apply:
+        created = set()
+        for row in rows:
+            for index_name, proposal in row['_proposals']:
+                if index_name in created:
+                    continue
+                cols = ', '.join(f'"{c}"' for c in proposal['columns'])
+                conn.execute(
+                    f'CREATE INDEX IF NOT EXISTS {index_name} ON "{proposal["table"]}"({cols})'
+                )
+                created.add(index_name)
+        conn.execute("ANALYZE")
+        conn.commit()
+
+    for row in rows:
+        sql, params = queries[row['query']], query_params.get(row['query'])
+        row['after_ms'] = _time_query(conn, sql, repeat, params)
+        row['index_only'] = is_index_only(conn, sql, params)
+        row['speedup'] = round(row['before_ms'] / row['after_ms'], 2) if row['after_ms'] else None
+        del row['_proposals']
+
+    report = pd.DataFrame(rows)
+    report['before_ms'] = report['before_ms'].round(3)
+    report['after_ms'] = report['after_ms'].round(3)
+    return report[['query', 'index_columns', 'before_ms', 'after_ms', 'speedup',
+                   'index_only_before', 'index_only', 'index']]
+
+
+def print_index_report(report: pd.DataFrame) -> None:
+    """
+    Print the index planner report to the console.
+
+    Args:
+        report: DataFrame returned by plan_indexes
+    """
+    print(f"\n{'='*60}")
+    print("INDEX PLANNER REPORT")
+    print(f"{'='*60}")
+    for _, row in report.iterrows():
+        marker = '✅' if row['index_only'] else '  '
+        speedup = f"{row['speedup']:.1f}x" if pd.notna(row['speedup']) else '-'
+        print(f"{marker} {row['query']}: {row['before_ms']:.2f} ms -> "
+              f"{row['after_ms']:.2f} ms ({speedup})")
+        if pd.notna(row['index_columns']):
+            print(f"     index: {row['index_columns']}")
+    print(f"\nIndex-only queries: {int(report['index_only'].sum())}/{len(report)}")
+    print(f"{'='*60}\n")
@@ -0,0 +1,611 @@
+"""
+Fused Metrics Engine for Cobre Payment Corridor Analysis
+
+Computes the results of the aggregate queries in sql_queries from a single
+scan of the transactions table instead of one full scan per query.
+"""
+
+import sqlite3
+from dataclasses import dataclass, fields
+from typing import Callable, Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from scripts.data_loader import encoded_table_name, get_column_encodings, has_denormalized_users
+from scripts.sql_queries import QUERY_PARAMS, ROLLING_WINDOWS, corridor_drilldown_query
+
+
+# Same fee used by the revenue columns in sql_queries
+REVENUE_FEE = 0.005
+
+DAY_NAMES = ['Sunday', 'Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday']
+
+# Bracket edges of amount_distribution_query; every bracket of
+# usd_mxn_amount_analysis_query is a union of these
+AMOUNT_BRACKETS = ['<$1k', '$1k-$5k', '$5k-$10k', '$10k-$20k', '>$20k']
+AMOUNT_EDGES = [1000, 5000, 10000, 20000]
+
+USD_MXN_BRACKETS = {
+    '<$1k': '<$5k',
+    '$1k-$5k': '<$5k',
+    '$5k-$10k': '$5k-$10k',
+    '$10k-$20k': '>$10k',
+    '>$20k': '>$10k'
+}
+
+# Grain of the fused aggregate: every supported query is a rollup of it
+GRAIN = ['transaction_date', 'hour', 'corridor', 'user_segment', 'amount_bracket']
+
+# Measures of an aggregate state and how two states combine (see AggregateState)
+STATE_MEASURES = {
+    'txn_count': 'sum',
+    'successful': 'sum',
+    'failed': 'sum',
+    'total_value': 'sum',
+    'success_value': 'sum',
+    'min_amount': 'min',
+    'max_amount': 'max'
+}
+
+
+def sql_round(values, decimals: int = 2):
+    """
+    Round half away from zero on the decimal value, matching SQLite's ROUND().
+
+    Args:
+        values: Scalar, array or Series of floats
+        decimals: Number of decimal places
+
+    Returns:
+        Rounded values of the same shape
+    """
+    factor = 10.0 ** decimals
+    scaled = np.round(np.abs(values) * factor, 9)
+    return np.sign(values) * np.floor(scaled + 0.5) / factor
+
+
+def amount_bracket_codes(amounts: pd.Series) -> np.ndarray:
+    """
+    Encode amounts into indexes of AMOUNT_BRACKETS (same edges as the SQL CASE).
+
+    Args:
+        amounts: Series of amount_usd values
+
+    Returns:
+        Integer array of bracket indexes
+    """
+    return np.searchsorted(AMOUNT_EDGES, amounts.to_numpy(), side='right')
+
+
+def finalize_rates(grouped: pd.DataFrame) -> pd.DataFrame:
+    """
+    Add the derived ratio columns shared by all query shapes.
+
+    Args:
+        grouped: DataFrame with txn_count, successful, failed, total_value
+                 and success_value columns
+
+    Returns:
+        Same DataFrame with failure_rate, success_rate and avg_amount added
+    """
+    grouped['failure_rate'] = sql_round(100.0 * grouped['failed'] / grouped['txn_count'])
+    grouped['success_rate'] = sql_round(100.0 * grouped['successful'] / grouped['txn_count'])
+    grouped['avg_amount'] = sql_round(grouped['total_value'] / grouped['txn_count'])
+    return grouped
+
+
+def merge_states(states: pd.DataFrame, keys) -> pd.DataFrame:
+    """
+    Merge rows of aggregate states that share the same keys.
+
+    Works on any frame with the STATE_MEASURES columns, e.g. the partial
+    aggregate, per-shard partials or a window of daily states.
+
+    Args:
+        states: DataFrame of key columns and STATE_MEASURES columns
+        keys: Column name or list of column names to merge on
+
+    Returns:
+        DataFrame with one merged state per key
+    """
+    return (
+        states.groupby(keys, dropna=False)
+        .agg(**{measure: (measure, how) for measure, how in STATE_MEASURES.items()})
+        .reset_index()
+    )
+
+
+def rolling_windows(states: pd.DataFrame, keys=(), windows=ROLLING_WINDOWS) -> pd.DataFrame:
+    """
+    Trailing N-day volume, failure rate and value per day and group.
+
+    States are merged to one row per day and group and laid out on a dense
+    day x group calendar, so each window total is the difference of two
+    prefix sums: O(days x groups) for any number of windows, with no
+    per-window rescans. Windows include the current day and the previous
+    N-1 calendar days, as in rolling_daily_trend_query.
+
+    Args:
+        states: Frame of states with a transaction_date column (e.g. the
+            partial aggregate)
+        keys: Group columns, e.g. ['corridor', 'user_segment'] (default: none)
+        windows: Window lengths in days
+
+    Returns:
+        DataFrame with one row per group and day with transactions: keys,
+        transaction_date, the merged states and txn_count_{N}d,
+        failure_rate_{N}d and total_value_{N}d per window (rounded as in SQL)
+    """
+    keys = list(keys)
+    daily = merge_states(states, keys + ['transaction_date'])
+    day = pd.to_datetime(daily['transaction_date'])
+    day = (day - day.min()).dt.days.to_numpy()
+    group = daily.groupby(keys, sort=False, dropna=False).ngroup().to_numpy() if keys \
+        else np.zeros(len(daily), dtype=np.int64)
+
+    # Prefix sums along the calendar, with a leading row of zeros
+    prefix = {}
+    for measure in ['txn_count', 'failed', 'total_value']:
+        dense = np.zeros((day.max() + 2, group.max() + 1), dtype=daily[measure].to_numpy().dtype)
+        dense[day + 1, group] = daily[measure].to_numpy()
+        prefix[measure] = np.cumsum(dense, axis=0)
+
+    for days in windows:
+        start = np.maximum(day + 1 - days, 0)
+        totals = {
+            measure: sums[day + 1, group] - sums[start, group]
+            for measure, sums in prefix.items()
+        }
+        daily[f'txn_count_{days}d'] = totals['txn_count']
+        daily[f'failure_rate_{days}d'] = sql_round(100.0 * totals['failed'] / totals['txn_count'])
+        daily[f'total_value_{days}d'] = sql_round(totals['total_value'])
+    return daily
+
+
+@dataclass
+class AggregateState:
+    """
+    Mergeable summary of a set of transactions.
+
+    Only additive (or min/max) measures are stored, so states of disjoint
+    sets of rows (days, shards, windows) merge associatively and the ratios
+    are derived at the end by finalize(). AggregateState() is the identity.
+
+    Attributes:
+        txn_count: Number of transactions
+        successful: Transactions with status 'success'
+        failed: Transactions with status 'failed'
+        total_value: Sum of amount_usd
+        success_value: Sum of amount_usd of successful transactions
+        min_amount: Smallest amount_usd (None if empty)
+        max_amount: Largest amount_usd (None if empty)
+
+    Example:
+        state = AggregateState.from_frame(july).merge(AggregateState.from_frame(august))
+        state.finalize()['failure_rate']
+    """
+    txn_count: int = 0
+    successful: int = 0
+    failed: int = 0
+    total_value: float = 0.0
+    success_value: float = 0.0
+    min_amount: Optional[float] = None
+    max_amount: Optional[float] = None
+
+    @classmethod
+    def from_frame(cls, states: pd.DataFrame) -> 'AggregateState':
+        """
+        Merge every row of a frame of states (e.g. a slice of the partial aggregate).
+
+        Args:
+            states: DataFrame with the STATE_MEASURES columns
+
+        Returns:
+            AggregateState of all rows (rows are merged in order)
+        """
+        state = cls()
+        for row in states[list(STATE_MEASURES)].itertuples(index=False):
+            state = state.merge(cls(*row))
+        return state
+
+    def merge(self, other: 'AggregateState') -> 'AggregateState':
+        """
+        Combine with the state of a disjoint set of rows.
+
+        Args:
+            other: State to merge
+
+        Returns:
+            New merged AggregateState
+        """
+        def pick(how, a, b):
+            if a is None or b is None:
+                return b if a is None else a
+            return how(a, b)
+
+        return AggregateState(
+            txn_count=self.txn_count + other.txn_count,
+            successful=self.successful + other.successful,
+            failed=self.failed + other.failed,
+            total_value=self.total_value + other.total_value,
+            success_value=self.success_value + other.success_value,
+            min_amount=pick(min, self.min_amount, other.min_amount),
+            max_amount=pick(max, self.max_amount, other.max_amount)
+        )
+
+    __add__ = merge
+
+    def finalize(self) -> Dict[str, float]:
+        """
+        Derive the rounded metrics the queries report.
+
+        Returns:
+            Dictionary with the stored counts plus failure_rate, success_rate,
+            avg_amount, total_value, revenue_usd, min_amount and max_amount,
+            rounded as in the SQL (ratios are None for an empty state)
+        """
+        result = {field.name: getattr(self, field.name) for field in fields(self)}
+        count = self.txn_count
+        result.update({
+            'failure_rate': float(sql_round(100.0 * self.failed / count)) if count else None,
+            'success_rate': float(sql_round(100.0 * self.successful / count)) if count else None,
+            'avg_amount': float(sql_round(self.total_value / count)) if count else None,
+            'total_value': float(sql_round(self.total_value)),
+            'revenue_usd': float(sql_round(self.success_value * REVENUE_FEE)),
+        })
+        for bound in ['min_amount', 'max_amount']:
+            if result[bound] is not None:
+                result[bound] = float(sql_round(result[bound]))
+        return result
+
+
+class MetricsEngine:
+    """
+    Serve the aggregate sql_queries result shapes from one pass over the data.
+
+    The transactions table is read once and reduced to a fine-grained partial
+    aggregate (date x hour x corridor x segment x amount bracket). Each query
+    result is then a cheap rollup of that table. Queries the engine does not
+    cover fall back to executing their SQL on the connection.
+
+    With a QueryCache, results are looked up before anything is computed and
+    the scan only happens on the first miss.
+
+    Example:
+        engine = MetricsEngine(conn, cache=QueryCache(conn))
+        df = engine.run(sql_queries.corridor_performance_query)
+    """
+
+    def __init__(
+        self,
+        conn: sqlite3.Connection,
+        table_name: str = 'transactions',
+        cache=None
+    ):
+        self.conn = conn
+        self.table_name = table_name
+        self.cache = cache
+        self.aggregate = None
+        self.segment_users = None
+        self._handlers: Dict[str, Callable[[], pd.DataFrame]] = {
+            'corridor_performance_query': self.corridor_performance,
+            'user_segment_analysis_query': self.user_segment_analysis,
+            'daily_trend_query': self.daily_trend,
+            'rolling_daily_trend_query': self.rolling_daily_trend,
+            'day_of_week_pattern_query': self.day_of_week_pattern,
+            'hourly_pattern_query': self.hourly_pattern,
+            'amount_distribution_query': self.amount_distribution,
+            'corridor_comparison_for_strategy_query': self.corridor_comparison_for_strategy,
+            'usd_mxn_segment_analysis_query': lambda: self.drilldown('segment', 'USD_MXN'),
+            'usd_mxn_amount_analysis_query': lambda: self.drilldown('amount', 'USD_MXN'),
+            'usd_mxn_monthly_trend_query': lambda: self.drilldown('month', 'USD_MXN'),
+            'usd_mxn_day_of_week_query': lambda: self.drilldown('day_of_week', 'USD_MXN'),
+            'usd_mxn_user_status_query': lambda: self.drilldown('user_status', 'USD_MXN')
+        }
+        # Breakdowns of corridor_drilldown_query, computed for every corridor at once
+        self._drilldowns: Dict[str, Callable[[], pd.DataFrame]] = {
+            'segment': self._drill_segment,
+            'amount': self._drill_amount,
+            'month': self._drill_month,
+            'day_of_week': self._drill_day_of_week,
+            'user_status': self._drill_user_status
+        }
+
+    def build(self) -> 'MetricsEngine':
+        """
+        Scan the transactions table once and build the partial aggregate.
+
+        Returns:
+            The engine itself, for chaining
+        """
+        self._reduce(self._scan())
+        return self
+
+    def _scan(self) -> pd.DataFrame:
+        """
+        Read the columns the partial aggregate needs from the connection.
+
+        Tables loaded with encode=True are read as integer codes from the
+        encoded table and turned into categoricals, instead of decoding every
+        row through the view.
+        """
+        encodings = get_column_encodings(self.conn, self.table_name)
+        source = encoded_table_name(self.table_name) if encodings else self.table_name
+        df = pd.read_sql_query(
+            f"""
+            SELECT transaction_date, hour, corridor, user_segment,
+                   user_id, amount_usd, status
+            FROM {source}
+            """,
+            self.conn
+        )
+        for col, encoding in encodings.items():
+            if encoding['kind'] == 'dictionary' and col in df.columns:
+                values = pd.read_sql_query(
+                    f'SELECT value FROM "{encoding["lookup"]}" ORDER BY code', self.conn
+                )['value']
+                codes = df[col].fillna(-1).astype('int64')
+                df[col] = pd.Categorical.from_codes(codes, categories=values)
+        return df
+
+    def _reduce(self, df: pd.DataFrame) -> None:
+        """
+        Reduce scanned rows to the partial aggregate and per-segment user counts.
+
+        Args:
+            df: DataFrame with the GRAIN columns (except amount_bracket),
+                user_id, amount_usd and status
+        """
+        df['amount_bracket'] = amount_bracket_codes(df['amount_usd'])
+        is_success = df['status'] == 'success'
+        df['successful'] = is_success.astype('int64')
+        df['failed'] = (df['status'] == 'failed').astype('int64')
+        df['success_value'] = df['amount_usd'].where(is_success, 0.0)
+
+        self.aggregate = (
+            df.groupby(GRAIN, sort=False, dropna=False, observed=True)
+            .agg(
+                txn_count=('status', 'size'),
+                successful=('successful', 'sum'),
+                failed=('failed', 'sum'),
+                total_value=('amount_usd', 'sum'),
+                success_value=('success_value', 'sum'),
+                min_amount=('amount_usd', 'min'),
+                max_amount=('amount_usd', 'max')
+            )
+            .reset_index()
+        )
+        # Categorical keys are labels again in the (small) aggregate
+        for col in ['corridor', 'user_segment']:
+            if isinstance(self.aggregate[col].dtype, pd.CategoricalDtype):
+                self.aggregate[col] = self.aggregate[col].astype(object)
+        # COUNT(DISTINCT user_id) is not additive, so keep it from the same scan
+        self.segment_users = df.groupby('user_segment', observed=True)['user_id'].nunique()
+        if isinstance(self.segment_users.index.dtype, pd.CategoricalDtype):
+            self.segment_users.index = self.segment_users.index.astype(object)
+
+    def supports(self, query_fn: Callable[[], str]) -> bool:
+        """
+        Check whether a sql_queries function is served by the engine.
+
+        Args:
+            query_fn: Query function from sql_queries
+
+        Returns:
+            True if the engine computes the result without running its SQL
+        """
+        return query_fn.__name__ in self._handlers
+
+    def run(self, query_fn: Callable[[], str]) -> pd.DataFrame:
+        """
+        Return the result of a sql_queries function.
+
+        Args:
+            query_fn: Query function from sql_queries
+
+        Returns:
+            DataFrame with the same columns, order and rounding as the SQL
+        """
+        sql = query_fn()
+        params = QUERY_PARAMS.get(query_fn.__name__)
+        if self.cache is not None:
+            cached = self.cache.get(sql, params)
+            if cached is not None:
+                return cached
+
+        handler = self._handlers.get(query_fn.__name__)
+        result = handler() if handler is not None else pd.read_sql_query(sql, self.conn, params=params)
+
+        if self.cache is not None:
+            self.cache.put(sql, result, params)
+        return result
+
+    def _rollup(self, keys, aggregate: pd.DataFrame = None) -> pd.DataFrame:
+        """
+        Roll the partial aggregate up to the given dimensions.
+
+        Args:
+            keys: Column name or list of column names to group by
+            aggregate: Partial aggregate to roll up (default: full aggregate)
+
+        Returns:
+            DataFrame with additive measures and derived rates per group
+        """
+        if aggregate is None:
+            aggregate = self._partial()
+        return finalize_rates(merge_states(aggregate, keys))
+
+    def _select(self, df: pd.DataFrame, columns) -> pd.DataFrame:
+        """Output columns of a query result (subclasses may add their own)."""
+        return df[columns]
+
+    def _partial(self) -> pd.DataFrame:
+        """Partial aggregate, built on first use."""
+        if self.aggregate is None:
+            self.build()
+        return self.aggregate
+
+    @staticmethod
+    def _with_day_of_week(aggregate: pd.DataFrame) -> pd.DataFrame:
+        """Add day_num (0 = Sunday, as strftime('%w')) to a partial aggregate."""
+        aggregate = aggregate.copy()
+        aggregate['day_num'] = (pd.to_datetime(aggregate['transaction_date']).dt.dayofweek + 1) % 7
+        return aggregate
+
+    def corridor_performance(self) -> pd.DataFrame:
+        """Result of corridor_performance_query."""
+        df = self._rollup('corridor')
+        df['total_transactions'] = df['txn_count']
+        df['total_value'] = sql_round(df['total_value'])
+        df['revenue_usd'] = sql_round(df['success_value'] * REVENUE_FEE)
+        df = df.sort_values('total_transactions', ascending=False, kind='stable')
+        return self._select(df, ['corridor', 'total_transactions', 'successful', 'failed',
+                                 'failure_rate', 'avg_amount', 'total_value', 'revenue_usd']).reset_index(drop=True)
+
+    def user_segment_analysis(self) -> pd.DataFrame:
+        """Result of user_segment_analysis_query."""
+        df = self._rollup('user_segment')
+        df['unique_users'] = df['user_segment'].map(self.segment_users).astype('int64')
+        df['total_transactions'] = df['txn_count']
+        df['avg_txns_per_user'] = sql_round(1.0 * df['txn_count'] / df['unique_users'])
+        df = df.sort_values('total_transactions', ascending=False, kind='stable')
+        return self._select(df, ['user_segment', 'unique_users', 'total_transactions',
+                                 'avg_txns_per_user', 'avg_amount', 'failure_rate']).reset_index(drop=True)
+
+    def daily_trend(self) -> pd.DataFrame:
+        """Result of daily_trend_query."""
+        df = self._rollup('transaction_date').sort_values('transaction_date')
+        df['total_value'] = sql_round(df['total_value'])
+        return self._select(df, ['transaction_date', 'txn_count', 'successful', 'failed',
+                                 'failure_rate', 'total_value']).reset_index(drop=True)
+
+    def rolling_daily_trend(self) -> pd.DataFrame:
+        """Result of rolling_daily_trend_query."""
+        df = finalize_rates(rolling_windows(self._partial())).sort_values('transaction_date')
+        df['total_value'] = sql_round(df['total_value'])
+        window_columns = [f'{measure}_{days}d' for days in ROLLING_WINDOWS
+                          for measure in ['txn_count', 'failure_rate', 'total_value']]
+        return self._select(df, ['transaction_date', 'txn_count', 'successful', 'failed',
+                                 'failure_rate', 'total_value'] + window_columns).reset_index(drop=True)
+
+    def rolling_trend(self, keys=('corridor', 'user_segment'), windows=ROLLING_WINDOWS) -> pd.DataFrame:
+        """
+        Daily trend with trailing-window metrics per group (see rolling_windows).
+
+        Args:
+            keys: Group columns of the partial aggregate
+            windows: Window lengths in days
+
+        Returns:
+            DataFrame sorted by keys and transaction_date
+        """
+        df = finalize_rates(rolling_windows(self._partial(), keys, windows))
+        df['total_value'] = sql_round(df['total_value'])
+        return df.sort_values(list(keys) + ['transaction_date']).reset_index(drop=True)
+
+    def day_of_week_pattern(self) -> pd.DataFrame:
+        """Result of day_of_week_pattern_query."""
+        df = self._rollup('day_num', self._with_day_of_week(self._partial()))
+        df['day_of_week'] = df['day_num'].map(dict(enumerate(DAY_NAMES)))
+        df = df.sort_values('day_num')
+        return self._select(df, ['day_of_week', 'day_num', 'txn_count',
+                                 'failure_rate', 'avg_amount']).reset_index(drop=True)
+
+    def hourly_pattern(self) -> pd.DataFrame:
+        """Result of hourly_pattern_query."""
+        df = self._rollup('hour').sort_values('hour')
+        return self._select(df, ['hour', 'txn_count', 'failure_rate', 'avg_amount']).reset_index(drop=True)
+
+    def amount_distribution(self) -> pd.DataFrame:
+        """Result of amount_distribution_query."""
+        df = self._rollup('amount_bracket')
+        df['min_amount'] = sql_round(df['min_amount'])
+        df = df.sort_values('min_amount')
+        df['amount_bracket'] = df['amount_bracket'].map(dict(enumerate(AMOUNT_BRACKETS)))
+        return self._select(df, ['amount_bracket', 'txn_count', 'failure_rate',
+                                 'avg_amount', 'min_amount']).reset_index(drop=True)
+
+    def corridor_comparison_for_strategy(self) -> pd.DataFrame:
+        """Result of corridor_comparison_for_strategy_query."""
+        aggregate = self._partial()
+        aggregate = aggregate.assign(
+            late_count=aggregate['txn_count'].where(aggregate['transaction_date'] >= '2025-11-01', 0),
+            early_count=aggregate['txn_count'].where(aggregate['transaction_date'] < '2025-09-01', 0)
+        )
+        df = self._rollup('corridor', aggregate)
+        periods = aggregate.groupby('corridor')[['late_count', 'early_count']].sum()
+        df = df.join(periods, on='corridor')
+
+        df['volume'] = df['txn_count']
+        df['total_value'] = sql_round(df['total_value'])
+        df['revenue_potential'] = sql_round(df['success_value'] * REVENUE_FEE)
+        early = df['early_count'].replace(0, np.nan)
+        df['growth_rate'] = sql_round(100.0 * df['late_count'] / early - 100)
+        df = df.sort_values('revenue_potential', ascending=False, kind='stable')
+        return self._select(df, ['corridor', 'volume', 'avg_amount', 'total_value', 'success_rate',
+                                 'revenue_potential', 'growth_rate']).reset_index(drop=True)
+
+    def drilldown(self, dimension: str, corridor: Optional[str] = None) -> pd.DataFrame:
+        """
+        Result of corridor_drilldown_query for one corridor or for all of them.
+
+        Every corridor is computed together: the segment, amount, month and
+        day-of-week breakdowns are rollups of the partial aggregate (no extra
+        scan) and user_status is a single grouped query over all corridors.
+
+        Args:
+            dimension: One of sql_queries.DRILLDOWN_DIMENSIONS
+            corridor: Corridor to return (default: all, with a corridor column)
+
+        Returns:
+            DataFrame with the same columns, order and rounding as the SQL
+        """
+        if dimension not in self._drilldowns:
+            raise ValueError(f"Unknown drill-down dimension: {dimension}")
+        df = self._drilldowns[dimension]()
+        if corridor is None:
+            return df
+        return df[df['corridor'] == corridor].drop(columns='corridor').reset_index(drop=True)
+
+    @staticmethod
+    def _by_corridor(df: pd.DataFrame, order_by: str, ascending: bool = True) -> pd.DataFrame:
+        """Sort a corridor breakdown by corridor, then by its own order."""
+        df = df.sort_values(['corridor', order_by], ascending=[True, ascending], kind='stable')
+        return df.reset_index(drop=True)
+
+    def _drill_segment(self) -> pd.DataFrame:
+        df = self._rollup(['corridor', 'user_segment'])
+        df['total_value'] = sql_round(df['total_value'])
+        df = self._by_corridor(df, 'failure_rate', ascending=False)
+        return self._select(df, ['corridor', 'user_segment', 'txn_count', 'failure_rate',
+                                 'avg_amount', 'total_value'])
+
+    def _drill_amount(self) -> pd.DataFrame:
+        aggregate = self._partial().copy()
+        aggregate['amount_bracket'] = aggregate['amount_bracket'].map(
+            lambda code: USD_MXN_BRACKETS[AMOUNT_BRACKETS[code]]
+        )
+        df = self._by_corridor(self._rollup(['corridor', 'amount_bracket'], aggregate), 'min_amount')
+        return self._select(df, ['corridor', 'amount_bracket', 'txn_count', 'failure_rate', 'avg_amount'])
+
+    def _drill_month(self) -> pd.DataFrame:
+        aggregate = self._partial().copy()
+        aggregate['month'] = aggregate['transaction_date'].str.slice(0, 7)
+        df = self._by_corridor(self._rollup(['corridor', 'month'], aggregate), 'month')
+        return self._select(df, ['corridor', 'month', 'txn_count', 'failure_rate', 'avg_amount'])
+
+    def _drill_day_of_week(self) -> pd.DataFrame:
+        df = self._rollup(['corridor', 'day_num'], self._with_day_of_week(self._partial()))
+        df['day_of_week'] = df['day_num'].map(dict(enumerate(DAY_NAMES)))
+        df = self._by_corridor(df, 'day_num')
+        return self._select(df, ['corridor', 'day_of_week', 'day_num', 'txn_count', 'failure_rate'])
+
+    def _drill_user_status(self) -> pd.DataFrame:
+        # Needs user attributes, so it runs as SQL (one scan for all corridors),
+        # without the users join when they were denormalized at load time
+        denormalized = has_denormalized_users(self.conn, self.table_name)
+        sql = corridor_drilldown_query('user_status', by_corridor=True, denormalized=denormalized)
+        if self.cache is not None:
+            return self.cache.read_sql(sql)
+        return pd.read_sql_query(sql, self.conn)
@@ -0,0 +1,176 @@
+"""
+In-Memory Pandas Backend for Cobre Payment Corridor Analysis
+
+Implements the sql_queries functions as vectorized pandas/NumPy group-bys
+over DataFrames already in memory, without copying the data into SQLite.
+Results have the same columns, order and rounding as the SQL, so the
+backend can be swapped in wherever a MetricsEngine is used.
+"""
+
+from typing import Callable, Optional
+
+import pandas as pd
+
+from scripts.data_loader import encode_dataframe
+from scripts.metrics_engine import MetricsEngine, finalize_rates
+
+
+# Text format SQLite holds transaction_date in (see load_to_sqlite)
+SQL_DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def parse_unique(values: pd.Series, parse: Callable[[pd.Series], pd.Series]) -> pd.Series:
+    """
+    Apply a parser to each distinct value only (dates, times repeat heavily).
+
+    Args:
+        values: Series to parse (plain or categorical)
+        parse: Vectorized parser, e.g. pd.to_datetime
+
+    Returns:
+        Parsed Series aligned with values (missing values stay missing)
+    """
+    codes, uniques = pd.factorize(values)
+    parsed = pd.Series(parse(pd.Series(uniques))).array
+    return pd.Series(parsed.take(codes, allow_fill=True), index=values.index)
+
+
+class PandasBackend(MetricsEngine):
+    """
+    Serve sql_queries results from in-memory DataFrames.
+
+    Uses the same partial aggregate and rollups as MetricsEngine, but scans
+    a DataFrame instead of a SQLite table, and also implements the queries
+    that need the users table. If IDs are encoded as integers, they must be
+    encoded in both DataFrames.
+
+    Supported queries: corridor_performance_query, user_segment_analysis_query,
+    daily_trend_query, rolling_daily_trend_query, day_of_week_pattern_query,
+    hourly_pattern_query, amount_distribution_query,
+    corridor_comparison_for_strategy_query, the five usd_mxn_* breakdowns
+    (segment, amount, monthly trend, day of week, user status) and
+    get_record_counts_query. usd_mxn_user_status_query and
+    get_record_counts_query need the users DataFrame. There is no SQL to
+    fall back on, so any other query function (e.g. amount_quantiles_query,
+    which reads the stored sketches) raises ValueError.
+
+    Example:
+        backend = PandasBackend.from_csv('data/raw/transactions.csv', 'data/raw/users.csv')
+        df = backend.run(sql_queries.corridor_performance_query)
+    """
+
+    def __init__(self, transactions: pd.DataFrame, users: Optional[pd.DataFrame] = None):
+        super().__init__(conn=None, table_name=None, cache=None)
+        self.transactions = transactions
+        self.users = users
+        self._handlers['get_record_counts_query'] = self.record_counts
+
+    @classmethod
+    def from_csv(cls, transactions_csv: str, users_csv: Optional[str] = None) -> 'PandasBackend':
+        """
+        Create a backend from the raw CSV files.
+
+        Both tables are dictionary-encoded on load (low-cardinality text as
+        categoricals, prefixed IDs as integers; see encode_dataframe).
+
+        Args:
+            transactions_csv: Path to transactions CSV
+            users_csv: Path to users CSV (needed by the user status and
+                record count queries)
+
+        Returns:
+            PandasBackend over the loaded DataFrames
+        """
+        transactions, _ = encode_dataframe(pd.read_csv(transactions_csv))
+        users = encode_dataframe(pd.read_csv(users_csv))[0] if users_csv else None
+        return cls(transactions, users)
+
+    def run(self, query_fn: Callable[..., str]) -> pd.DataFrame:
+        """
+        Return the result of a sql_queries function.
+
+        Args:
+            query_fn: Query function from sql_queries
+
+        Returns:
+            DataFrame with the same columns, order and rounding as the SQL
+
+        Raises:
+            ValueError: If the query is not supported by the pandas backend
+        """
+        handler = self._handlers.get(query_fn.__name__)
+        if handler is None:
+            raise ValueError(
+                f"{query_fn.__name__} is not supported by the pandas backend; "
+                f"supported queries: {', '.join(sorted(self._handlers))}"
+            )
+        return handler()
+
+    def _scan(self) -> pd.DataFrame:
+        """Narrow frame of the columns the partial aggregate needs."""
+        df = self.transactions
+        if 'hour' in df.columns:
+            hours = df['hour']
+        else:
+            hours = parse_unique(df['transaction_time'], lambda times: (
+                pd.to_timedelta(times, errors='coerce') // pd.Timedelta(hours=1)
+            ).astype('Int64'))
+        return pd.DataFrame({
+            'transaction_date': parse_unique(df['transaction_date'], pd.to_datetime),
+            'hour': hours,
+            'corridor': df['corridor'],
+            'user_segment': df['user_segment'],
+            'user_id': df['user_id'],
+            'amount_usd': df['amount_usd'],
+            'status': df['status']
+        })
+
+    def _reduce(self, df: pd.DataFrame) -> None:
+        """Build the partial aggregate with the same key types as the SQLite scan."""
+        super()._reduce(df)
+        # Dates are only formatted on the (small) aggregate
+        self.aggregate['transaction_date'] = (
+            self.aggregate['transaction_date'].dt.strftime(SQL_DATETIME_FORMAT)
+        )
+
+    def _require_users(self, query: str) -> None:
+        """Raise ValueError if the backend was created without the users DataFrame."""
+        if self.users is None:
+            raise ValueError(f"The users DataFrame is required for {query}")
+
+    def _drill_user_status(self) -> pd.DataFrame:
+        """User status breakdown of every corridor (joins the users DataFrame)."""
+        self._require_users('the user status breakdown')
+        txns = self.transactions
+        statuses = self.users.drop_duplicates('user_id').set_index('user_id')['status']
+        df = pd.DataFrame({
+            'corridor': txns['corridor'].astype(object),
+            'user_status': txns['user_id'].map(statuses).astype(object),
+            'failed': (txns['status'] == 'failed').astype('int64'),
+            'successful': (txns['status'] == 'success').astype('int64'),
+            'amount_usd': txns['amount_usd']
+        })
+        grouped = (
+            df.groupby(['corridor', 'user_status'], dropna=False)
+            .agg(
+                txn_count=('failed', 'size'),
+                successful=('successful', 'sum'),
+                failed=('failed', 'sum'),
+                total_value=('amount_usd', 'sum')
+            )
+            .reset_index()
+        )
+        grouped = finalize_rates(grouped)
+        # SQLite sorts the NULL group (transactions without a user) first
+        grouped = grouped.sort_values(['corridor', 'user_status'], na_position='first', kind='stable')
+        return grouped[['corridor', 'user_status', 'txn_count',
+                        'failure_rate', 'avg_amount']].reset_index(drop=True)
+
+    def record_counts(self) -> pd.DataFrame:
+        """Result of get_record_counts_query."""
+        self._require_users('get_record_counts_query')
+        return pd.DataFrame({
+            'total_transactions': [len(self.transactions)],
+            'unique_users_in_txns': [self.transactions['user_id'].nunique()],
+            'total_users': [len(self.users)]
+        })
@@ -0,0 +1,275 @@
+"""
+Mergeable Quantile Sketches of Transaction Amounts
+
+Keeps t-digest style sketches of amount_usd per corridor x user segment,
+one over all transactions and one over failed transactions, built chunk by
+chunk while a table is loaded. A sketch is a short list of centroids (mean,
+weight): small near the tails, so p99 stays accurate, and larger in the
+middle, with the minimum and maximum kept exactly. Sketches of disjoint
+rows merge by compressing their centroids together, so appended batches
+update the stored sketches without rereading the table, and coarser groups
+(e.g. a whole corridor) are read from the union of their centroids.
+"""
+
+import sqlite3
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from scripts.sql_queries import AMOUNT_QUANTILES
+
+
+# Scale of the k1 function: at most about this many centroids per sketch
+DEFAULT_COMPRESSION = 200
+
+# Columns that define a group of sketches
+SKETCH_KEYS = ['corridor', 'user_segment']
+
+# Sketched populations: name -> (column, value) the rows must match (None = all rows)
+SKETCHES = {
+    'amount': None,
+    'failed_amount': ('status', 'failed')
+}
+
+VALUE_COLUMN = 'amount_usd'
+
+
+def sketch_table(table_name: str) -> str:
+    """
+    Name of the table that persists the amount sketches of a table.
+
+    Args:
+        table_name: Name of the sketched table
+
+    Returns:
+        Table name (transactions -> sql_queries.AMOUNT_SKETCH_TABLE)
+    """
+    return f"{table_name}_amount_sketch"
+
+
+def compress(
+    groups: np.ndarray,
+    means: np.ndarray,
+    weights: np.ndarray,
+    compression: int = DEFAULT_COMPRESSION
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Merge points and centroids of many sketches into compressed centroids.
+
+    Points are sorted by value within their group and bucketed by the k1
+    scale function k(q) = compression * (asin(2q - 1) / pi + 1/2) of the
+    cumulative weight to their left, so buckets are narrow near q = 0 and
+    q = 1. The first and last point of each group are kept as their own
+    centroids. Every group is compressed in the same vectorized pass.
+
+    Args:
+        groups: Integer group of every point
+        means: Value (or centroid mean) of every point
+        weights: Weight of every point (1 for raw values)
+        compression: Scale of k1 (centroids per sketch)
+
+    Returns:
+        Tuple of (position in the input of the first point of each centroid,
+        centroid means, centroid weights), sorted by group and mean
+    """
+    # Sort by value, then stably by group (faster than lexsort on floats)
+    order = np.argsort(means)
+    order = order[np.argsort(groups[order], kind='stable')]
+    g, m, w = groups[order], means[order], weights[order]
+    starts = np.flatnonzero(np.r_[True, g[1:] != g[:-1]])
+    sizes = np.diff(np.r_[starts, len(g)])
+
+    cumulative = np.cumsum(w)
+    before_group = np.repeat(cumulative[starts] - w[starts], sizes)
+    total = np.repeat(cumulative[starts + sizes - 1], sizes) - before_group
+    q_left = (cumulative - w - before_group) / total
+    bucket = np.floor(compression * (np.arcsin(2 * q_left - 1) / np.pi + 0.5)).astype(np.int64)
+    bucket[starts] = -1
+    bucket[starts + sizes - 1] = compression + 1
+
+    first = np.flatnonzero(np.r_[True, (g[1:] != g[:-1]) | (bucket[1:] != bucket[:-1])])
+    centroid_weights = np.add.reduceat(w, first)
+    centroid_means = np.add.reduceat(m * w, first) / centroid_weights
+    return order[first], centroid_means, centroid_weights
+
+
+def quantile(means: np.ndarray, weights: np.ndarray, fractions: Sequence[float]) -> np.ndarray:
+    """
+    Read quantiles from the centroids of one sketch (or a union of sketches).
+
+    Each centroid sits at the midpoint of its cumulative weight and values
+    are interpolated linearly between neighbouring centroids (clamped to
+    the extreme centroids), as in amount_quantiles_query.
+
+    Args:
+        means: Centroid means
+        weights: Centroid weights
+        fractions: Quantiles to read, e.g. (0.5, 0.9, 0.99)
+
+    Returns:
+        Array with one value per fraction
+    """
+    order = np.argsort(means, kind='stable')
+    means, weights = means[order], weights[order]
+    positions = np.cumsum(weights) - weights / 2.0
+    return np.interp(np.asarray(fractions) * weights.sum(), positions, means)
+
+
+class AmountSketches:
+    """
+    Amount quantile sketches of every corridor x segment group, built chunk by chunk.
+
+    Example:
+        sketches = AmountSketches()
+        for chunk in pd.read_csv('data/raw/transactions.csv', chunksize=100_000):
+            sketches.update(chunk)
+        sketches.quantiles(keys=['corridor'])
+    """
+
+    def __init__(self, compression: int = DEFAULT_COMPRESSION, keys: Sequence[str] = SKETCH_KEYS):
+        """
+        Args:
+            compression: Scale of the sketches (higher = more centroids, more accurate)
+            keys: Columns that define a group
+        """
+        self.compression = compression
+        self.keys = list(keys)
+        self.centroids: Optional[pd.DataFrame] = None
+
+    def update(self, chunk: pd.DataFrame) -> None:
+        """
+        Add a chunk of rows to the sketches.
+
+        Args:
+            chunk: Rows with the key columns, amount_usd and status
+
+        Raises:
+            ValueError: If a required column is missing
+        """
+        required = self.keys + [VALUE_COLUMN] + [rule[0] for rule in SKETCHES.values() if rule]
+        missing = [col for col in required if col not in chunk.columns]
+        if missing:
+            raise ValueError(f"Columns missing from the rows: {missing}")
+
+        chunk = chunk[chunk[VALUE_COLUMN].notna()]
+        points = []
+        for name, rule in SKETCHES.items():
+            rows = chunk if rule is None else chunk[chunk[rule[0]] == rule[1]]
+            points.append(pd.DataFrame({
+                **{col: rows[col] for col in self.keys},
+                'sketch': name,
+                'mean': rows[VALUE_COLUMN].astype('float64'),
+                'weight': np.ones(len(rows), dtype=np.int64)
+            }))
+        self._absorb(pd.concat(points, ignore_index=True))
+
+    def merge(self, other: 'AmountSketches') -> 'AmountSketches':
+        """
+        Combine with the sketches of a disjoint set of rows.
+
+        Args:
+            other: Sketches to merge into these
+
+        Returns:
+            The sketches themselves, for chaining
+        """
+        if other.keys != self.keys:
+            raise ValueError("Only sketches with the same keys can be merged")
+        if other.centroids is not None:
+            self._absorb(other.centroids)
+        return self
+
+    def _absorb(self, points: pd.DataFrame) -> None:
+        """Compress new points (or centroids) together with the current centroids."""
+        if self.centroids is not None:
+            points = pd.concat([self.centroids, points], ignore_index=True)
+        if points.empty:
+            return
+        groups = points.groupby(self.keys + ['sketch'], dropna=False, observed=True).ngroup()
+        positions, means, weights = compress(
+            groups.to_numpy(), points['mean'].to_numpy(), points['weight'].to_numpy(),
+            self.compression
+        )
+        centroids = points.iloc[positions][self.keys + ['sketch']].reset_index(drop=True)
+        centroids['mean'] = means
+        centroids['weight'] = weights
+        self.centroids = centroids
+
+    def quantiles(
+        self,
+        fractions: Sequence[float] = AMOUNT_QUANTILES,
+        keys: Optional[Sequence[str]] = None
+    ) -> pd.DataFrame:
+        """
+        Quantiles of every group and sketch.
+
+        Args:
+            fractions: Quantiles to read
+            keys: Group columns, a subset of the sketch keys (default: all);
+                coarser groups read the union of their sketches
+
+        Returns:
+            DataFrame with the keys, sketch, count and one p<N> column per
+            fraction (e.g. p50, p90, p99), unrounded; empty (with the same
+            columns) if no rows were sketched
+        """
+        keys = self.keys if keys is None else list(keys)
+        columns = keys + ['sketch', 'count'] + [f"p{fraction * 100:g}" for fraction in fractions]
+        if self.centroids is None or self.centroids.empty:
+            return pd.DataFrame(columns=columns)
+        rows = []
+        for group, centroids in self.centroids.groupby(keys + ['sketch'], dropna=False, observed=True):
+            values = quantile(centroids['mean'].to_numpy(), centroids['weight'].to_numpy(), fractions)
+            rows.append((*group, int(centroids['weight'].sum()), *values))
+        return pd.DataFrame(rows, columns=columns)
+
+    def save(self, conn: sqlite3.Connection, table_name: str) -> None:
+        """
+        Persist the centroids next to the table they describe (see sketch_table).
+
+        Rows hold the keys, sketch, centroid (order within the sketch), mean,
+        weight and the compression of the sketches.
+
+        Args:
+            conn: SQLite connection
+            table_name: Name of the sketched table
+        """
+        centroids = self.centroids if self.centroids is not None else pd.DataFrame(
+            columns=self.keys + ['sketch', 'mean', 'weight']
+        )
+        centroids = centroids.assign(
+            centroid=centroids.groupby(self.keys + ['sketch'], dropna=False, observed=True).cumcount(),
+            compression=self.compression
+        )
+        columns = self.keys + ['sketch', 'centroid', 'mean', 'weight', 'compression']
+        centroids[columns].to_sql(sketch_table(table_name), conn, if_exists='replace', index=False)
+        conn.commit()
+
+    @classmethod
+    def load(
+        cls,
+        conn: sqlite3.Connection,
+        table_name: str,
+        keys: Sequence[str] = SKETCH_KEYS
+    ) -> 'AmountSketches':
+        """
+        Read persisted sketches back to keep updating them.
+
+        Args:
+            conn: SQLite connection
+            table_name: Name of the sketched table
+            keys: Columns that define a group
+
+        Returns:
+            AmountSketches with the stored centroids and compression
+        """
+        stored = pd.read_sql_query(
+            f'SELECT * FROM "{sketch_table(table_name)}" ORDER BY {", ".join(keys)}, sketch, centroid',
+            conn
+        )
+        compression = int(stored['compression'].iloc[0]) if len(stored) else DEFAULT_COMPRESSION
+        sketches = cls(compression=compression, keys=keys)
+        if len(stored):
+            sketches.centroids = stored[list(keys) + ['sketch', 'mean', 'weight']]
+        return sketches
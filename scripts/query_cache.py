@@ -0,0 +1,162 @@
+"""
+Query Result Cache for Cobre Payment Corridor Analysis
+
+Stores query results on disk keyed on the SQL text, its bind parameters and
+the data version of every table the query reads. Versions are recorded by load_to_sqlite, so
+reloading a table with different content invalidates dependent results
+automatically, and re-running with unchanged data executes no analysis SQL.
+"""
+
+import hashlib
+import re
+import sqlite3
+from pathlib import Path
+from typing import Callable, List, Optional
+
+import pandas as pd
+
+from scripts.data_loader import get_data_version
+from scripts.sql_queries import QUERY_PARAMS
+
+
+DEFAULT_CACHE_DIR = Path(__file__).resolve().parent.parent / 'data' / '.query_cache'
+
+# Temp views built on the connection from other tables, mapped to their sources
+DERIVED_TABLES = {
+    'usd_mxn_txns': ['transactions', 'users']
+}
+
+
+def referenced_tables(sql: str) -> List[str]:
+    """
+    List the base tables a query reads (derived tables are expanded).
+
+    Args:
+        sql: SQL query string
+
+    Returns:
+        Sorted list of base table names
+    """
+    text = re.sub(r"'[^']*'", "''", sql)
+    # Names defined by WITH clauses are not tables
+    ctes = set(re.findall(r'\b(\w+)\s+AS\s*\(\s*SELECT\b', text, flags=re.I))
+    tables = set()
+    for name in re.findall(r'\b(?:FROM|JOIN)\s+(\w+)', text, flags=re.I):
+        if name not in ctes:
+            tables.update(DERIVED_TABLES.get(name, [name]))
+    return sorted(tables)
+
+
+class QueryCache:
+    """
+    On-disk cache of query results with data-version invalidation.
+
+    Example:
+        cache = QueryCache(conn)
+        df = cache.read_sql(sql_queries.corridor_performance_query())
+    """
+
+    def __init__(self, conn: sqlite3.Connection, cache_dir: Optional[str] = None):
+        self.conn = conn
+        self.cache_dir = Path(cache_dir) if cache_dir else DEFAULT_CACHE_DIR
+        self.hits = 0
+        self.misses = 0
+
+    def _paths(self, sql: str, params: Optional[dict] = None) -> Optional[tuple]:
+        """
+        Cache file for a query at the current data versions.
+
+        Args:
+            sql: SQL query string
+            params: Bind parameters of the query
+
+        Returns:
+            Tuple of (query prefix, file path), or None if any table the query
+            reads has no recorded data version (results are then not cached)
+        """
+        versions = []
+        for table in referenced_tables(sql):
+            version = get_data_version(self.conn, table)
+            if version is None:
+                return None
+            versions.append(f"{table}={version}")
+
+        normalized = ' '.join(sql.split())
+        if params:
+            normalized += f" -- {sorted(params.items())!r}"
+        query_key = hashlib.sha256(normalized.encode()).hexdigest()[:16]
+        data_key = hashlib.sha256('|'.join(versions).encode()).hexdigest()[:16]
+        return query_key, self.cache_dir / f"{query_key}-{data_key}.pkl"
+
+    def get(self, sql: str, params: Optional[dict] = None) -> Optional[pd.DataFrame]:
+        """
+        Return the cached result of a query, if still valid.
+
+        Args:
+            sql: SQL query string
+            params: Bind parameters of the query
+
+        Returns:
+            Cached DataFrame, or None on a miss
+        """
+        paths = self._paths(sql, params)
+        if paths is not None and paths[1].exists():
+            self.hits += 1
+            return pd.read_pickle(paths[1])
+        self.misses += 1
+        return None
+
+    def put(self, sql: str, result: pd.DataFrame, params: Optional[dict] = None) -> None:
+        """
+        Store a query result, replacing results for older data versions.
+
+        Args:
+            sql: SQL query string the result belongs to
+            result: Query result
+            params: Bind parameters of the query
+        """
+        paths = self._paths(sql, params)
+        if paths is None:
+            return
+        query_key, path = paths
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        for stale in self.cache_dir.glob(f"{query_key}-*.pkl"):
+            if stale != path:
+                stale.unlink()
+        result.to_pickle(path)
+
+    def read_sql(self, sql: str, params: Optional[dict] = None) -> pd.DataFrame:
+        """
+        Cached equivalent of pd.read_sql_query(sql, conn, params=params).
+
+        Args:
+            sql: SQL query string
+            params: Bind parameters of the query
+
+        Returns:
+            Query result as a DataFrame
+        """
+        result = self.get(sql, params)
+        if result is None:
+            result = pd.read_sql_query(sql, self.conn, params=params)
+            self.put(sql, result, params)
+        return result
+
+    def run(self, query_fn: Callable[[], str]) -> pd.DataFrame:
+        """
+        Execute a sql_queries function through the cache.
+
+        Args:
+            query_fn: Query function from sql_queries (bound with its
+                sql_queries.QUERY_PARAMS, if any)
+
+        Returns:
+            Query result as a DataFrame
+        """
+        return self.read_sql(query_fn(), QUERY_PARAMS.get(query_fn.__name__))
+
+    def clear(self) -> None:
+        """Delete every cached result."""
+        if self.cache_dir.exists():
+            for path in self.cache_dir.glob('*.pkl'):
+                path.unlink()
@@ -0,0 +1,227 @@
+"""
+Stratified Reservoir Sampling for Cobre Payment Corridor Data
+
+Keeps a fixed-size uniform sample of every corridor x user segment stratum
+while a table is loaded, plus the exact number of rows of each stratum.
+The sample is a bottom-k sample: each row draws a uniform priority and a
+stratum keeps its k smallest priorities. That is a uniform reservoir over
+any number of chunks, and two samples of disjoint rows merge exactly (keep
+the k smallest of both), so appended batches update the stored sample
+without rereading the table.
+"""
+
+import sqlite3
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+# Rows kept per stratum by default
+DEFAULT_SAMPLE_SIZE = 2_000
+
+# Columns that define a stratum
+STRATA = ['corridor', 'user_segment']
+
+# Rows offered to the sample at once (see StratifiedReservoir.update)
+UPDATE_BLOCK_SIZE = 100_000
+
+# Random priority of each sampled row (kept so the sample stays mergeable)
+PRIORITY_COLUMN = '_priority'
+
+
+def sample_tables(table_name: str) -> Tuple[str, str]:
+    """
+    Names of the tables that persist the sample of a table.
+
+    Args:
+        table_name: Name of the sampled table
+
+    Returns:
+        Tuple of (sample rows table, per-stratum counts table)
+    """
+    return f"{table_name}_sample", f"{table_name}_sample_strata"
+
+
+class StratifiedReservoir:
+    """
+    Uniform sample of up to `size` rows per stratum, built chunk by chunk.
+
+    Example:
+        reservoir = StratifiedReservoir(size=1000)
+        for chunk in pd.read_csv('data/raw/transactions.csv', chunksize=100_000):
+            reservoir.update(chunk)
+        reservoir.save(conn, 'transactions')
+    """
+
+    def __init__(
+        self,
+        size: int = DEFAULT_SAMPLE_SIZE,
+        strata: Sequence[str] = STRATA,
+        seed: Optional[int] = 0
+    ):
+        """
+        Args:
+            size: Rows kept per stratum
+            strata: Columns that define a stratum
+            seed: Seed of the priorities (None = not reproducible)
+
+        Raises:
+            ValueError: If size is not positive
+        """
+        if size < 1:
+            raise ValueError(f"Sample size must be positive: {size}")
+        self.size = size
+        self.strata = list(strata)
+        self.rng = np.random.default_rng(seed)
+        self.rows: Optional[pd.DataFrame] = None
+        self.population = pd.Series(dtype='int64')  # rows seen per stratum
+
+    def update(self, chunk: pd.DataFrame) -> None:
+        """
+        Add a chunk of rows to the sample.
+
+        Args:
+            chunk: Rows with the strata columns (every column is kept)
+
+        Raises:
+            ValueError: If a strata column is missing
+        """
+        missing = [col for col in self.strata if col not in chunk.columns]
+        if missing:
+            raise ValueError(f"Strata columns missing from the rows: {missing}")
+        if chunk.empty:
+            return
+        priority = self.rng.random(len(chunk))
+        # Large chunks go in blocks, so most rows are dropped by the threshold
+        # test instead of being sorted
+        for start in range(0, len(chunk), UPDATE_BLOCK_SIZE):
+            block = slice(start, start + UPDATE_BLOCK_SIZE)
+            self._add(chunk.iloc[block], priority[block])
+
+    def _add(self, rows: pd.DataFrame, priority: np.ndarray) -> None:
+        """Count a block of rows and offer them to the sample with their priorities."""
+        groups = rows.groupby(self.strata, dropna=False, observed=True)
+        counts = groups.size()
+        self._count(counts)
+        if self.rows is not None:
+            # Only rows under the current k-th priority of their stratum can enter
+            bound = self._thresholds().reindex(counts.index, fill_value=np.inf).to_numpy()
+            entering = priority < bound[groups.ngroup().to_numpy()]
+            rows, priority = rows[entering], priority[entering]
+        self._keep(rows.assign(**{PRIORITY_COLUMN: priority}))
+
+    def merge(self, other: 'StratifiedReservoir') -> 'StratifiedReservoir':
+        """
+        Combine with the sample of a disjoint set of rows (same size and strata).
+
+        Args:
+            other: Reservoir to merge into this one
+
+        Returns:
+            The reservoir itself, for chaining
+        """
+        if (other.size, other.strata) != (self.size, self.strata):
+            raise ValueError("Only reservoirs with the same size and strata can be merged")
+        if other.rows is not None:
+            self._count(other.population)
+            self._keep(other.rows)
+        return self
+
+    def _count(self, counts: pd.Series) -> None:
+        """Add rows per stratum to the population counts."""
+        self.population = counts.astype('int64') if self.population.empty \
+            else self.population.add(counts, fill_value=0).astype('int64')
+
+    def _thresholds(self) -> pd.Series:
+        """Largest kept priority of every full stratum (inf while a stratum is not full)."""
+        kept = self.rows.groupby(self.strata, dropna=False, observed=True)[PRIORITY_COLUMN]
+        return kept.max().where(kept.size() >= self.size, np.inf)
+
+    def _keep(self, rows: pd.DataFrame) -> None:
+        """Merge prioritized rows into the sample, keeping the k smallest per stratum."""
+        if self.rows is not None:
+            rows = pd.concat([self.rows, rows], ignore_index=True)
+        self.rows = (
+            rows.sort_values(PRIORITY_COLUMN, kind='stable')
+            .groupby(self.strata, dropna=False, observed=True, sort=False)
+            .head(self.size)
+            .reset_index(drop=True)
+        )
+
+    def strata_counts(self) -> pd.DataFrame:
+        """
+        Population and sample size of every stratum.
+
+        Returns:
+            DataFrame with the strata columns, population and sampled
+        """
+        sampled = (self.rows.groupby(self.strata, dropna=False, observed=True).size()
+                   if self.rows is not None else pd.Series(dtype='int64'))
+        counts = pd.DataFrame({'population': self.population})
+        counts['sampled'] = sampled.reindex(counts.index, fill_value=0).astype('int64')
+        return counts.reset_index()
+
+    def sample(self) -> pd.DataFrame:
+        """
+        Sampled rows with their design weight.
+
+        Returns:
+            DataFrame of the sampled rows plus sample_weight (stratum
+            population / stratum sample size), without the priorities
+        """
+        counts = self.strata_counts()
+        weights = (counts['population'] / counts['sampled']).rename('sample_weight')
+        weights.index = pd.MultiIndex.from_frame(counts[self.strata]) if len(self.strata) > 1 \
+            else pd.Index(counts[self.strata[0]])
+        return self.rows.join(weights, on=self.strata).drop(columns=PRIORITY_COLUMN)
+
+    def save(self, conn: sqlite3.Connection, table_name: str) -> None:
+        """
+        Persist the sample next to the table it describes (see sample_tables).
+
+        The strata table holds population, sampled and the reservoir size
+        (capacity) of every stratum.
+
+        Args:
+            conn: SQLite connection
+            table_name: Name of the sampled table
+        """
+        rows_table, strata_table = sample_tables(table_name)
+        if self.rows is not None:
+            self.rows.to_sql(rows_table, conn, if_exists='replace', index=False)
+        counts = self.strata_counts().assign(capacity=self.size)
+        counts.to_sql(strata_table, conn, if_exists='replace', index=False)
+        conn.commit()
+
+    @classmethod
+    def load(
+        cls,
+        conn: sqlite3.Connection,
+        table_name: str,
+        strata: Sequence[str] = STRATA,
+        seed: Optional[int] = None,
+        parse_dates: Sequence[str] = ()
+    ) -> 'StratifiedReservoir':
+        """
+        Read a persisted sample back to keep updating it.
+
+        Args:
+            conn: SQLite connection
+            table_name: Name of the sampled table
+            strata: Columns that define a stratum
+            seed: Seed of the priorities drawn for new rows
+            parse_dates: Columns to parse back to datetimes
+
+        Returns:
+            StratifiedReservoir with the stored rows, populations and size
+        """
+        rows_table, strata_table = sample_tables(table_name)
+        counts = pd.read_sql_query(f'SELECT * FROM "{strata_table}"', conn)
+        rows = pd.read_sql_query(f'SELECT * FROM "{rows_table}"', conn,
+                                 parse_dates=list(parse_dates) or None)
+        size = int(counts['capacity'].iloc[0]) if len(counts) else DEFAULT_SAMPLE_SIZE
+        reservoir = cls(size=size, strata=strata, seed=seed)
+        reservoir.rows = rows
+        reservoir.population = counts.set_index(list(strata))['population'].astype('int64')
+        return reservoir
@@ -0,0 +1,187 @@
+"""
+Sharded Parallel Query Executor for Cobre Payment Corridor Analysis
+
+Splits the transactions table into one SQLite file per month (or corridor)
+and scans the shards in a process pool. Each worker reduces its shard to the
+MetricsEngine partial aggregate; the partials are merged in the main process
+and every supported sql_queries result is rolled up from the merged
+aggregate, with the same columns, order and rounding as the SQL.
+"""
+
+import os
+import shutil
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from scripts.data_loader import PROJECT_ROOT, get_data_version
+from scripts.metrics_engine import GRAIN, MetricsEngine, merge_states
+
+
+DEFAULT_SHARD_DIR = PROJECT_ROOT / 'data' / '.shards'
+
+# Shard key: column of transactions each shard holds a single value of
+SHARD_COLUMNS = {
+    'month': 'year_month',
+    'corridor': 'corridor'
+}
+
+# Marker written once every shard file of a data version is complete
+_COMPLETE_MARKER = '_complete'
+
+
+def shard_transactions(
+    conn: sqlite3.Connection,
+    shard_dir: Optional[str] = None,
+    by: str = 'month',
+    table_name: str = 'transactions'
+) -> List[Path]:
+    """
+    Write one SQLite file per shard key value of the transactions table.
+
+    Shards are stored under a directory named after the table's data version,
+    so they are reused until the table is reloaded with different content.
+    Tables without a data version are re-sharded on every call.
+
+    Args:
+        conn: Connection holding the full transactions table
+        shard_dir: Root directory for shard files (default: data/.shards)
+        by: Shard key, 'month' or 'corridor'
+        table_name: Table to shard (encoded tables are read through their view)
+
+    Returns:
+        Sorted list of shard file paths
+
+    Raises:
+        ValueError: If the shard key is not supported
+    """
+    if by not in SHARD_COLUMNS:
+        raise ValueError(f"Unsupported shard key: {by}")
+    column = SHARD_COLUMNS[by]
+
+    root = Path(shard_dir) if shard_dir else DEFAULT_SHARD_DIR
+    version = get_data_version(conn, table_name)
+    directory = root / f"{table_name}.{by}.{version[:16] if version else 'unversioned'}"
+    if version and (directory / _COMPLETE_MARKER).exists():
+        return sorted(directory.glob('*.sqlite'))
+
+    # Drop shards of previous data versions of the same table and key
+    for stale in root.glob(f"{table_name}.{by}.*"):
+        shutil.rmtree(stale, ignore_errors=True)
+    partial = directory.with_name(f"{directory.name}.{os.getpid()}.tmp")
+    partial.mkdir(parents=True)
+
+    keys = [row[0] for row in conn.execute(
+        f"SELECT DISTINCT {column} FROM {table_name} ORDER BY {column}"
+    )]
+    conn.commit()
+    for key in keys:
+        path = partial / f"{key}.sqlite"
+        conn.execute("ATTACH DATABASE ? AS shard", (str(path),))
+        try:
+            conn.execute(
+                f"CREATE TABLE shard.transactions AS SELECT * FROM main.{table_name} "
+                f"WHERE {column} = ?", (key,)
+            )
+            conn.commit()
+        finally:
+            conn.execute("DETACH DATABASE shard")
+
+    (partial / _COMPLETE_MARKER).touch()
+    partial.rename(directory)
+    return sorted(directory.glob('*.sqlite'))
+
+
+def scan_shard(path: str) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Reduce one shard to a partial aggregate (worker process).
+
+    Args:
+        path: Shard database file
+
+    Returns:
+        Tuple of (partial aggregate at GRAIN, distinct user_segment/user_id pairs)
+    """
+    conn = sqlite3.connect(f"{Path(path).resolve().as_uri()}?mode=ro", uri=True)
+    try:
+        engine = MetricsEngine(conn)
+        df = engine._scan()
+        engine._reduce(df)
+    finally:
+        conn.close()
+    # Distinct users are not additive across shards, so ship the pairs
+    users = df[['user_segment', 'user_id']].drop_duplicates()
+    return engine.aggregate, users
+
+
+def merge_partials(partials: List[Tuple[pd.DataFrame, pd.DataFrame]]) -> Tuple[pd.DataFrame, pd.Series]:
+    """
+    Merge per-shard partial aggregates.
+
+    Counts and sums are added, minimums and maximums are combined, and
+    distinct users per segment are counted over the union of the shards.
+
+    Args:
+        partials: (aggregate, users) tuples from scan_shard
+
+    Returns:
+        Tuple of (merged aggregate at GRAIN, unique users per user_segment)
+    """
+    aggregates = pd.concat([aggregate for aggregate, _ in partials], ignore_index=True)
+    merged = merge_states(aggregates, GRAIN)
+    users = pd.concat([pairs for _, pairs in partials], ignore_index=True)
+    segment_users = users.groupby('user_segment')['user_id'].nunique()
+    return merged, segment_users
+
+
+class ShardedEngine(MetricsEngine):
+    """
+    MetricsEngine whose scan runs in parallel over per-month or per-corridor shards.
+
+    The connection is still used for the QueryCache and for queries the
+    engine does not cover, which run their SQL on the full table.
+
+    Example:
+        engine = ShardedEngine(conn, by='month', max_workers=8)
+        df = engine.run(sql_queries.corridor_performance_query)
+    """
+
+    def __init__(
+        self,
+        conn: sqlite3.Connection,
+        table_name: str = 'transactions',
+        cache=None,
+        by: str = 'month',
+        shard_dir: Optional[str] = None,
+        max_workers: Optional[int] = None
+    ):
+        super().__init__(conn, table_name=table_name, cache=cache)
+        self.by = by
+        self.shard_dir = shard_dir
+        self.max_workers = max_workers
+        self.shards: List[Path] = []
+
+    def build(self) -> 'ShardedEngine':
+        """
+        Shard the table (if needed), scan the shards in parallel and merge.
+
+        Returns:
+            The engine itself, for chaining
+        """
+        self.shards = shard_transactions(self.conn, self.shard_dir, self.by, self.table_name)
+        workers = min(self.max_workers or os.cpu_count() or 1, max(len(self.shards), 1))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            partials = list(pool.map(scan_shard, [str(path) for path in self.shards]))
+        self.aggregate, self.segment_users = merge_partials(partials)
+        return self
+
+    def shard_sizes(self) -> Dict[str, int]:
+        """Row count of each shard file, keyed by shard key value."""
+        sizes = {}
+        for path in self.shards:
+            with sqlite3.connect(f"{path.resolve().as_uri()}?mode=ro", uri=True) as conn:
+                sizes[path.stem] = conn.execute("SELECT COUNT(*) FROM transactions").fetchone()[0]
+        return sizes
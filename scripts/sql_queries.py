@@ -5,24 +5,127 @@ Reusable SQL queries for corridor performance, user behavior, and time pattern a
 """
 
 
-def corridor_performance_query() -> str:
+# Pre-aggregated summary of transactions (see cube_build_query)
+CUBE_TABLE = 'transactions_cube'
+
+# Trailing window lengths, in calendar days, of rolling_daily_trend_query
+ROLLING_WINDOWS = (7, 28, 90)
+
+# Centroids of the amount quantile sketches built at load time (see quantile_sketch)
+AMOUNT_SKETCH_TABLE = 'transactions_amount_sketch'
+
+# Quantiles reported by amount_quantiles_query
+AMOUNT_QUANTILES = (0.5, 0.9, 0.99)
+
+# Bind parameters of the usd_mxn_* queries (see corridor_drilldown_query)
+USD_MXN_PARAMS = {'corridor': 'USD_MXN'}
+
+# Bind parameters of the query functions whose SQL has placeholders, by function name
+QUERY_PARAMS = {
+    'usd_mxn_segment_analysis_query': USD_MXN_PARAMS,
+    'usd_mxn_amount_analysis_query': USD_MXN_PARAMS,
+    'usd_mxn_monthly_trend_query': USD_MXN_PARAMS,
+    'usd_mxn_day_of_week_query': USD_MXN_PARAMS,
+    'usd_mxn_user_status_query': USD_MXN_PARAMS
+}
+
+# Measure expressions over raw transactions vs. over the summary cube.
+# Raw transactions carry precomputed dow/hour/year_month columns from load_to_sqlite.
+_MEASURES = {
+    False: {
+        'source': 'transactions',
+        'count': 'COUNT(*)',
+        'successful': "SUM(CASE WHEN status = 'success' THEN 1 ELSE 0 END)",
+        'failed': "SUM(CASE WHEN status = 'failed' THEN 1 ELSE 0 END)",
+        'avg_amount': 'AVG(amount_usd)',
+        'total_value': 'SUM(amount_usd)',
+        'success_value': "SUM(CASE WHEN status = 'success' THEN amount_usd ELSE 0 END)",
+        'min_amount': 'MIN(amount_usd)',
+        'dow': 'dow',
+        'hour': 'hour',
+        'amount_bracket': """CASE
+            WHEN amount_usd < 1000 THEN '<$1k'
+            WHEN amount_usd < 5000 THEN '$1k-$5k'
+            WHEN amount_usd < 10000 THEN '$5k-$10k'
+            WHEN amount_usd < 20000 THEN '$10k-$20k'
+            ELSE '>$20k'
+        END"""
+    },
+    True: {
+        'source': CUBE_TABLE,
+        'count': 'SUM(txn_count)',
+        'successful': "SUM(CASE WHEN status = 'success' THEN txn_count ELSE 0 END)",
+        'failed': "SUM(CASE WHEN status = 'failed' THEN txn_count ELSE 0 END)",
+        'avg_amount': 'SUM(total_amount) / SUM(txn_count)',
+        'total_value': 'SUM(total_amount)',
+        'success_value': "SUM(CASE WHEN status = 'success' THEN total_amount ELSE 0 END)",
+        'min_amount': 'MIN(min_amount)',
+        'dow': "CAST(strftime('%w', transaction_date) AS INTEGER)",
+        'hour': 'hour',
+        'amount_bracket': 'amount_bracket'
+    }
+}
+
+
+def cube_build_query(since: bool = False) -> str:
+    """
+    Build the pre-aggregated summary cube from raw transactions.
+
+    The cube holds counts, sums, mins and maxes of amount_usd at the
+    (transaction_date, hour, corridor, user_segment, amount_bracket, status)
+    grain. Every query below that accepts use_cube is a rollup of it.
+
+    Args:
+        since: If True, return an INSERT that only aggregates transactions with
+               transaction_date >= ? (bind parameter), for incremental refreshes
+
+    Returns:
+        SQL query string that creates (or appends to) the cube table
+    """
+    m = _MEASURES[False]
+    target = f"INSERT INTO {CUBE_TABLE}" if since else f"CREATE TABLE {CUBE_TABLE} AS"
+    where = "WHERE transaction_date >= ?" if since else ""
+    return f"""
+    {target}
+    SELECT
+        transaction_date,
+        {m['hour']} as hour,
+        corridor,
+        user_segment,
+        {m['amount_bracket']} as amount_bracket,
+        status,
+        COUNT(*) as txn_count,
+        SUM(amount_usd) as total_amount,
+        MIN(amount_usd) as min_amount,
+        MAX(amount_usd) as max_amount
+    FROM transactions
+    {where}
+    GROUP BY transaction_date, hour, corridor, user_segment, amount_bracket, status
+    """
+
+
+def corridor_performance_query(use_cube: bool = False) -> str:
     """
     Get comprehensive performance metrics for all payment corridors.
 
+    Args:
+        use_cube: Read from the pre-aggregated summary cube instead of transactions
+
     Returns:
         SQL query string for corridor performance analysis
     """
-    return """
+    m = _MEASURES[use_cube]
+    return f"""
     SELECT
         corridor,
-        COUNT(*) as total_transactions,
-        SUM(CASE WHEN status = 'success' THEN 1 ELSE 0 END) as successful,
-        SUM(CASE WHEN status = 'failed' THEN 1 ELSE 0 END) as failed,
-        ROUND(100.0 * SUM(CASE WHEN status = 'failed' THEN 1 ELSE 0 END) / COUNT(*), 2) as failure_rate,
-        ROUND(AVG(amount_usd), 2) as avg_amount,
-        ROUND(SUM(amount_usd), 2) as total_value,
-        ROUND(SUM(CASE WHEN status = 'success' THEN amount_usd ELSE 0 END) * 0.005, 2) as revenue_usd
-    FROM transactions
+        {m['count']} as total_transactions,
+        {m['successful']} as successful,
+        {m['failed']} as failed,
+        ROUND(100.0 * {m['failed']} / {m['count']}, 2) as failure_rate,
+        ROUND({m['avg_amount']}, 2) as avg_amount,
+        ROUND({m['total_value']}, 2) as total_value,
+        ROUND({m['success_value']} * 0.005, 2) as revenue_usd
+    FROM {m['source']}
     GROUP BY corridor
     ORDER BY total_transactions DESC
     """
@@ -49,37 +152,96 @@ def user_segment_analysis_query() -> str:
     """
 
 
-def daily_trend_query() -> str:
+def daily_trend_query(use_cube: bool = False) -> str:
     """
     Get daily transaction volume and failure rate trends.
 
+    Args:
+        use_cube: Read from the pre-aggregated summary cube instead of transactions
+
     Returns:
         SQL query string for daily trend analysis
     """
-    return """
+    m = _MEASURES[use_cube]
+    return f"""
     SELECT
         transaction_date,
-        COUNT(*) as txn_count,
-        SUM(CASE WHEN status = 'success' THEN 1 ELSE 0 END) as successful,
-        SUM(CASE WHEN status = 'failed' THEN 1 ELSE 0 END) as failed,
-        ROUND(100.0 * SUM(CASE WHEN status = 'failed' THEN 1 ELSE 0 END) / COUNT(*), 2) as failure_rate,
-        ROUND(SUM(amount_usd), 2) as total_value
-    FROM transactions
+        {m['count']} as txn_count,
+        {m['successful']} as successful,
+        {m['failed']} as failed,
+        ROUND(100.0 * {m['failed']} / {m['count']}, 2) as failure_rate,
+        ROUND({m['total_value']}, 2) as total_value
+    FROM {m['source']}
     GROUP BY transaction_date
     ORDER BY transaction_date
     """
 
 
-def day_of_week_pattern_query() -> str:
+def rolling_daily_trend_query(use_cube: bool = False) -> str:
+    """
+    Get daily trends plus trailing 7/28/90-day volume, failure rate and value.
+
+    Each window covers the current day and the previous N-1 calendar days
+    (days without transactions count as empty), so early days have partial
+    windows.
+
+    Args:
+        use_cube: Read from the pre-aggregated summary cube instead of transactions
+
+    Returns:
+        SQL query string for rolling daily trend analysis
+    """
+    m = _MEASURES[use_cube]
+    columns = []
+    for days in ROLLING_WINDOWS:
+        columns.append(f"""
+        SUM(txn_count) OVER w{days} as txn_count_{days}d,
+        ROUND(100.0 * SUM(failed) OVER w{days} / SUM(txn_count) OVER w{days}, 2) as failure_rate_{days}d,
+        ROUND(SUM(total_value) OVER w{days}, 2) as total_value_{days}d""")
+    windows = ',\n        '.join(
+        f"w{days} AS (ORDER BY julianday(transaction_date) "
+        f"RANGE BETWEEN {days - 1} PRECEDING AND CURRENT ROW)"
+        for days in ROLLING_WINDOWS
+    )
+    return f"""
+    WITH daily AS (
+        SELECT
+            transaction_date,
+            {m['count']} as txn_count,
+            {m['successful']} as successful,
+            {m['failed']} as failed,
+            {m['total_value']} as total_value
+        FROM {m['source']}
+        GROUP BY transaction_date
+    )
+    SELECT
+        transaction_date,
+        txn_count,
+        successful,
+        failed,
+        ROUND(100.0 * failed / txn_count, 2) as failure_rate,
+        ROUND(total_value, 2) as total_value,{','.join(columns)}
+    FROM daily
+    WINDOW
+        {windows}
+    ORDER BY transaction_date
+    """
+
+
+def day_of_week_pattern_query(use_cube: bool = False) -> str:
     """
     Analyze transaction patterns by day of week.
 
+    Args:
+        use_cube: Read from the pre-aggregated summary cube instead of transactions
+
     Returns:
         SQL query string for day-of-week analysis
     """
-    return """
+    m = _MEASURES[use_cube]
+    return f"""
     SELECT
-        CASE CAST(strftime('%w', transaction_date) AS INTEGER)
+        CASE {m['dow']}
             WHEN 0 THEN 'Sunday'
             WHEN 1 THEN 'Monday'
             WHEN 2 THEN 'Tuesday'
@@ -88,70 +250,215 @@ def day_of_week_pattern_query() -> str:
             WHEN 5 THEN 'Friday'
             WHEN 6 THEN 'Saturday'
         END as day_of_week,
-        CAST(strftime('%w', transaction_date) AS INTEGER) as day_num,
-        COUNT(*) as txn_count,
-        ROUND(100.0 * SUM(CASE WHEN status = 'failed' THEN 1 ELSE 0 END) / COUNT(*), 2) as failure_rate,
-        ROUND(AVG(amount_usd), 2) as avg_amount
-    FROM transactions
-    GROUP BY strftime('%w', transaction_date)
+        {m['dow']} as day_num,
+        {m['count']} as txn_count,
+        ROUND(100.0 * {m['failed']} / {m['count']}, 2) as failure_rate,
+        ROUND({m['avg_amount']}, 2) as avg_amount
+    FROM {m['source']}
+    GROUP BY day_num
     ORDER BY day_num
     """
 
 
-def hourly_pattern_query() -> str:
+def hourly_pattern_query(use_cube: bool = False) -> str:
     """
     Analyze transaction patterns by hour of day.
 
+    Args:
+        use_cube: Read from the pre-aggregated summary cube instead of transactions
+
     Returns:
         SQL query string for hourly pattern analysis
     """
-    return """
+    m = _MEASURES[use_cube]
+    return f"""
     SELECT
-        CAST(strftime('%H', transaction_time) AS INTEGER) as hour,
-        COUNT(*) as txn_count,
-        ROUND(100.0 * SUM(CASE WHEN status = 'failed' THEN 1 ELSE 0 END) / COUNT(*), 2) as failure_rate,
-        ROUND(AVG(amount_usd), 2) as avg_amount
-    FROM transactions
+        {m['hour']} as hour,
+        {m['count']} as txn_count,
+        ROUND(100.0 * {m['failed']} / {m['count']}, 2) as failure_rate,
+        ROUND({m['avg_amount']}, 2) as avg_amount
+    FROM {m['source']}
     GROUP BY hour
     ORDER BY hour
     """
 
 
-def amount_distribution_query() -> str:
+def amount_distribution_query(use_cube: bool = False) -> str:
     """
     Analyze transaction distribution by amount brackets.
 
+    Args:
+        use_cube: Read from the pre-aggregated summary cube instead of transactions
+
     Returns:
         SQL query string for amount distribution analysis
     """
-    return """
+    m = _MEASURES[use_cube]
+    return f"""
     SELECT
-        CASE
-            WHEN amount_usd < 1000 THEN '<$1k'
-            WHEN amount_usd < 5000 THEN '$1k-$5k'
-            WHEN amount_usd < 10000 THEN '$5k-$10k'
-            WHEN amount_usd < 20000 THEN '$10k-$20k'
-            ELSE '>$20k'
-        END as amount_bracket,
-        COUNT(*) as txn_count,
-        ROUND(100.0 * SUM(CASE WHEN status = 'failed' THEN 1 ELSE 0 END) / COUNT(*), 2) as failure_rate,
-        ROUND(AVG(amount_usd), 2) as avg_amount,
-        ROUND(MIN(amount_usd), 2) as min_amount
-    FROM transactions
+        {m['amount_bracket']} as amount_bracket,
+        {m['count']} as txn_count,
+        ROUND(100.0 * {m['failed']} / {m['count']}, 2) as failure_rate,
+        ROUND({m['avg_amount']}, 2) as avg_amount,
+        ROUND({m['min_amount']}, 2) as min_amount
+    FROM {m['source']}
     GROUP BY amount_bracket
     ORDER BY min_amount
     """
 
 
-def usd_mxn_corridor_query() -> str:
+# Breakdowns of corridor_drilldown_query: key columns, extra measures, GROUP BY
+# and ORDER BY (within a corridor). Columns are prefixed with t. because the
+# user_status breakdown joins users, which also has a status column.
+_FAILURE_RATE = "ROUND(100.0 * SUM(CASE WHEN t.status = 'failed' THEN 1 ELSE 0 END) / COUNT(*), 2)"
+_DRILLDOWNS = {
+    'segment': {
+        'keys': 't.user_segment as user_segment',
+        'measures': 'ROUND(AVG(t.amount_usd), 2) as avg_amount,\n        '
+                    'ROUND(SUM(t.amount_usd), 2) as total_value',
+        'group_by': 't.user_segment',
+        'order_by': 'failure_rate DESC'
+    },
+    'amount': {
+        'keys': """CASE
+            WHEN t.amount_usd < 5000 THEN '<$5k'
+            WHEN t.amount_usd < 10000 THEN '$5k-$10k'
+            ELSE '>$10k'
+        END as amount_bracket""",
+        'measures': 'ROUND(AVG(t.amount_usd), 2) as avg_amount',
+        'group_by': 'amount_bracket',
+        'order_by': 'MIN(t.amount_usd)'
+    },
+    'month': {
+        'keys': 't.year_month as month',
+        'measures': 'ROUND(AVG(t.amount_usd), 2) as avg_amount',
+        'group_by': 'month',
+        'order_by': 'month'
+    },
+    'day_of_week': {
+        'keys': """CASE t.dow
+            WHEN 0 THEN 'Sunday'
+            WHEN 1 THEN 'Monday'
+            WHEN 2 THEN 'Tuesday'
+            WHEN 3 THEN 'Wednesday'
+            WHEN 4 THEN 'Thursday'
+            WHEN 5 THEN 'Friday'
+            WHEN 6 THEN 'Saturday'
+        END as day_of_week,
+        t.dow as day_num""",
+        'measures': None,
+        'group_by': 't.dow',
+        'order_by': 'day_num'
+    },
+    'user_status': {
+        'keys': 'u.status as user_status',
+        'measures': 'ROUND(AVG(t.amount_usd), 2) as avg_amount',
+        'group_by': 'u.status',
+        'order_by': 'user_status'
+    }
+}
+
+DRILLDOWN_DIMENSIONS = tuple(_DRILLDOWNS)
+
+# Overrides for transactions loaded with denormalize_users (no users join)
+_DENORMALIZED_DRILLDOWNS = {
+    'user_status': {
+        'keys': 't.user_status as user_status',
+        'group_by': 't.user_status'
+    }
+}
+
+
+def _drilldown_sql(dimension: str, corridor_filter: str = None, denormalized: bool = False) -> str:
+    """
+    Build a corridor breakdown reading transactions directly.
+
+    Args:
+        dimension: Key of _DRILLDOWNS
+        corridor_filter: SQL condition on t.corridor, or None to group by corridor
+        denormalized: Read user attributes from transactions instead of joining users
+
+    Returns:
+        SQL query string
+    """
+    if dimension not in _DRILLDOWNS:
+        raise ValueError(f"Unknown drill-down dimension: {dimension}")
+    spec = _DRILLDOWNS[dimension]
+    if denormalized:
+        spec = {**spec, **_DENORMALIZED_DRILLDOWNS.get(dimension, {})}
+    by_corridor = corridor_filter is None
+    columns = ['t.corridor as corridor'] if by_corridor else []
+    columns += [spec['keys'], 'COUNT(*) as txn_count', f'{_FAILURE_RATE} as failure_rate']
+    if spec['measures']:
+        columns.append(spec['measures'])
+    source = 'transactions t'
+    if dimension == 'user_status' and not denormalized:
+        source += '\n    LEFT JOIN users u ON t.user_id = u.user_id'
+    where = '' if by_corridor else f'\n    WHERE {corridor_filter}'
+    prefix = ('t.corridor, ', 'corridor, ') if by_corridor else ('', '')
+    column_list = ',\n        '.join(columns)
+    return f"""
+    SELECT
+        {column_list}
+    FROM {source}{where}
+    GROUP BY {prefix[0]}{spec['group_by']}
+    ORDER BY {prefix[1]}{spec['order_by']}
+    """
+
+
+def corridor_drilldown_query(dimension: str, by_corridor: bool = False, denormalized: bool = False) -> str:
+    """
+    Break one corridor (or every corridor) down by a root-cause dimension.
+
+    Reads transactions in place (no row copies); the corridor is the
+    :corridor bind parameter and is served by the corridor index. With
+    by_corridor=True all corridors are broken down in one scan, with a
+    leading corridor column and the single-corridor row order within each.
+
+    Args:
+        dimension: One of DRILLDOWN_DIMENSIONS ('segment', 'amount', 'month',
+            'day_of_week', 'user_status')
+        by_corridor: Group by corridor instead of filtering on :corridor
+        denormalized: Transactions were loaded with denormalize_users, so
+            user_status is read from the table without joining users
+
+    Returns:
+        SQL query string
+
+    Example:
+        pd.read_sql_query(corridor_drilldown_query('segment'), conn,
+                          params={'corridor': 'USD_COP'})
+    """
+    return _drilldown_sql(dimension, None if by_corridor else 't.corridor = :corridor', denormalized)
+
+
+def usd_mxn_corridor_query(denormalized: bool = False) -> str:
     """
-    Create temporary table for USD→MXN corridor analysis.
+    Create a temporary view of USD→MXN transactions joined with their users.
+
+    A view copies no rows and always reflects the current tables. The
+    usd_mxn_* queries no longer need it (see corridor_drilldown_query).
+    Any previous definition is dropped first, so the view always matches
+    the denormalized flag of the latest call; run it with executescript.
+
+    Args:
+        denormalized: Transactions were loaded with denormalize_users and
+            already carry the user columns, so users is not joined
 
     Returns:
-        SQL query string to create USD_MXN temporary table
+        SQL script that (re)creates the usd_mxn_txns temporary view
+    """
+    if denormalized:
+        return """
+    DROP VIEW IF EXISTS temp.usd_mxn_txns;
+    CREATE TEMP VIEW usd_mxn_txns AS
+    SELECT t.*
+    FROM transactions t
+    WHERE t.corridor = 'USD_MXN'
     """
     return """
-    CREATE TEMP TABLE IF NOT EXISTS usd_mxn_txns AS
+    DROP VIEW IF EXISTS temp.usd_mxn_txns;
+    CREATE TEMP VIEW usd_mxn_txns AS
     SELECT
         t.*,
         u.country as user_country,
@@ -167,134 +474,157 @@ def usd_mxn_segment_analysis_query() -> str:
     """
     Analyze USD→MXN transactions by user segment.
 
+    Bind USD_MXN_PARAMS for the :corridor placeholder.
+
     Returns:
         SQL query string for USD_MXN segment analysis
     """
-    return """
-    SELECT
-        user_segment,
-        COUNT(*) as txn_count,
-        ROUND(100.0 * SUM(CASE WHEN status = 'failed' THEN 1 ELSE 0 END) / COUNT(*), 2) as failure_rate,
-        ROUND(AVG(amount_usd), 2) as avg_amount,
-        ROUND(SUM(amount_usd), 2) as total_value
-    FROM usd_mxn_txns
-    GROUP BY user_segment
-    ORDER BY failure_rate DESC
-    """
+    return corridor_drilldown_query('segment')
 
 
 def usd_mxn_amount_analysis_query() -> str:
     """
     Analyze USD→MXN failure rates by transaction amount brackets.
 
+    Bind USD_MXN_PARAMS for the :corridor placeholder.
+
     Returns:
         SQL query string for USD_MXN amount analysis
     """
-    return """
-    SELECT
-        CASE
-            WHEN amount_usd < 5000 THEN '<$5k'
-            WHEN amount_usd < 10000 THEN '$5k-$10k'
-            ELSE '>$10k'
-        END as amount_bracket,
-        COUNT(*) as txn_count,
-        ROUND(100.0 * SUM(CASE WHEN status = 'failed' THEN 1 ELSE 0 END) / COUNT(*), 2) as failure_rate,
-        ROUND(AVG(amount_usd), 2) as avg_amount
-    FROM usd_mxn_txns
-    GROUP BY amount_bracket
-    ORDER BY MIN(amount_usd)
-    """
+    return corridor_drilldown_query('amount')
 
 
 def usd_mxn_monthly_trend_query() -> str:
     """
     Analyze USD→MXN monthly failure rate trends.
 
+    Bind USD_MXN_PARAMS for the :corridor placeholder.
+
     Returns:
         SQL query string for USD_MXN monthly trends
     """
-    return """
-    SELECT
-        strftime('%Y-%m', transaction_date) as month,
-        COUNT(*) as txn_count,
-        ROUND(100.0 * SUM(CASE WHEN status = 'failed' THEN 1 ELSE 0 END) / COUNT(*), 2) as failure_rate,
-        ROUND(AVG(amount_usd), 2) as avg_amount
-    FROM usd_mxn_txns
-    GROUP BY month
-    ORDER BY month
-    """
+    return corridor_drilldown_query('month')
 
 
 def usd_mxn_day_of_week_query() -> str:
     """
     Analyze USD→MXN failure patterns by day of week.
 
+    Bind USD_MXN_PARAMS for the :corridor placeholder.
+
     Returns:
         SQL query string for USD_MXN day-of-week analysis
     """
-    return """
-    SELECT
-        CASE CAST(strftime('%w', transaction_date) AS INTEGER)
-            WHEN 0 THEN 'Sunday'
-            WHEN 1 THEN 'Monday'
-            WHEN 2 THEN 'Tuesday'
-            WHEN 3 THEN 'Wednesday'
-            WHEN 4 THEN 'Thursday'
-            WHEN 5 THEN 'Friday'
-            WHEN 6 THEN 'Saturday'
-        END as day_of_week,
-        CAST(strftime('%w', transaction_date) AS INTEGER) as day_num,
-        COUNT(*) as txn_count,
-        ROUND(100.0 * SUM(CASE WHEN status = 'failed' THEN 1 ELSE 0 END) / COUNT(*), 2) as failure_rate
-    FROM usd_mxn_txns
-    GROUP BY strftime('%w', transaction_date)
-    ORDER BY day_num
-    """
+    return corridor_drilldown_query('day_of_week')
 
 
 def usd_mxn_user_status_query() -> str:
     """
     Analyze USD→MXN failures by user account status.
 
+    Bind USD_MXN_PARAMS for the :corridor placeholder.
+
     Returns:
         SQL query string for USD_MXN user status analysis
     """
-    return """
-    SELECT
-        user_status,
-        COUNT(*) as txn_count,
-        ROUND(100.0 * SUM(CASE WHEN status = 'failed' THEN 1 ELSE 0 END) / COUNT(*), 2) as failure_rate,
-        ROUND(AVG(amount_usd), 2) as avg_amount
-    FROM usd_mxn_txns
-    GROUP BY user_status
-    """
+    return corridor_drilldown_query('user_status')
 
 
-def corridor_comparison_for_strategy_query() -> str:
+def corridor_comparison_for_strategy_query(use_cube: bool = False) -> str:
     """
     Compare all corridors for strategic prioritization.
 
+    Args:
+        use_cube: Read from the pre-aggregated summary cube instead of transactions
+
     Returns:
         SQL query string for corridor strategic comparison
     """
-    return """
+    m = _MEASURES[use_cube]
+    row_count = 'txn_count' if use_cube else '1'
+    return f"""
     SELECT
         corridor,
-        COUNT(*) as volume,
-        ROUND(AVG(amount_usd), 2) as avg_amount,
-        ROUND(SUM(amount_usd), 2) as total_value,
-        ROUND(100.0 * SUM(CASE WHEN status = 'success' THEN 1 ELSE 0 END) / COUNT(*), 2) as success_rate,
-        ROUND(SUM(CASE WHEN status = 'success' THEN amount_usd ELSE 0 END) * 0.005, 2) as revenue_potential,
+        {m['count']} as volume,
+        ROUND({m['avg_amount']}, 2) as avg_amount,
+        ROUND({m['total_value']}, 2) as total_value,
+        ROUND(100.0 * {m['successful']} / {m['count']}, 2) as success_rate,
+        ROUND({m['success_value']} * 0.005, 2) as revenue_potential,
         ROUND(100.0 *
-            SUM(CASE WHEN transaction_date >= '2025-11-01' THEN 1 ELSE 0 END) /
-            NULLIF(SUM(CASE WHEN transaction_date < '2025-09-01' THEN 1 ELSE 0 END), 0) - 100,
+            SUM(CASE WHEN transaction_date >= '2025-11-01' THEN {row_count} ELSE 0 END) /
+            NULLIF(SUM(CASE WHEN transaction_date < '2025-09-01' THEN {row_count} ELSE 0 END), 0) - 100,
         2) as growth_rate
-    FROM transactions
+    FROM {m['source']}
     GROUP BY corridor
     ORDER BY revenue_potential DESC
     """
 
 
+def amount_quantiles_query(by_segment: bool = True) -> str:
+    """
+    Get p50/p90/p99 amounts and amounts at failure per corridor (and segment).
+
+    Reads the t-digest centroids stored at load time instead of sorting
+    transactions: each centroid sits at the midpoint of its cumulative
+    weight and quantiles are interpolated between neighbouring centroids.
+    Per-corridor results read the union of the segment sketches.
+
+    Args:
+        by_segment: One row per corridor and user segment (False = per corridor)
+
+    Returns:
+        SQL query string for amount quantile analysis
+    """
+    keys = 'corridor, user_segment' if by_segment else 'corridor'
+    levels = ', '.join(f"('p{q * 100:g}', {q})" for q in AMOUNT_QUANTILES)
+    columns = []
+    for sketch, prefix, count in [('amount', '', 'txn_count'), ('failed_amount', 'failed_', 'failed_count')]:
+        columns.append(f"MAX(CASE WHEN sketch = '{sketch}' THEN total END) as {count}")
+        columns += [
+            f"ROUND(MAX(CASE WHEN sketch = '{sketch}' AND level = 'p{q * 100:g}' THEN value END), 2)"
+            f" as p{q * 100:g}_{prefix}amount"
+            for q in AMOUNT_QUANTILES
+        ]
+    column_list = ',\n        '.join(columns)
+    return f"""
+    WITH positioned AS (
+        SELECT
+            {keys}, sketch, mean,
+            SUM(weight) OVER ordered - weight / 2.0 as position,
+            SUM(weight) OVER (PARTITION BY {keys}, sketch) as total
+        FROM {AMOUNT_SKETCH_TABLE}
+        WINDOW ordered AS (PARTITION BY {keys}, sketch ORDER BY mean, centroid
+                           ROWS UNBOUNDED PRECEDING)
+    ),
+    steps AS (
+        SELECT
+            *,
+            LAG(position) OVER ordered as prev_position,
+            LEAD(position) OVER ordered as next_position,
+            LEAD(mean) OVER ordered as next_mean
+        FROM positioned
+        WINDOW ordered AS (PARTITION BY {keys}, sketch ORDER BY position)
+    ),
+    levels(level, fraction) AS (VALUES {levels}),
+    points AS (
+        SELECT
+            {keys}, sketch, level, total,
+            mean + COALESCE((next_mean - mean) * MIN(1.0, MAX(0.0,
+                (fraction * total - position) / (next_position - position))), 0) as value
+        FROM steps
+        JOIN levels
+            ON (position <= fraction * total OR prev_position IS NULL)
+            AND (next_position > fraction * total OR next_position IS NULL)
+    )
+    SELECT
+        {keys},
+        {column_list}
+    FROM points
+    GROUP BY {keys}
+    ORDER BY {keys}
+    """
+
+
 def get_record_counts_query() -> str:
     """
     Get basic record counts for validation.
@@ -0,0 +1,196 @@
+"""
+Task DAG Runner for Cobre Payment Corridor Deliverables
+
+Executes a graph of build tasks with make-style skipping of up-to-date
+targets. Tasks that need the shared database connection run in the main
+process; everything else (CSV exports, chart rendering, workbook) runs in a
+process pool as soon as its dependencies are done.
+"""
+
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+
+@dataclass
+class Task:
+    """
+    A node of the build graph.
+
+    Attributes:
+        name: Unique task name
+        action: Callable executed for the task (must be picklable unless local)
+        inputs: Tasks whose results are passed to action as positional arguments
+        after: Tasks that must finish first but whose results are not passed
+        kwargs: Extra keyword arguments for action
+        target: File produced by the task (None for in-memory tasks)
+        sources: Files the target is built from (for up-to-date checks)
+        local: Run in the main process (e.g. tasks using the SQLite connection)
+    """
+    name: str
+    action: Callable[..., Any]
+    inputs: List[str] = field(default_factory=list)
+    after: List[str] = field(default_factory=list)
+    kwargs: Dict[str, Any] = field(default_factory=dict)
+    target: Optional[str] = None
+    sources: List[str] = field(default_factory=list)
+    local: bool = False
+
+    @property
+    def deps(self) -> List[str]:
+        return self.inputs + [name for name in self.after if name not in self.inputs]
+
+
+def _mtime(path: str) -> float:
+    """Modification time of a file, or 0 if it does not exist."""
+    try:
+        return Path(path).stat().st_mtime
+    except OSError:
+        return 0.0
+
+
+def topological_order(tasks: Dict[str, Task]) -> List[str]:
+    """
+    Order task names so every task comes after its dependencies.
+
+    Args:
+        tasks: Dictionary of task name: Task
+
+    Returns:
+        List of task names in dependency order
+
+    Raises:
+        ValueError: If a dependency is unknown or the graph has a cycle
+    """
+    order, state = [], {}
+
+    def visit(name: str) -> None:
+        if name not in tasks:
+            raise ValueError(f"Unknown task dependency: {name}")
+        if state.get(name) == 'done':
+            return
+        if state.get(name) == 'visiting':
+            raise ValueError(f"Dependency cycle at task: {name}")
+        state[name] = 'visiting'
+        for dep in tasks[name].deps:
+            visit(dep)
+        state[name] = 'done'
+        order.append(name)
+
+    for name in tasks:
+        visit(name)
+    return order
+
+
+def plan(tasks: Dict[str, Task], force: bool = False) -> List[str]:
+    """
+    Decide which tasks must run, make-style.
+
+    A task with a target is stale if the target is missing, older than any of
+    its sources (including targets and sources reached through its
+    dependencies) or if a dependency target is stale. Tasks without a target
+    only run when a stale task needs them.
+
+    Args:
+        tasks: Dictionary of task name: Task
+        force: Rebuild every target regardless of timestamps
+
+    Returns:
+        Names of the tasks to run, in dependency order
+    """
+    order = topological_order(tasks)
+    sources: Dict[str, List[str]] = {}
+    stale: Dict[str, bool] = {}
+
+    for name in order:
+        task = tasks[name]
+        task_sources = list(task.sources)
+        dep_stale = False
+        for dep in task.deps:
+            dep_task = tasks[dep]
+            if dep_task.target:
+                task_sources.append(dep_task.target)
+                dep_stale = dep_stale or stale[dep]
+            else:
+                task_sources.extend(sources[dep])
+        sources[name] = task_sources
+
+        if task.target:
+            target_time = _mtime(task.target)
+            newest_source = max((_mtime(src) for src in task_sources), default=0.0)
+            stale[name] = force or dep_stale or target_time == 0.0 or target_time < newest_source
+        else:
+            stale[name] = False
+
+    needed = {name for name in order if stale[name]}
+    for name in reversed(order):
+        if name in needed:
+            needed.update(dep for dep in tasks[name].inputs if not tasks[dep].target)
+            needed.update(dep for dep in tasks[name].deps if stale[dep])
+    return [name for name in order if name in needed]
+
+
+def run_dag(
+    tasks: List[Task],
+    max_workers: Optional[int] = None,
+    force: bool = False,
+    initializer: Optional[Callable[[], None]] = None
+) -> Dict[str, str]:
+    """
+    Execute a task graph, in parallel where dependencies allow.
+
+    Args:
+        tasks: List of Task objects
+        max_workers: Process pool size (default: number of CPUs)
+        force: Rebuild every target regardless of timestamps
+        initializer: Callable run once in each worker process
+
+    Returns:
+        Dictionary of task name: 'built' or 'up-to-date'
+    """
+    graph = {task.name: task for task in tasks}
+    to_run = plan(graph, force=force)
+    status = {name: 'up-to-date' for name in graph}
+    if not to_run:
+        return status
+
+    results: Dict[str, Any] = {}
+    pending = list(to_run)
+    running = {}
+    done = {name for name in graph if name not in to_run}
+
+    def ready(name: str) -> bool:
+        return all(dep in done for dep in graph[name].deps)
+
+    workers = max_workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers, initializer=initializer) as pool:
+        while pending or running:
+            # Submit remote tasks first so workers stay busy during local ones
+            for name in [n for n in pending if ready(n) and not graph[n].local]:
+                task = graph[name]
+                args = [results[dep] for dep in task.inputs]
+                running[pool.submit(task.action, *args, **task.kwargs)] = name
+                pending.remove(name)
+
+            local = next((n for n in pending if ready(n) and graph[n].local), None)
+            if local is not None:
+                task = graph[local]
+                results[local] = task.action(*[results[dep] for dep in task.inputs], **task.kwargs)
+                pending.remove(local)
+                done.add(local)
+                status[local] = 'built'
+                continue
+
+            if not running:
+                raise RuntimeError(f"Tasks cannot make progress: {pending}")
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                results[name] = future.result()
+                done.add(name)
+                status[name] = 'built'
+
+    return status
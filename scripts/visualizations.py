@@ -4,30 +4,33 @@ Visualization Utilities for Cobre Payment Corridor Analysis
 Functions for creating publication-ready charts and exporting visualizations.
 """
 
-import matplotlib.pyplot as plt
+import matplotlib
 import seaborn as sns
 import pandas as pd
 import numpy as np
+import os
+from concurrent.futures import ProcessPoolExecutor
+from matplotlib.figure import Figure
 from pathlib import Path
-from typing import Optional, Tuple
+from typing import Callable, List, Optional, Sequence, Tuple, Union
 
 
 # Set default style
 sns.set_style("whitegrid")
-plt.rcParams['figure.dpi'] = 100
-plt.rcParams['savefig.dpi'] = 300
-plt.rcParams['font.size'] = 10
-plt.rcParams['axes.labelsize'] = 11
-plt.rcParams['axes.titlesize'] = 13
-plt.rcParams['xtick.labelsize'] = 9
-plt.rcParams['ytick.labelsize'] = 9
-plt.rcParams['legend.fontsize'] = 9
+matplotlib.rcParams['figure.dpi'] = 100
+matplotlib.rcParams['savefig.dpi'] = 300
+matplotlib.rcParams['font.size'] = 10
+matplotlib.rcParams['axes.labelsize'] = 11
+matplotlib.rcParams['axes.titlesize'] = 13
+matplotlib.rcParams['xtick.labelsize'] = 9
+matplotlib.rcParams['ytick.labelsize'] = 9
+matplotlib.rcParams['legend.fontsize'] = 9
 
 
 def create_corridor_volume_comparison(
     df: pd.DataFrame,
     output_path: str = 'output/visualizations/corridor_volume_comparison.png'
-) -> plt.Figure:
+) -> Figure:
     """
     Create horizontal bar chart comparing corridor transaction volumes.
 
@@ -38,7 +41,8 @@ def create_corridor_volume_comparison(
     Returns:
         matplotlib Figure object
     """
-    fig, ax = plt.subplots(figsize=(12, 6))
+    fig = Figure(figsize=(12, 6))
+    ax = fig.subplots()
 
     # Sort by volume
     df_sorted = df.sort_values('total_transactions', ascending=True)
@@ -65,7 +69,7 @@ def create_corridor_volume_comparison(
                 transform=ax.transAxes, ha='right', va='bottom',
                 fontsize=9, style='italic', color='#E74C3C')
 
-    plt.tight_layout()
+    fig.tight_layout()
     export_chart(fig, output_path)
     return fig
 
@@ -73,7 +77,7 @@ def create_corridor_volume_comparison(
 def create_corridor_failure_rates(
     df: pd.DataFrame,
     output_path: str = 'output/visualizations/corridor_failure_rates.png'
-) -> plt.Figure:
+) -> Figure:
     """
     Create bar chart comparing failure rates across corridors.
 
@@ -84,7 +88,8 @@ def create_corridor_failure_rates(
     Returns:
         matplotlib Figure object
     """
-    fig, ax = plt.subplots(figsize=(12, 6))
+    fig = Figure(figsize=(12, 6))
+    ax = fig.subplots()
 
     # Sort by failure rate
     df_sorted = df.sort_values('failure_rate', ascending=False)
@@ -120,7 +125,7 @@ def create_corridor_failure_rates(
     ax.legend(loc='upper right')
     ax.set_ylim(0, df_sorted['failure_rate'].max() * 1.2)
 
-    plt.tight_layout()
+    fig.tight_layout()
     export_chart(fig, output_path)
     return fig
 
@@ -128,7 +133,7 @@ def create_corridor_failure_rates(
 def create_segment_performance(
     df: pd.DataFrame,
     output_path: str = 'output/visualizations/segment_performance.png'
-) -> plt.Figure:
+) -> Figure:
     """
     Create grouped bar chart for user segment performance metrics.
 
@@ -139,7 +144,8 @@ def create_segment_performance(
     Returns:
         matplotlib Figure object
     """
-    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(14, 6))
+    fig = Figure(figsize=(14, 6))
+    ax1, ax2 = fig.subplots(1, 2)
 
     # Chart 1: Failure rate by segment
     segments = df['user_segment'].values
@@ -175,8 +181,8 @@ def create_segment_performance(
 
     ax2.set_ylim(0, max(avg_amounts) * 1.25)
 
-    plt.suptitle('User Segment Performance Analysis', fontsize=15, fontweight='bold', y=1.02)
-    plt.tight_layout()
+    fig.suptitle('User Segment Performance Analysis', fontsize=15, fontweight='bold', y=1.02)
+    fig.tight_layout()
     export_chart(fig, output_path)
     return fig
 
@@ -184,32 +190,51 @@ def create_segment_performance(
 def create_daily_trend(
     df: pd.DataFrame,
     output_path: str = 'output/visualizations/daily_trend.png'
-) -> plt.Figure:
+) -> Figure:
     """
     Create line chart showing daily transaction volume trend.
 
+    If the trailing 7-day columns of rolling_daily_trend_query are present,
+    they are drawn over the (noisy) daily values.
+
     Args:
         df: DataFrame with columns: transaction_date, txn_count, failure_rate
+            (optionally txn_count_7d, failure_rate_7d)
         output_path: Path to save the chart
 
     Returns:
         matplotlib Figure object
     """
-    fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(14, 8), sharex=True)
+    fig = Figure(figsize=(14, 8))
+    ax1, ax2 = fig.subplots(2, 1, sharex=True)
 
     # Convert date to datetime
     df['transaction_date'] = pd.to_datetime(df['transaction_date'])
     df = df.sort_values('transaction_date')
 
+    rolling = 'failure_rate_7d' in df.columns
+
     # Chart 1: Transaction volume
     ax1.plot(df['transaction_date'], df['txn_count'], color='#3498DB', linewidth=2)
     ax1.fill_between(df['transaction_date'], df['txn_count'], alpha=0.3, color='#3498DB')
+    if rolling:
+        # Early windows are partial: average over the days they cover
+        covered = ((df['transaction_date'] - df['transaction_date'].min()).dt.days + 1).clip(upper=7)
+        ax1.plot(df['transaction_date'], df['txn_count_7d'] / covered, color='#1F4E79',
+                 linewidth=2.5, label='7-day average')
+        ax1.legend(loc='upper right')
     ax1.set_ylabel('Transaction Count', fontweight='bold')
     ax1.set_title('Daily Transaction Volume (Jul-Dec 2025)', fontweight='bold', pad=15)
     ax1.grid(True, alpha=0.3)
 
     # Chart 2: Failure rate
-    ax2.plot(df['transaction_date'], df['failure_rate'], color='#E74C3C', linewidth=2)
+    if rolling:
+        ax2.plot(df['transaction_date'], df['failure_rate'], color='#E74C3C', linewidth=1,
+                 alpha=0.4, label='Daily')
+        ax2.plot(df['transaction_date'], df['failure_rate_7d'], color='#E74C3C', linewidth=2.5,
+                 label='7-day rolling')
+    else:
+        ax2.plot(df['transaction_date'], df['failure_rate'], color='#E74C3C', linewidth=2)
     ax2.axhline(y=5, color='gray', linestyle='--', linewidth=1, alpha=0.7, label='5% Target')
     ax2.set_ylabel('Failure Rate (%)', fontweight='bold')
     ax2.set_xlabel('Date', fontweight='bold')
@@ -217,7 +242,7 @@ def create_daily_trend(
     ax2.legend(loc='upper right')
     ax2.grid(True, alpha=0.3)
 
-    plt.tight_layout()
+    fig.tight_layout()
     export_chart(fig, output_path)
     return fig
 
@@ -225,7 +250,7 @@ def create_daily_trend(
 def create_day_of_week_pattern(
     df: pd.DataFrame,
     output_path: str = 'output/visualizations/day_of_week_pattern.png'
-) -> plt.Figure:
+) -> Figure:
     """
     Create bar chart showing day-of-week transaction patterns.
 
@@ -236,7 +261,8 @@ def create_day_of_week_pattern(
     Returns:
         matplotlib Figure object
     """
-    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(14, 6))
+    fig = Figure(figsize=(14, 6))
+    ax1, ax2 = fig.subplots(1, 2)
 
     # Ensure correct day order
     day_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
@@ -263,8 +289,8 @@ def create_day_of_week_pattern(
     for i, (day, rate) in enumerate(zip(df['day_of_week'], df['failure_rate'])):
         ax2.text(i, rate + 0.2, f'{rate:.1f}%', ha='center', va='bottom', fontsize=9)
 
-    plt.suptitle('Day-of-Week Transaction Patterns', fontsize=15, fontweight='bold', y=1.00)
-    plt.tight_layout()
+    fig.suptitle('Day-of-Week Transaction Patterns', fontsize=15, fontweight='bold', y=1.00)
+    fig.tight_layout()
     export_chart(fig, output_path)
     return fig
 
@@ -272,7 +298,7 @@ def create_day_of_week_pattern(
 def create_amount_distribution(
     df: pd.DataFrame,
     output_path: str = 'output/visualizations/amount_distribution.png'
-) -> plt.Figure:
+) -> Figure:
     """
     Create histogram showing transaction amount distribution with failure rate overlay.
 
@@ -283,7 +309,8 @@ def create_amount_distribution(
     Returns:
         matplotlib Figure object
     """
-    fig, ax1 = plt.subplots(figsize=(12, 6))
+    fig = Figure(figsize=(12, 6))
+    ax1 = fig.subplots()
 
     # Bar chart for transaction count
     x_pos = range(len(df))
@@ -313,14 +340,14 @@ def create_amount_distribution(
         ax2.text(i, rate + 0.5, f'{rate:.1f}%', ha='center', va='bottom',
                 fontsize=9, color='#E74C3C', fontweight='bold')
 
-    plt.title('Transaction Amount Distribution & Failure Rate', fontweight='bold', pad=20)
+    ax2.set_title('Transaction Amount Distribution & Failure Rate', fontweight='bold', pad=20)
 
     # Combine legends
     lines1, labels1 = ax1.get_legend_handles_labels()
     lines2, labels2 = ax2.get_legend_handles_labels()
     ax1.legend(lines1 + lines2, labels1 + labels2, loc='upper right')
 
-    plt.tight_layout()
+    fig.tight_layout()
     export_chart(fig, output_path)
     return fig
 
@@ -329,7 +356,7 @@ def create_usd_mxn_analysis_chart(
     segment_df: pd.DataFrame,
     amount_df: pd.DataFrame,
     output_path: str = 'output/visualizations/usd_mxn_failure_analysis.png'
-) -> plt.Figure:
+) -> Figure:
     """
     Create comprehensive USD→MXN failure analysis chart.
 
@@ -341,7 +368,8 @@ def create_usd_mxn_analysis_chart(
     Returns:
         matplotlib Figure object
     """
-    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(14, 6))
+    fig = Figure(figsize=(14, 6))
+    ax1, ax2 = fig.subplots(1, 2)
 
     # Chart 1: Failure rate by segment
     segments = segment_df['user_segment'].values
@@ -386,13 +414,13 @@ def create_usd_mxn_analysis_chart(
 
     ax2.set_ylim(0, max(amount_failure_rates) * 1.3)
 
-    plt.suptitle('USD→MXN Corridor: Root Cause Analysis', fontsize=16, fontweight='bold', y=1.02)
-    plt.tight_layout()
+    fig.suptitle('USD→MXN Corridor: Root Cause Analysis', fontsize=16, fontweight='bold', y=1.02)
+    fig.tight_layout()
     export_chart(fig, output_path)
     return fig
 
 
-def export_chart(fig: plt.Figure, output_path: str, dpi: int = 300) -> None:
+def export_chart(fig: Figure, output_path: str, dpi: int = 300) -> None:
     """
     Export chart to file with proper quality settings.
 
@@ -407,3 +435,62 @@ def export_chart(fig: plt.Figure, output_path: str, dpi: int = 300) -> None:
     # Save with high quality
     fig.savefig(output_path, dpi=dpi, bbox_inches='tight', facecolor='white')
     print(f"✅ Chart exported: {output_path}")
+
+
+def render_chart(
+    chart_fn: Callable[..., Figure],
+    data: Union[pd.DataFrame, Sequence[pd.DataFrame]],
+    output_path: str
+) -> str:
+    """
+    Render a single chart to file.
+
+    The figure is not registered with pyplot, so it is freed as soon as it
+    goes out of scope.
+
+    Args:
+        chart_fn: One of the create_* functions in this module
+        data: DataFrame for the chart, or a tuple of DataFrames for charts
+            that take several (e.g. create_usd_mxn_analysis_chart)
+        output_path: Path to save the chart
+
+    Returns:
+        Path of the saved chart
+    """
+    frames = (data,) if isinstance(data, pd.DataFrame) else tuple(data)
+    chart_fn(*frames, output_path=output_path)
+    return output_path
+
+
+def render_charts(
+    jobs: List[Tuple[Callable[..., Figure], Union[pd.DataFrame, Sequence[pd.DataFrame]], str]],
+    max_workers: Optional[int] = None
+) -> List[str]:
+    """
+    Render a batch of charts in parallel worker processes.
+
+    Charts are built on explicit Figure objects, without pyplot's global
+    figure registry or GUI backend, so workers need no setup and regenerating
+    every chart takes about as long as the slowest one.
+
+    Args:
+        jobs: List of (chart function, DataFrame(s), output path) tuples
+        max_workers: Number of worker processes (default: one per job, up to
+            the number of CPUs)
+
+    Returns:
+        List of saved chart paths, in job order
+
+    Example:
+        render_charts([
+            (create_corridor_volume_comparison, corridor_df, 'output/visualizations/corridor_volume_comparison.png'),
+            (create_usd_mxn_analysis_chart, (segment_df, amount_df), 'output/visualizations/usd_mxn_failure_analysis.png')
+        ])
+    """
+    if not jobs:
+        return []
+    workers = max_workers or min(len(jobs), os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(render_chart, chart_fn, data, output_path)
+                   for chart_fn, data, output_path in jobs]
+        return [future.result() for future in futures]